@@ -0,0 +1,206 @@
+# analytics.py
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+from collections import Counter
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import select
+from config import settings
+from database import SessionLocal, insert_ignoring_duplicates
+from models import Post, Traffic
+
+logger = logging.getLogger(__name__)
+
+# (post_id, visit_date); post_id None is the site-wide total
+TrafficKey = tuple[Optional[int], date]
+
+
+class HyperLogLog:
+    """Approximate distinct counter in 2**precision one-byte registers (~1.6% error at 12)."""
+
+    def __init__(self, precision: int = 12, registers: Optional[bytes] = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self.size)
+
+    def add(self, value: str):
+        x = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        index = x >> (64 - self.precision)
+        rest = (x << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = min(64 - rest.bit_length(), 64 - self.precision) + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        raw = alpha * self.size ** 2 / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * self.size and zeros:
+            # Small-range correction: linear counting is far more accurate here
+            raw = self.size * math.log(self.size / zeros)
+        return round(raw)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes], precision: int) -> "HyperLogLog":
+        # A sketch stored at another precision can't be merged; start that day afresh
+        if data and len(data) == 1 << precision:
+            return cls(precision, data)
+        return cls(precision)
+
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Counter = Counter()
+        self.sketches: dict[TrafficKey, HyperLogLog] = {}
+
+
+class TrafficAggregator:
+    """Counts page views in memory and writes them out as daily rollups.
+
+    Keys are spread over lock-striped shards so concurrent hits on different posts
+    never wait on each other. Every ``interval`` seconds the shards are swapped out
+    and merged into the ``traffic`` table in one transaction; the hit path itself
+    never touches the database. Each key holds a sketch until then, so at most
+    ``max_pending`` keys are kept and hits for further new keys are dropped.
+    """
+
+    def __init__(self, interval: float, shards: int, precision: int, max_pending: int = 20000):
+        self.interval = interval
+        self.precision = precision
+        self.max_pending = max_pending
+        self._shards = [_Shard() for _ in range(shards)]
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def _shard(self, key: TrafficKey) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def is_pending(self, post_id: int) -> bool:
+        """Whether today's views of ``post_id`` are already waiting for the next flush."""
+        key = (post_id, datetime.utcnow().date())
+        return key in self._shard(key).counts
+
+    def record(self, post_id: int, visitor: str) -> bool:
+        today = datetime.utcnow().date()
+        if not self.is_pending(post_id) and self.pending() >= self.max_pending:
+            self.dropped += 1
+            return False
+        for key in ((post_id, today), (None, today)):
+            shard = self._shard(key)
+            with shard.lock:
+                shard.counts[key] += 1
+                sketch = shard.sketches.get(key)
+                if sketch is None:
+                    sketch = shard.sketches[key] = HyperLogLog(self.precision)
+                sketch.add(visitor)
+        self.hits += 1
+        return True
+
+    def _drain(self) -> tuple[Counter, dict[TrafficKey, HyperLogLog]]:
+        counts, sketches = Counter(), {}
+        for shard in self._shards:
+            with shard.lock:
+                shard_counts, shard.counts = shard.counts, Counter()
+                shard_sketches, shard.sketches = shard.sketches, {}
+            counts.update(shard_counts)
+            sketches.update(shard_sketches)
+        return counts, sketches
+
+    def _restore(self, counts: Counter, sketches: dict[TrafficKey, HyperLogLog]):
+        for key, count in counts.items():
+            shard = self._shard(key)
+            with shard.lock:
+                shard.counts[key] += count
+                current = shard.sketches.get(key)
+                shard.sketches[key] = sketches[key].merge(current) if current else sketches[key]
+
+    def pending(self) -> int:
+        return sum(len(shard.counts) for shard in self._shards)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self) -> bool:
+        counts, sketches = self._drain()
+        if not counts:
+            return True
+        try:
+            await self._write(counts, sketches)
+            self.flushes += 1
+            return True
+        except Exception:
+            logger.exception("Failed to flush %d traffic rollups; will retry", len(counts))
+            self._restore(counts, sketches)
+            return False
+
+    async def _write(self, counts: Counter, sketches: dict[TrafficKey, HyperLogLog]):
+        async with SessionLocal() as db:
+            # A post can be deleted between its views and the flush; drop those views
+            post_ids = {post_id for post_id, _ in counts if post_id is not None}
+            live_posts = set((await db.execute(
+                select(Post.id).where(Post.id.in_(post_ids))
+            )).scalars()) if post_ids else set()
+            keys = [key for key in counts if key[0] is None or key[0] in live_posts]
+            if not keys:
+                return
+            # Make sure every row exists first, then lock them: the sketch merge below is a
+            # read-modify-write, and another worker's flush must wait rather than overwrite it
+            await db.execute(
+                insert_ignoring_duplicates(Traffic, "visit_date", db.bind.dialect.name),
+                [{"post_id": post_id, "visit_date": day} for post_id, day in keys],
+            )
+            days = {day for _, day in keys}
+            rows = (await db.execute(
+                select(Traffic).where(
+                    Traffic.visit_date.in_(days),
+                    Traffic.post_id.in_(live_posts) | Traffic.post_id.is_(None),
+                ).with_for_update()
+            )).scalars().all()
+            existing = {(row.post_id, row.visit_date): row for row in rows}
+
+            for key in keys:
+                row = existing[key]
+                sketch = HyperLogLog.from_bytes(row.visitor_sketch, self.precision).merge(sketches[key])
+                row.visit_count = row.visit_count + counts[key]
+                row.unique_visitors = sketch.estimate()
+                row.visitor_sketch = sketch.to_bytes()
+            await db.commit()
+        self.rows_written += len(keys)
+
+    def stats(self) -> dict:
+        return {"pending": self.pending(), "hits": self.hits, "dropped": self.dropped,
+                "flushes": self.flushes, "rows_written": self.rows_written}
+
+
+traffic = TrafficAggregator(settings.traffic_flush_seconds, settings.traffic_counter_shards,
+                            settings.traffic_hll_precision, settings.traffic_max_pending_keys)
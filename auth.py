@@ -1,14 +1,18 @@
+import uuid
 from datetime import timedelta, datetime
-from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
-from database import SessionLocal
+from config import settings
+from database import get_db
+from hashing import password_hasher
 from models import Users
-from passlib.context import CryptContext
+from ratelimit import RateLimiter, enforce
+from tokens import claims_cache, revocation_list
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
 
 
 
@@ -20,8 +24,8 @@ router = APIRouter(
 SECRET_KEY = "1234jbknf3u40i5ont02038j13oljo3rj0358031234jbknf3u40i5ont02038j"
 ALGORITHM = "HS256"
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token", auto_error=False)
 
 class CreateUserRequest(BaseModel):
     username: str
@@ -30,65 +34,142 @@ class CreateUserRequest(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+
+username_limiter = RateLimiter(settings.login_attempts_per_username, settings.login_window_seconds)
+ip_limiter = RateLimiter(settings.login_attempts_per_ip, settings.login_window_seconds)
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_user(db: db_dependency,
-                      create_user_request: CreateUserRequest):
+                      create_user_request: CreateUserRequest,
+                      request: Request):
+    enforce(ip_limiter, client_ip(request), "Too many attempts from this address")
     create_user_model = Users(
         username=create_user_request.username,
-        hashed_password=bcrypt_context.hash(create_user_request.password),
+        hashed_password=await password_hasher.hash(create_user_request.password),
     )
 
     db.add(create_user_model)
-    db.commit()
+    await db.commit()
 
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-                                 db: db_dependency):
-    user = authenticate_user(form_data.username, form_data.password, db)
+                                 db: db_dependency,
+                                 request: Request):
+    # Throttle before touching bcrypt so floods can't monopolise the hashing pool
+    enforce(ip_limiter, client_ip(request), "Too many attempts from this address")
+    enforce(username_limiter, form_data.username.lower(), "Too many attempts for this user")
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, 
                             detail="Incorrect username or password")
-    token = create_access_token(user.username, user.id, user.role, timedelta(minutes=20))
-    return {"access_token": token, "token_type": "bearer"}
-
-
-def authenticate_user(username: str, password: str, db):
-    user = db.query(Users).filter(Users.username == username).first()
+    username_limiter.reset(form_data.username.lower())
+    return issue_tokens(user)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(body: RefreshRequest, db: db_dependency):
+    """Trades a refresh token for a new token pair without re-running bcrypt."""
+    claims = decode_token(body.refresh_token, expected_type="refresh")
+    user = await db.get(Users, claims["id"])
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                            detail="Could not validate user.")
+    # Refresh tokens are single use: rotate on every exchange (tokens minted without a jti can't be)
+    if claims.get("jti"):
+        revocation_list.revoke(claims["jti"], claims["exp"])
+    return issue_tokens(user)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(token: Annotated[str, Depends(oauth2_scheme)],
+                 body: Optional[RefreshRequest] = None):
+    claims = decode_token(token, expected_type="access")
+    # Legacy tokens carry no jti and can only run out
+    if claims.get("jti"):
+        revocation_list.revoke(claims["jti"], claims["exp"])
+    if body is not None:
+        refresh_claims = decode_token(body.refresh_token, expected_type="refresh")
+        if refresh_claims.get("jti"):
+            revocation_list.revoke(refresh_claims["jti"], refresh_claims["exp"])
+
+
+async def authenticate_user(username: str, password: str, db: AsyncSession):
+    result = await db.execute(select(Users).where(Users.username == username))
+    user = result.scalars().first()
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.hashed_password):
+    # Give the connection back before waiting on the hashing pool; a login burst would hold the whole pool
+    await db.commit()
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     return user
 
 
-def create_access_token(username: str, user_id: int, role: str, expires_delta: timedelta):
-    encode = {"sub": username, "id": user_id, "role": role}
+def create_access_token(username: str, user_id: int, role: str, expires_delta: timedelta,
+                        token_type: str = "access"):
+    encode = {"sub": username, "id": user_id, "role": role,
+              "type": token_type, "jti": uuid.uuid4().hex}
     expires = datetime.utcnow() + expires_delta
     encode.update({"exp": expires})
+    from jose import jwt
+
     return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def issue_tokens(user: Users) -> dict:
+    access = create_access_token(user.username, user.id, user.role,
+                                 timedelta(minutes=settings.access_token_minutes))
+    refresh = create_access_token(user.username, user.id, user.role,
+                                  timedelta(days=settings.refresh_token_days), "refresh")
+    return {"access_token": access, "token_type": "bearer", "refresh_token": refresh}
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("id")
-        role: str = payload.get("role")
-        if username is None or user_id is None or role is None:
+
+def decode_token(token: str, expected_type: str = "access") -> dict:
+    """Verifies a token, serving repeat verifications from the claims cache."""
+    claims = claims_cache.get(token)
+    if claims is None:
+        # Imported here so cold starts don't pay for jose until a token shows up
+        from jose import JWTError, jwt
+
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, 
                                 detail="Could not validate user.")
-        return {"username": username, "id": user_id, "role": role}
-    except JWTError:
+        if claims.get("sub") is None or claims.get("id") is None or claims.get("role") is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, 
+                                detail="Could not validate user.")
+        claims_cache.put(token, claims)
+    # Tokens minted before refresh support carry no type and count as access tokens
+    if claims.get("type", "access") != expected_type or revocation_list.is_revoked(claims.get("jti")):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, 
-                            detail="Could not validate user.")
\ No newline at end of file
+                            detail="Could not validate user.")
+    return claims
+
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+    claims = decode_token(token)
+    return {"username": claims["sub"], "id": claims["id"], "role": claims["role"]}
+
+
+async def get_admin_user(user: Annotated[dict, Depends(get_current_user)]):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user
+
+
+async def get_optional_user(token: Annotated[Optional[str], Depends(optional_oauth2_scheme)]):
+    """Like get_current_user, but anonymous callers get None instead of a 401."""
+    if token is None:
+        return None
+    return await get_current_user(token)
@@ -0,0 +1,230 @@
+# bulk_posts.py
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+from datetime import date, datetime
+from itertools import islice
+from typing import AsyncIterator, Iterator, Optional, TextIO
+import anyio
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import delete, func, insert, select, update
+import feeds
+from cache import response_cache
+from config import settings
+from content import render
+from database import ReadSessionLocal, SessionLocal
+from models import Comment, Like, Post, RelatedPost, Traffic
+from schemas import PostImportRow
+from related import related_posts
+from search import index_posts_after, search_index
+
+MAX_ERROR_SAMPLES = 20
+
+EXPORT_COLUMNS = ("id", "category", "created_at", "title", "image1", "intro_content", "content1",
+                  "quote", "quote_author", "main_content", "image2", "final_content",
+                  "like_count", "comment_count")
+# Rows that reference a post; deleted alongside it since no cascade runs without ORM loads
+DEPENDENT_TABLES = (Comment, Like, Traffic, RelatedPost)
+
+
+# ---------------------------
+# Import
+# ---------------------------
+def iter_records(text: TextIO, fmt: str) -> Iterator[tuple[int, Optional[dict]]]:
+    """Yields (record number, dict) per CSV row or non-blank NDJSON line; None when unparseable."""
+    if fmt == "csv":
+        # csv reads quoted multi-line post bodies correctly as long as newline="" was used
+        for number, record in enumerate(csv.DictReader(text), 1):
+            # CSV has no nulls; an empty cell means the column wasn't set
+            yield number, {key: value for key, value in record.items() if value != ""}
+        return
+    number = 0
+    for line in text:
+        if line.strip():
+            number += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, record if isinstance(record, dict) else None
+
+
+def validate_chunk(records: Iterator, size: int, today: datetime) -> tuple[list[dict], list[str], bool]:
+    """Takes up to ``size`` records and returns (insertable rows, already rendered; errors; exhausted)."""
+    rows, errors, taken = [], [], 0
+    for number, record in islice(records, size):
+        taken += 1
+        if record is None:
+            errors.append(f"record {number}: not a JSON object")
+            continue
+        try:
+            row = PostImportRow.model_validate(record)
+        except ValidationError as error:
+            first = error.errors()[0]
+            errors.append(f"record {number}: {'.'.join(map(str, first['loc']))}: {first['msg']}")
+            continue
+        values = row.model_dump()
+        values["created_at"] = values["created_at"] or today
+        values.update(render(values))
+        rows.append(values)
+    return rows, errors, taken < size
+
+
+async def import_posts(text: TextIO, fmt: str) -> dict:
+    """Bulk-loads posts from a CSV/NDJSON stream, one executemany INSERT and commit per chunk.
+
+    Parsing runs in a worker thread a chunk at a time, so memory stays flat for
+    any file size. The search index is updated for the new rows at the end.
+    """
+    records = iter_records(text, fmt)
+    today = datetime.combine(date.today(), datetime.min.time())
+    inserted = invalid = 0
+    samples: list[str] = []
+    async with SessionLocal() as db:
+        last_id = await db.scalar(select(func.max(Post.id))) or 0
+        while True:
+            rows, errors, exhausted = await anyio.to_thread.run_sync(
+                validate_chunk, records, settings.post_bulk_batch_size, today)
+            invalid += len(errors)
+            samples = (samples + errors)[:MAX_ERROR_SAMPLES]
+            if rows:
+                await db.execute(insert(Post), rows)
+                await db.commit()
+                inserted += len(rows)
+            if exhausted:
+                break
+        if inserted:
+            await index_posts_after(db, last_id)
+            new_last_id = await db.scalar(select(func.max(Post.id)))
+    if inserted:
+        response_cache.invalidate("posts:list", "posts:recent", "feeds",
+                                  *feeds.sitemap_namespaces(last_id + 1, new_last_id))
+        # Too many rows to re-rank one by one; run `python related.py` to place them
+        related_posts.reset()
+    return {"inserted": inserted, "invalid": invalid, "errors": samples}
+
+
+# ---------------------------
+# Export
+# ---------------------------
+async def export_posts(fmt: str) -> AsyncIterator[bytes]:
+    """Streams the whole posts table through a server-side cursor, one batch in memory at a time."""
+    if fmt == "csv":
+        yield (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+    columns = [getattr(Post, name) for name in EXPORT_COLUMNS]
+    async with ReadSessionLocal() as db:
+        result = await db.stream(
+            select(*columns).order_by(Post.id)
+            .execution_options(yield_per=settings.post_bulk_batch_size)
+        )
+        async for rows in result.partitions():
+            if fmt == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                yield buffer.getvalue().encode()
+            else:
+                yield b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows)
+
+
+# ---------------------------
+# Batch operations
+# ---------------------------
+def selection_filter(ids: Optional[list[int]], category: Optional[str]):
+    return Post.id.in_(ids) if ids is not None else Post.category == category
+
+
+async def _matching_ids(db, condition) -> list[int]:
+    # Only ids: the cache and search index need to know which posts changed
+    return list((await db.execute(select(Post.id).where(condition))).scalars())
+
+
+def _forget(post_ids: list[int], removed: bool):
+    related_posts.reset()
+    # Only removals change the sitemap; a new category shows up in the feeds alone
+    sitemap = feeds.sitemap_namespaces(*post_ids) if removed else []
+    response_cache.invalidate("posts:list", "posts:recent", "related", "feeds", *sitemap,
+                              *(f"post:{post_id}" for post_id in post_ids),
+                              *(f"comments:{post_id}" for post_id in post_ids))
+
+
+async def delete_posts(ids: Optional[list[int]] = None, category: Optional[str] = None) -> int:
+    """Deletes the selected posts and their comments, likes and traffic in one transaction."""
+    condition = selection_filter(ids, category)
+    async with SessionLocal() as db:
+        post_ids = await _matching_ids(db, condition)
+        if not post_ids:
+            return 0
+        selected = select(Post.id).where(condition).scalar_subquery()
+        for model in DEPENDENT_TABLES:
+            await db.execute(delete(model).where(model.post_id.in_(selected)))
+        await db.execute(delete(RelatedPost).where(RelatedPost.related_id.in_(selected)))
+        await db.execute(delete(Post).where(condition))
+        await db.commit()
+    _forget(post_ids, removed=True)
+    await anyio.to_thread.run_sync(search_index.delete_many, post_ids)
+    return len(post_ids)
+
+
+async def change_category(new_category: str, ids: Optional[list[int]] = None,
+                          category: Optional[str] = None) -> int:
+    """Moves the selected posts to ``new_category`` with a single UPDATE."""
+    condition = selection_filter(ids, category)
+    async with SessionLocal() as db:
+        post_ids = await _matching_ids(db, condition)
+        if not post_ids:
+            return 0
+        await db.execute(update(Post).where(condition).values(category=new_category))
+        await db.commit()
+    _forget(post_ids, removed=False)
+    await anyio.to_thread.run_sync(search_index.set_category, post_ids, new_category)
+    return len(post_ids)
+
+
+# ---------------------------
+# Command line
+# ---------------------------
+def parse_ids(value: str) -> list[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+async def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk post import, export and batch edits")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_command = commands.add_parser("import", help="load posts from a CSV or NDJSON file")
+    import_command.add_argument("path")
+    import_command.add_argument("--format", choices=("csv", "ndjson"))
+
+    export_command = commands.add_parser("export", help="write every post to stdout")
+    export_command.add_argument("--format", choices=("csv", "ndjson"), default="ndjson")
+
+    for name, help_text in (("delete", "delete posts"), ("recategorize", "move posts to a category")):
+        command = commands.add_parser(name, help=help_text)
+        selector = command.add_mutually_exclusive_group(required=True)
+        selector.add_argument("--ids", type=parse_ids, help="comma-separated post ids")
+        selector.add_argument("--category")
+        if name == "recategorize":
+            command.add_argument("--to", required=True, dest="new_category")
+
+    args = parser.parse_args(argv)
+    if args.command == "import":
+        fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+        with open(args.path, encoding="utf-8-sig", newline="") as text:
+            result = await import_posts(text, fmt)
+        print(json.dumps(result, indent=2))
+    elif args.command == "export":
+        async for chunk in export_posts(args.format):
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.flush()
+    elif args.command == "delete":
+        print("Deleted", await delete_posts(args.ids, args.category), "posts")
+    else:
+        print("Moved", await change_category(args.new_category, args.ids, args.category), "posts")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
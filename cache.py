@@ -0,0 +1,237 @@
+# cache.py
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Optional
+from fastapi import Request, Response
+from config import settings
+from serialization import compress, negotiate_encoding, to_json
+
+
+class CacheBackend:
+    """Key/value store behind the response cache."""
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU with per-entry TTL. Safe to share between threadpool workers."""
+
+    def __init__(self, max_entries: int = settings.cache_max_entries):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[Optional[float], Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class RedisCache(CacheBackend):
+    """Shared store so every worker sees the same entries and invalidations."""
+
+    def __init__(self, url: str = settings.cache_url):
+        import redis  # optional dependency, only needed when cache_backend is "redis"
+
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._client.get(key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(key, pickle.dumps(value), ex=ttl)
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def stats(self):
+        info = self._client.info("stats")
+        return {
+            "backend": "redis",
+            "entries": self._client.dbsize(),
+            "evictions": info.get("evicted_keys", 0),
+            "expirations": info.get("expired_keys", 0),
+        }
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    last_modified: float
+    media_type: str = "application/json"
+    # Compressed copies of body, filled on first request for each encoding
+    encoded: dict = field(default_factory=dict, repr=False)
+
+    def _etag_for(self, encoding: Optional[str]) -> str:
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+    def is_fresh_for(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            if if_none_match.strip() == "*":
+                return True
+            tags = {tag.strip() for tag in if_none_match.split(",")}
+            return any(self._etag_for(encoding) in tags for encoding in (None, "br", "gzip"))
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(self.last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def to_response(self, request: Request) -> Response:
+        encoding = None
+        if len(self.body) >= settings.compression_minimum_size:
+            encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        headers = {
+            "ETag": self._etag_for(encoding),
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            # Clients may keep a copy but must revalidate, which is a cheap 304 from here
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if self.is_fresh_for(request):
+            return Response(status_code=304, headers=headers)
+        if encoding is None:
+            return Response(content=self.body, media_type=self.media_type, headers=headers)
+        # Compress once per entry and encoding rather than on every hit
+        body = self.encoded.get(encoding)
+        if body is None:
+            body = self.encoded[encoding] = compress(self.body, encoding)
+        headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=self.media_type, headers=headers)
+
+
+class ResponseCache:
+    """Caches serialized JSON bodies per route and parameters.
+
+    Keys are grouped into namespaces ("posts:list", "post:42", ...). Each namespace
+    carries a version token that is part of every key built in it, so invalidating
+    a namespace is a single write that makes all of its old entries unreachable;
+    they then age out through TTL/LRU. Build the key *before* querying the
+    database so a response computed from data that a concurrent write replaced is
+    stored under the superseded version and never served.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: int = settings.cache_ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _version(self, namespace: str) -> str:
+        version_key = f"version:{namespace}"
+        version = self.backend.get(version_key)
+        if version is None:
+            # Unknown or evicted: start a fresh generation rather than reuse an old one
+            version = self._new_version(version_key)
+        return version
+
+    def _new_version(self, version_key: str) -> str:
+        version = format(time.time_ns(), "x")
+        self.backend.set(version_key, version)
+        return version
+
+    def key(self, namespace: str, **params) -> str:
+        encoded = "&".join(f"{name}={params[name]}" for name in sorted(params))
+        return f"response:{namespace}@{self._version(namespace)}?{encoded}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def store(self, key: str, data: Any, model: Optional[Any] = None) -> CachedResponse:
+        """Serializes ``data`` (through ``model``'s serializer when given) and caches it."""
+        return self.store_body(key, to_json(data, model))
+
+    def store_body(self, key: str, body: bytes, media_type: str = "application/json",
+                   ttl: Optional[int] = None, last_modified: Optional[float] = None) -> CachedResponse:
+        """Caches an already rendered body; ``ttl`` overrides the default lifetime and
+        ``last_modified`` (a timestamp, default now) should be when its content last changed."""
+        entry = CachedResponse(
+            body=body,
+            etag='"' + hashlib.sha1(body).hexdigest() + '"',
+            last_modified=time.time() if last_modified is None else last_modified,
+            media_type=media_type,
+        )
+        self.backend.set(key, entry, ttl or self.ttl)
+        return entry
+
+    def invalidate(self, *namespaces: str) -> None:
+        for namespace in namespaces:
+            self._new_version(f"version:{namespace}")
+        self.invalidations += len(namespaces)
+
+    def stats(self) -> dict:
+        return {
+            **self.backend.stats(),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+def build_backend() -> CacheBackend:
+    if settings.cache_backend == "redis":
+        return RedisCache(settings.cache_url)
+    return MemoryCache(settings.cache_max_entries)
+
+
+response_cache = ResponseCache(build_backend())
@@ -0,0 +1,218 @@
+# content.py
+import argparse
+import asyncio
+import hashlib
+import html
+import math
+import re
+from html.parser import HTMLParser
+from typing import Optional
+import anyio
+from sqlalchemy import select, update
+from cache import response_cache
+from config import settings
+from database import SessionLocal
+from models import Post
+
+# Bump when the output of render() changes; `python content.py` re-renders older rows
+RENDER_VERSION = 1
+
+SOURCE_FIELDS = ("intro_content", "content1", "quote", "quote_author", "main_content", "final_content")
+
+ALLOWED_TAGS = frozenset({"p", "br", "strong", "b", "em", "i", "u", "s", "a", "ul", "ol", "li",
+                          "h2", "h3", "h4", "blockquote", "code", "pre"})
+BLOCK_TAGS = frozenset({"p", "br", "ul", "ol", "li", "h2", "h3", "h4", "blockquote", "pre"})
+# Dropped together with everything inside them
+DROPPED_TAGS = frozenset({"script", "style", "iframe", "object", "embed", "template", "noscript",
+                          "svg", "math"})
+SAFE_SCHEMES = ("http:", "https:", "mailto:")
+HAS_BLOCKS = re.compile(r"<\s*(p|ul|ol|h[2-4]|blockquote|pre)\b", re.IGNORECASE)
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+CONTROL_CHARS = re.compile(r"[\x00-\x20\x7f]")
+WORD = re.compile(r"\w+(?:['’-]\w+)*")
+
+
+class Sanitizer(HTMLParser):
+    """Keeps an allowlist of tags (links only with safe hrefs) and escapes everything else.
+
+    The visible text is collected alongside, with a space at each block
+    boundary, for the excerpt and word count.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.html: list[str] = []
+        self.text: list[str] = []
+        self.open: list[str] = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(" ")
+        if tag == "br":
+            self.html.append("<br>")
+            return
+        if tag == "a":
+            # Browsers ignore whitespace and control characters inside a scheme ("java\tscript:")
+            href = CONTROL_CHARS.sub("", dict(attrs).get("href") or "")
+            scheme = href.split("/", 1)[0].lower()
+            if ":" in scheme and not scheme.startswith(SAFE_SCHEMES):
+                href = ""
+            self.html.append(f'<a href="{html.escape(href)}" rel="nofollow noopener">' if href else "<a>")
+        else:
+            self.html.append(f"<{tag}>")
+        self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag not in DROPPED_TAGS:
+            self.handle_starttag(tag, attrs)
+            if tag != "br" and self.open and self.open[-1] == tag:
+                self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in self.open:
+            return
+        # Closing an outer tag closes whatever was left open inside it
+        while self.open:
+            inner = self.open.pop()
+            self.html.append(f"</{inner}>")
+            if inner == tag:
+                break
+        if tag in BLOCK_TAGS:
+            self.text.append(" ")
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.html.append(html.escape(data, quote=False))
+            self.text.append(data)
+
+    def close(self):
+        super().close()
+        while self.open:
+            self.html.append(f"</{self.open.pop()}>")
+
+
+def sanitize(fragment: str) -> tuple[str, str]:
+    """(safe HTML, plain text) for one field.
+
+    Fields without block markup are treated as plain text: blank lines start a
+    new paragraph and single newlines become <br>.
+    """
+    if not HAS_BLOCKS.search(fragment):
+        paragraphs = [part.strip() for part in PARAGRAPH_BREAK.split(fragment) if part.strip()]
+        fragment = "".join(f"<p>{part.replace(chr(10), '<br>')}</p>" for part in paragraphs)
+    parser = Sanitizer()
+    parser.feed(fragment)
+    parser.close()
+    return "".join(parser.html), " ".join("".join(parser.text).split())
+
+
+def excerpt_of(text: str, length: int) -> str:
+    if len(text) <= length:
+        return text
+    cut = text[:length + 1].rsplit(" ", 1)[0] if " " in text[:length] else text[:length]
+    return cut.rstrip(" ,;:.-–—") + "…"
+
+
+def content_hash(fields: dict) -> str:
+    source = "\x1f".join(fields.get(name) or "" for name in SOURCE_FIELDS)
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def render(fields: dict) -> dict:
+    """The stored HTML body, excerpt and reading stats for a post's source fields."""
+    parts, texts = [], []
+    for name in ("intro_content", "content1", "quote", "main_content", "final_content"):
+        value = fields.get(name)
+        if not value or not value.strip():
+            continue
+        body, text = sanitize(value)
+        if name == "quote":
+            author = (fields.get("quote_author") or "").strip()
+            footer = f"<footer>{html.escape(author, quote=False)}</footer>" if author else ""
+            body = f"<blockquote>{body}{footer}</blockquote>"
+        parts.append(body)
+        texts.append((name, text))
+    plain = " ".join(text for _, text in texts)
+    # The intro is written as a lead-in; fall back to the body when a post has none
+    lead = next((text for name, text in texts if name == "intro_content"), plain)
+    words = len(WORD.findall(plain))
+    return {
+        "body_html": "\n".join(parts),
+        "excerpt": excerpt_of(lead, settings.post_excerpt_length),
+        "word_count": words,
+        "reading_minutes": math.ceil(words / settings.reading_words_per_minute) if words else 0,
+        "content_hash": content_hash(fields),
+        "render_version": RENDER_VERSION,
+    }
+
+
+def render_post(post) -> bool:
+    """Re-renders a Post in place if its source changed since the last render; True when it did."""
+    fields = {name: getattr(post, name) for name in SOURCE_FIELDS}
+    if post.render_version == RENDER_VERSION and post.content_hash == content_hash(fields):
+        return False
+    for name, value in render(fields).items():
+        setattr(post, name, value)
+    return True
+
+
+def _render_batch(rows) -> list[dict]:
+    return [{"id": row.id, **render(row._asdict())} for row in rows]
+
+
+async def rerender(force: bool = False, batch_size: Optional[int] = None) -> int:
+    """Renders every post whose stored output is missing or from an older RENDER_VERSION.
+
+    Walks posts by id a batch at a time; each batch is rendered on a worker
+    thread and written with one executemany UPDATE and commit. Cached pages are
+    invalidated through ``response_cache``, which only reaches running servers
+    when they share it (``cache_backend = "redis"``); with the per-process memory
+    backend they keep serving the old output until ``cache_ttl`` (``feed_cache_ttl``
+    for feeds) runs out, or until they restart.
+    """
+    batch_size = batch_size or settings.post_bulk_batch_size
+    columns = [Post.id, *(getattr(Post, name) for name in SOURCE_FIELDS)]
+    stale = Post.render_version < RENDER_VERSION
+    rendered = last_id = 0
+    async with SessionLocal() as db:
+        while True:
+            query = select(*columns).where(Post.id > last_id)
+            if not force:
+                query = query.where(stale)
+            rows = (await db.execute(query.order_by(Post.id).limit(batch_size))).all()
+            if not rows:
+                break
+            values = await anyio.to_thread.run_sync(_render_batch, rows)
+            await db.execute(update(Post), values)
+            await db.commit()
+            rendered += len(values)
+            last_id = rows[-1].id
+            response_cache.invalidate(*(f"post:{row.id}" for row in rows))
+    if rendered:
+        response_cache.invalidate("posts:list", "posts:recent", "feeds")
+    return rendered
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Render stored post HTML, excerpts and reading stats")
+    parser.add_argument("--all", action="store_true", help="re-render every post, not just stale ones")
+    parser.add_argument("--batch-size", type=int)
+    args = parser.parse_args()
+    count = await rerender(force=args.all, batch_size=args.batch_size)
+    print(f"Rendered {count} posts at render version {RENDER_VERSION}")
+    if count and settings.cache_backend == "memory":
+        print(f"Running servers keep their cached pages for up to {settings.cache_ttl}s "
+              f"(feeds {settings.feed_cache_ttl}s); restart them to serve the new output now")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+# counters.py
+import asyncio
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import SessionLocal
+from models import Comment, Like, Post
+
+
+async def bump_counter(db: AsyncSession, post_id: int, column, delta: int) -> bool:
+    """Adjusts a Post counter in the caller's transaction; False if the post doesn't exist."""
+    result = await db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values({column: column + delta})
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+async def reconcile_post_counters(db: AsyncSession) -> int:
+    """Recomputes like_count/comment_count from the source tables, fixing only drifted rows."""
+    like_total = (
+        select(func.count(Like.id)).where(Like.post_id == Post.id).scalar_subquery()
+    )
+    comment_total = (
+        select(func.count(Comment.id)).where(Comment.post_id == Post.id).scalar_subquery()
+    )
+    result = await db.execute(
+        update(Post)
+        .where(or_(Post.like_count != like_total, Post.comment_count != comment_total))
+        .values(like_count=like_total, comment_count=comment_total)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def main():
+    async with SessionLocal() as db:
+        repaired = await reconcile_post_counters(db)
+    print("Reconciled counters on", repaired, "posts")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,22 +1,23 @@
 # create_admin.py
+import asyncio
 from database import SessionLocal  
 from models import Users           
-from passlib.context import CryptContext
+from hashing import get_bcrypt_context
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def create_admin(username: str, raw_password: str, db):
-    hashed = bcrypt_context.hash(raw_password)
+async def create_admin(username: str, raw_password: str, db):
+    hashed = get_bcrypt_context().hash(raw_password)
     user = Users(username=username, hashed_password=hashed, role="admin")
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
+async def main():
+    async with SessionLocal() as db:
+        username = "admin"
+        password = "admin12345"
+        user = await create_admin(username, password, db)
+        print("Created admin:", user.id, user.username)
+
 if __name__ == "__main__":
-    db = SessionLocal()
-    username = "admin"
-    password = "admin12345"
-    user = create_admin(username, password, db)
-    print("Created admin:", user.id, user.username)
-    db.close()
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,222 @@
+# feeds.py
+import re
+from datetime import date, datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
+from xml.sax.saxutils import escape, quoteattr
+from fastapi import Request
+from sqlalchemy import desc, func, select, text
+from cache import CachedResponse, response_cache
+from config import settings
+from database import ReadSessionLocal
+from models import Post
+from uploads import public_base
+
+# RSS and Atom live under "feeds"; the sitemap (or its index) under "sitemap" and each
+# shard under "sitemap:<n>", so a new post doesn't throw away every other shard
+NAMESPACE = "feeds"
+SITEMAP_NAMESPACE = "sitemap"
+RSS_TYPE = "application/rss+xml"
+ATOM_TYPE = "application/atom+xml"
+SITEMAP_TYPE = "application/xml"
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+# Control characters XML 1.0 can't carry even escaped; one in a title would break the whole feed
+INVALID_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def site_base(request: Request) -> str:
+    return (settings.site_url or public_base(request)).rstrip("/")
+
+
+def xml_text(value: Optional[str]) -> str:
+    return escape(INVALID_XML.sub("", value or ""))
+
+
+def post_link(base: str, post_id: int) -> str:
+    return settings.post_url.format(base_url=base, post_id=post_id)
+
+
+def as_utc(value) -> datetime:
+    # Posts created through the API store a date; imported ones may carry a time
+    if not isinstance(value, datetime):
+        value = datetime.combine(value or date.today(), datetime.min.time())
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def newest(dates) -> float:
+    """Timestamp of the latest date, used as a document's Last-Modified."""
+    return max((as_utc(value) for value in dates), default=as_utc(None)).timestamp()
+
+
+# ---------------------------
+# Builders
+# ---------------------------
+async def recent_posts(db) -> list:
+    """Newest posts first, as on /posts/recent, with the stored excerpt instead of the body."""
+    result = await db.execute(
+        select(Post.id, Post.title, Post.category, Post.excerpt, Post.created_at)
+        .order_by(desc(Post.created_at), desc(Post.id))
+        .limit(settings.feed_items)
+    )
+    return result.all()
+
+
+def build_rss(posts: list, base: str) -> bytes:
+    # Dated by the newest post rather than the build, so a rebuild of unchanged data keeps its ETag
+    updated = format_datetime(as_utc(posts[0].created_at) if posts else as_utc(None))
+    items = "".join(
+        "<item>"
+        f"<title>{xml_text(post.title)}</title>"
+        f"<link>{escape(post_link(base, post.id))}</link>"
+        f'<guid isPermaLink="true">{escape(post_link(base, post.id))}</guid>'
+        f"<pubDate>{format_datetime(as_utc(post.created_at))}</pubDate>"
+        f"<category>{xml_text(post.category)}</category>"
+        f"<description>{xml_text(post.excerpt)}</description>"
+        "</item>"
+        for post in posts
+    )
+    return (
+        f'{XML_DECLARATION}<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+        f"<title>{xml_text(settings.site_title)}</title>"
+        f"<link>{escape(base)}/</link>"
+        f"<description>{xml_text(settings.site_description)}</description>"
+        f'<atom:link href={quoteattr(base + "/feed.xml")} rel="self" type="{RSS_TYPE}"/>'
+        f"<lastBuildDate>{updated}</lastBuildDate>"
+        f"{items}</channel></rss>\n"
+    ).encode()
+
+
+def build_atom(posts: list, base: str) -> bytes:
+    updated = (as_utc(posts[0].created_at) if posts else as_utc(None)).isoformat()
+    entries = "".join(
+        "<entry>"
+        f"<title>{xml_text(post.title)}</title>"
+        f"<link href={quoteattr(post_link(base, post.id))}/>"
+        f"<id>{escape(post_link(base, post.id))}</id>"
+        f"<updated>{as_utc(post.created_at).isoformat()}</updated>"
+        f"<category term={quoteattr(INVALID_XML.sub('', post.category))}/>"
+        f"<summary>{xml_text(post.excerpt)}</summary>"
+        "</entry>"
+        for post in posts
+    )
+    return (
+        f'{XML_DECLARATION}<feed xmlns="http://www.w3.org/2005/Atom">'
+        f"<title>{xml_text(settings.site_title)}</title>"
+        f"<subtitle>{xml_text(settings.site_description)}</subtitle>"
+        f"<link href={quoteattr(base + '/')}/>"
+        f'<link href={quoteattr(base + "/atom.xml")} rel="self"/>'
+        f"<id>{escape(base)}/</id>"
+        f"<updated>{updated}</updated>"
+        f"<author><name>{xml_text(settings.site_title)}</name></author>"
+        f"{entries}</feed>\n"
+    ).encode()
+
+
+def build_urlset(rows: list, base: str, include_home: bool) -> bytes:
+    urls = [f"<url><loc>{escape(base)}/</loc></url>"] if include_home else []
+    urls.extend(f"<url><loc>{escape(post_link(base, row.id))}</loc>"
+                f"<lastmod>{as_utc(row.created_at).date().isoformat()}</lastmod></url>"
+                for row in rows)
+    return f'{XML_DECLARATION}<urlset xmlns="{SITEMAP_NS}">{"".join(urls)}</urlset>\n'.encode()
+
+
+def build_sitemap_index(shards: list, base: str) -> bytes:
+    entries = "".join(f"<sitemap><loc>{escape(base)}/sitemaps/posts-{shard}.xml</loc>"
+                      f"<lastmod>{as_utc(newest).date().isoformat()}</lastmod></sitemap>"
+                      for shard, newest in shards)
+    return f'{XML_DECLARATION}<sitemapindex xmlns="{SITEMAP_NS}">{entries}</sitemapindex>\n'.encode()
+
+
+def shard_width() -> int:
+    # Shard 0 also lists the home page, so every shard leaves room for one extra URL
+    return settings.sitemap_max_urls - 1
+
+
+def shard_of(post_id: int) -> int:
+    return (post_id - 1) // shard_width()
+
+
+def sitemap_namespaces(*post_ids: int) -> list[str]:
+    """Cache namespaces to drop when posts are added or removed: the sitemap itself and
+    the shards spanning ``post_ids``. Edits leave both alone, as a URL's id and date never change."""
+    if not post_ids:
+        return []
+    shards = range(shard_of(min(post_ids)), shard_of(max(post_ids)) + 1)
+    return [SITEMAP_NAMESPACE, *(f"{SITEMAP_NAMESPACE}:{shard}" for shard in shards)]
+
+
+async def sitemap_rows(db, shard: Optional[int] = None) -> list:
+    """Post ids and dates, all of them or one shard's id range.
+
+    Shards are fixed id ranges rather than offsets: new posts only ever touch
+    the last shard, and a shard is read with one range scan of the primary key.
+    """
+    query = select(Post.id, Post.created_at)
+    if shard is not None:
+        query = query.where(Post.id > shard * shard_width(), Post.id <= (shard + 1) * shard_width())
+    return (await db.execute(query.order_by(Post.id))).all()
+
+
+async def build_sitemap(db, base: str) -> tuple[bytes, float]:
+    """The whole urlset while it fits in one file, else an index of per-shard sitemaps."""
+    total = await db.scalar(select(func.count()).select_from(Post))
+    if total + 1 <= settings.sitemap_max_urls:
+        rows = await sitemap_rows(db)
+        return build_urlset(rows, base, include_home=True), newest(row.created_at for row in rows)
+    shard = ((Post.id - 1) // shard_width()).label("shard")
+    # Grouped by the alias: repeating the expression would bind its parameters afresh, and
+    # MySQL's ONLY_FULL_GROUP_BY then no longer sees the select list and GROUP BY as the same
+    shards = (await db.execute(
+        select(shard, func.max(Post.created_at)).group_by(text("shard")).order_by(shard)
+    )).all()
+    return build_sitemap_index(shards, base), newest(latest for _, latest in shards)
+
+
+async def build_sitemap_shard(db, base: str, shard: int) -> Optional[tuple[bytes, float]]:
+    rows = await sitemap_rows(db, shard)
+    if not rows and shard > 0:
+        return None
+    return build_urlset(rows, base, include_home=shard == 0), newest(row.created_at for row in rows)
+
+
+# ---------------------------
+# Serving
+# ---------------------------
+FEEDS = {"rss": (RSS_TYPE, build_rss), "atom": (ATOM_TYPE, build_atom)}
+
+
+async def cached_document(name: str, base: str, shard: Optional[int] = None) -> Optional[CachedResponse]:
+    """The prebuilt blob for a feed or sitemap, built from the database only on a miss.
+
+    Blobs live in the response cache under the namespaces above; a hit (and the
+    304 it usually turns into) runs no query at all. Last-Modified is the newest
+    post date in the document, so a rebuild of unchanged data keeps it.
+    """
+    if name in FEEDS:
+        namespace = NAMESPACE
+    else:
+        namespace = SITEMAP_NAMESPACE if shard is None else f"{SITEMAP_NAMESPACE}:{shard}"
+    key = response_cache.key(namespace, name=name, base=base, shard=shard)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+    async with ReadSessionLocal() as db:
+        if name in FEEDS:
+            media_type, build = FEEDS[name]
+            posts = await recent_posts(db)
+            built = build(posts, base), newest(post.created_at for post in posts)
+        elif shard is None:
+            media_type, built = SITEMAP_TYPE, await build_sitemap(db, base)
+        else:
+            media_type, built = SITEMAP_TYPE, await build_sitemap_shard(db, base, shard)
+            if built is None:
+                return None
+    body, last_modified = built
+    return response_cache.store_body(key, body, media_type, settings.feed_cache_ttl, last_modified)
+
+
+async def rebuild(base: str):
+    """Warms the feeds and the sitemap after a post write, so pollers hit a ready blob."""
+    for name in (*FEEDS, "sitemap"):
+        await cached_document(name, base)
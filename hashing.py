@@ -0,0 +1,85 @@
+# hashing.py
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, status
+from config import settings
+
+_bcrypt_context = None
+
+
+def get_bcrypt_context():
+    # passlib is imported on the first hash, not at startup
+    global _bcrypt_context
+    if _bcrypt_context is None:
+        from passlib.context import CryptContext
+
+        _bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _bcrypt_context
+
+
+def _hash(password: str) -> str:
+    return get_bcrypt_context().hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return get_bcrypt_context().verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop on a bounded pool.
+
+    At most ``max_workers`` hashes run at once and ``max_pending`` more may wait;
+    anything beyond that is refused with a 429 instead of queueing unboundedly.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, executor: str = "thread"):
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_pending
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor_kind = executor
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                # bcrypt releases the GIL while hashing, so threads scale across cores
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        # Only touched from the event loop thread, so the counter needs no lock
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                detail="Too many login attempts in progress, try again shortly",
+                                headers={"Retry-After": "1"})
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {"workers": self.max_workers, "capacity": self.capacity,
+                "in_flight": self.in_flight, "rejected": self.rejected}
+
+
+password_hasher = PasswordHasher(settings.hash_workers, settings.hash_max_pending,
+                                 settings.hash_executor)
@@ -0,0 +1,154 @@
+# images.py
+import asyncio
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import update
+from cache import response_cache
+from config import settings
+from database import SessionLocal
+from models import Post
+from uploads import IMAGE_EXTENSIONS, UPLOAD_DIR
+
+# Named derivative sizes (max width in px); originals narrower than a size are never upscaled
+VARIANT_WIDTHS = {"thumb": 320, "medium": 960, "full": 1920}
+VARIANT_FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+
+STORED_NAME = re.compile(r"^(?P<hash>[0-9a-f]{64})(?P<ext>\.[a-z]+)$")
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.image_workers)
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def variant_name(content_hash: str, width: int, fmt: str) -> str:
+    return f"{content_hash}.{width}.{'jpg' if fmt == 'jpeg' else fmt}"
+
+
+def stored_filename(url: Optional[str]) -> Optional[str]:
+    """Returns the content-addressed file name behind an upload URL, if it is one of ours."""
+    if not url:
+        return None
+    name = url.rsplit("/", 1)[-1]
+    return name if STORED_NAME.match(name) else None
+
+
+def original_path(content_hash: str) -> Optional[str]:
+    for extension in set(IMAGE_EXTENSIONS.values()):
+        path = os.path.join(UPLOAD_DIR, f"{content_hash}{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def render_variants(source_path: str, upload_dir: str, widths: list[int], formats: list[str],
+                    quality: int) -> dict:
+    """Writes resized copies of one image; runs in a worker process.
+
+    Returns {width: actual_width}. Variants already on disk are left alone, and
+    each file is written to a temp name and renamed so readers never see a
+    partial image.
+    """
+    from PIL import Image, ImageOps
+
+    content_hash = STORED_NAME.match(os.path.basename(source_path)).group("hash")
+    produced = {}
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        for width in widths:
+            target_width = min(width, original.width)
+            produced[width] = target_width
+            pending = [fmt for fmt in formats
+                       if not os.path.exists(os.path.join(upload_dir, variant_name(content_hash, width, fmt)))]
+            if not pending:
+                continue
+            height = max(1, round(original.height * target_width / original.width))
+            resized = original.resize((target_width, height), Image.LANCZOS)
+            for fmt in pending:
+                path = os.path.join(upload_dir, variant_name(content_hash, width, fmt))
+                image = resized
+                if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                temp_path = f"{path}.{os.getpid()}.part"
+                image.save(temp_path, VARIANT_FORMATS[fmt][0], quality=quality, optimize=True)
+                os.replace(temp_path, path)
+    return produced
+
+
+async def ensure_variants(filename: str, widths: Optional[list[int]] = None,
+                          formats: Optional[list[str]] = None) -> dict:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), render_variants, os.path.join(UPLOAD_DIR, filename), UPLOAD_DIR,
+        widths or list(VARIANT_WIDTHS.values()), formats or list(VARIANT_FORMATS),
+        settings.image_quality,
+    )
+
+
+async def build_variant_urls(filename: str, base_url: str) -> dict:
+    """Generates every named variant of an upload and returns their public URLs."""
+    content_hash = STORED_NAME.match(filename).group("hash")
+    produced = await ensure_variants(filename)
+    return {
+        name: {
+            "width": produced[width],
+            **{fmt: f"{base_url}/uploads/{variant_name(content_hash, width, fmt)}"
+               for fmt in VARIANT_FORMATS},
+        }
+        for name, width in VARIANT_WIDTHS.items()
+    }
+
+
+async def process_post_images(post_id: int, base_url: str, image1: Optional[str],
+                              image2: Optional[str]):
+    """Background task: renders derivatives for a post's uploads and records their URLs."""
+    values = {}
+    for column, filename in (("image1_variants", image1), ("image2_variants", image2)):
+        if filename and os.path.exists(os.path.join(UPLOAD_DIR, filename)):
+            try:
+                values[column] = await build_variant_urls(filename, base_url)
+            except Exception:
+                # Undecodable upload: the post keeps serving the original only
+                logger.exception("Could not render variants of %s", filename)
+    if not values:
+        return
+    async with SessionLocal() as db:
+        await db.execute(update(Post).where(Post.id == post_id).values(**values))
+        await db.commit()
+    response_cache.invalidate("posts:list", "posts:recent", f"post:{post_id}")
+
+
+def snap_width(requested: int) -> int:
+    """Rounds a requested width up to the nearest size we generate."""
+    for width in sorted(VARIANT_WIDTHS.values()):
+        if requested <= width:
+            return width
+    return max(VARIANT_WIDTHS.values())
+
+
+async def variant_path(content_hash: str, requested_width: int, fmt: str) -> str:
+    source = original_path(content_hash)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    width = snap_width(requested_width)
+    path = os.path.join(UPLOAD_DIR, variant_name(content_hash, width, fmt))
+    if not os.path.exists(path):
+        await ensure_variants(os.path.basename(source), [width], [fmt])
+    return path
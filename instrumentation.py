@@ -0,0 +1,186 @@
+# instrumentation.py
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, REGISTRY
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, QueryParams
+from config import settings
+from database import pool_stats
+
+slow_query_logger = logging.getLogger("slow_query")
+
+REQUESTS = Counter("http_requests_total", "Requests handled",
+                   ["method", "route", "status"])
+LATENCY = Histogram("http_request_duration_seconds", "Time to the response headers",
+                    ["method", "route"])
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled")
+STATEMENTS = Histogram("db_statements_per_request", "SQL statements issued per request",
+                       ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100))
+DB_TIME = Histogram("db_time_per_request_seconds", "Time spent in SQL per request", ["route"])
+STATEMENT_LATENCY = Histogram("db_statement_duration_seconds", "Latency of single SQL statements")
+
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_time")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_time = 0.0
+
+    @property
+    def route(self) -> str:
+        return route_name(self.scope)
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def route_name(scope) -> str:
+    """The matched route's template (e.g. /posts/{post_id}), so ids don't explode label cardinality."""
+    return getattr(scope.get("route"), "path_format", None) or "unmatched"
+
+
+# ---------------------------
+# SQL statement timing
+# ---------------------------
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own execution context, so a statement that fails leaves nothing behind
+    if context is not None:
+        context.query_start = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    STATEMENT_LATENCY.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+    if elapsed * 1000 >= settings.slow_query_ms:
+        slow_query_logger.warning("%.1fms [%s] %s", elapsed * 1000,
+                                  stats.route if stats else "background", statement[:500])
+
+
+def instrument_engines():
+    # Listening on the Engine class covers engines database.py hasn't built yet
+    if not event.contains(Engine, "before_cursor_execute", _before_execute):
+        event.listen(Engine, "before_cursor_execute", _before_execute)
+        event.listen(Engine, "after_cursor_execute", _after_execute)
+
+
+class PoolCollector:
+    """Reads pool occupancy and checkout waits at scrape time."""
+
+    def collect(self):
+        occupancy = GaugeMetricFamily("db_pool_connections", "Pool connections by state",
+                                      labels=["engine", "state"])
+        stats = pool_stats()
+        waits = stats.pop("wait")
+        for name, pool in stats.items():
+            for state in ("checked_in", "checked_out", "overflow"):
+                occupancy.add_metric([name, state], pool[state])
+        yield occupancy
+        yield CounterMetricFamily("db_pool_checkouts", "Pool checkouts", value=waits["checkouts"])
+        yield CounterMetricFamily("db_pool_wait_seconds", "Time spent waiting for a connection",
+                                  value=waits["wait_seconds_total"])
+
+
+REGISTRY.register(PoolCollector())
+
+
+# ---------------------------
+# Middleware
+# ---------------------------
+def _wants_profile(scope) -> bool:
+    if not settings.profiling_enabled:
+        return False
+    if QueryParams(scope.get("query_string", b"")).get("profile") != "1":
+        return False
+    from auth import decode_token
+
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        return decode_token(token)["role"] == "admin"
+    except Exception:
+        return False
+
+
+def server_timing(total: float, stats: RequestStats) -> bytes:
+    return (f'app;dur={total * 1000:.1f}, '
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"').encode()
+
+
+class InstrumentationMiddleware:
+    """Per-route latency, status and SQL counters, echoed back in Server-Timing.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streaming responses pass straight
+    through and the request's context variable is visible to SQLAlchemy events.
+    Admins can add ``?profile=1`` (when profiling_enabled is set) to get a
+    pyinstrument report in place of the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if _wants_profile(scope):
+            await self._profile(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        IN_FLIGHT.inc()
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter() - start
+                LATENCY.labels(scope["method"], stats.route).observe(elapsed)
+                message["headers"] = [*message.get("headers", []),
+                                      (b"server-timing", server_timing(elapsed, stats))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            IN_FLIGHT.dec()
+            route = stats.route
+            REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+            STATEMENTS.labels(route).observe(stats.queries)
+            DB_TIME.labels(route).observe(stats.db_time)
+            current_request.reset(token)
+
+    async def _profile(self, scope, receive, send):
+        from pyinstrument import Profiler
+
+        async def discard(message):
+            pass
+
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+        body = profiler.output_html().encode()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/html; charset=utf-8"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,134 @@
+# like_buffer.py
+import asyncio
+import logging
+from typing import Optional
+from sqlalchemy import delete, func, select, tuple_, update
+from cache import response_cache
+from config import settings
+from database import SessionLocal, insert_ignoring_duplicates
+from models import Like, Post
+from realtime import broker
+
+logger = logging.getLogger(__name__)
+
+
+class LikeBuffer:
+    """Write-behind queue for like/unlike clicks.
+
+    Events are coalesced per (user, post) so only the latest intent survives, then
+    written every ``interval`` seconds or as soon as ``max_events`` distinct pairs
+    are waiting, in one transaction of set-based statements. Until a pair has been
+    written, ``pending_state`` lets the acting user read their own click back.
+    """
+
+    def __init__(self, interval: float, max_events: int):
+        self.interval = interval
+        self.max_events = max_events
+        self._pending: dict[tuple[int, int], bool] = {}
+        self._in_flight: dict[tuple[int, int], bool] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.events = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def submit(self, user_id: int, post_id: int, liked: bool):
+        self._pending[(user_id, post_id)] = liked
+        self.events += 1
+        if len(self._pending) >= self.max_events:
+            self._wakeup.set()
+
+    def pending_state(self, user_id: int, post_id: int) -> Optional[bool]:
+        key = (user_id, post_id)
+        if key in self._pending:
+            return self._pending[key]
+        return self._in_flight.get(key)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._pending:
+            if not await self.flush():
+                break
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> bool:
+        if not self._pending:
+            return True
+        batch, self._pending = self._pending, {}
+        self._in_flight = batch
+        try:
+            await self._write(batch)
+            self.flushes += 1
+            return True
+        except Exception:
+            logger.exception("Failed to flush %d like events; will retry", len(batch))
+            # Newer clicks that arrived meanwhile win over the failed batch
+            self._pending = {**batch, **self._pending}
+            return False
+        finally:
+            self._in_flight = {}
+
+    async def _write(self, batch: dict[tuple[int, int], bool]):
+        async with SessionLocal() as db:
+            post_ids = {post_id for _, post_id in batch}
+            live_posts = set((await db.execute(
+                select(Post.id).where(Post.id.in_(post_ids))
+            )).scalars())
+            pairs = [pair for pair in batch if pair[1] in live_posts]
+            if not pairs:
+                return
+            existing = set((await db.execute(
+                select(Like.user_id, Like.post_id)
+                .where(tuple_(Like.user_id, Like.post_id).in_(pairs))
+            )).tuples())
+
+            to_insert = [pair for pair in pairs if batch[pair] and pair not in existing]
+            to_delete = [pair for pair in pairs if not batch[pair] and pair in existing]
+            touched = {post_id for _, post_id in to_insert + to_delete}
+            if to_insert:
+                await db.execute(
+                    insert_ignoring_duplicates(Like, "user_id", db.bind.dialect.name),
+                    [{"user_id": user_id, "post_id": post_id} for user_id, post_id in to_insert],
+                )
+            if to_delete:
+                await db.execute(
+                    delete(Like).where(tuple_(Like.user_id, Like.post_id).in_(to_delete))
+                )
+            if touched:
+                # Recounted rather than adjusted: a row another writer inserted or removed
+                # since the read above would otherwise skew the counter for good
+                await db.execute(
+                    update(Post).where(Post.id.in_(touched)).values(like_count=(
+                        select(func.count()).where(Like.post_id == Post.id).scalar_subquery()
+                    ))
+                )
+            await db.commit()
+        self.rows_written += len(to_insert) + len(to_delete)
+        for post_id in touched:
+            response_cache.invalidate(f"post:{post_id}")
+            broker.like_changed(post_id)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "events": self.events,
+                "flushes": self.flushes, "rows_written": self.rows_written}
+
+
+like_buffer = LikeBuffer(settings.like_flush_interval_ms / 1000, settings.like_flush_max_events)
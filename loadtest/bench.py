@@ -0,0 +1,614 @@
+# loadtest/bench.py
+"""In-process micro-benchmarks for the paths a traffic mix can't isolate.
+
+    python -m loadtest.bench                      # every benchmark, small sizes
+    python -m loadtest.bench fanout related --posts 50000
+
+Benchmarks run against a scratch SQLite database and search index in a temp
+directory (migrated to head), never the configured one. Results are printed
+and written as JSON under loadtest/results/, comparable with loadtest.compare.
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+BENCHMARKS = ("startup", "serialization", "fanout", "related", "import-posts",
+              "import-subscribers", "upload", "list", "static", "search", "likes", "login-burst")
+
+STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+client.__enter__()
+ready = time.perf_counter()
+assert client.get("/health").status_code == 200
+answered = time.perf_counter()
+client.__exit__(None, None, None)
+print(json.dumps({"import": imported - started, "lifespan": ready - imported,
+                  "first_request": answered - ready, "total": answered - started}))
+"""
+
+
+def timed(fn, repeat: int) -> float:
+    """Median wall time of ``repeat`` calls, in seconds."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def synthetic_posts(count: int, seed: int) -> list[dict]:
+    from loadtest.seed import posts
+
+    return list(posts(random.Random(seed), count, datetime(2025, 1, 1)))
+
+
+def bench_startup(args) -> dict:
+    """Cold import of main, lifespan startup and the first /health, each in a fresh interpreter."""
+    runs = []
+    for _ in range(args.repeat):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], capture_output=True,
+                                text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {f"{key}_seconds": round(statistics.median(run[key] for run in runs), 4) for key in runs[0]}
+
+
+def bench_serialization(args) -> dict:
+    """One page of PostResponse rows through the compiled model vs jsonable_encoder."""
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+    from main import PostResponse
+    from serialization import brotli, compress, to_json
+
+    rows = [SimpleNamespace(id=i, like_count=i % 97, comment_count=i % 13, image1=None, image2=None,
+                            image1_variants=None, image2_variants=None, **post)
+            for i, post in enumerate(synthetic_posts(args.rows, args.seed), 1)]
+    dicts = [PostResponse.model_validate(row).model_dump() for row in rows]
+    results = {}
+    for name, fn in (
+        ("compiled_model", lambda: to_json(rows, list[PostResponse])),
+        ("jsonable_encoder_orjson", lambda: orjson.dumps(jsonable_encoder(dicts))),
+        ("jsonable_encoder_json", lambda: json.dumps(jsonable_encoder(dicts)).encode()),
+    ):
+        seconds = timed(fn, args.repeat)
+        results[f"{name}_ms"] = round(seconds * 1000, 3)
+    results["rows"] = len(rows)
+    body = to_json(rows, list[PostResponse])
+    results["bytes"] = len(body)
+    # What CompressionMiddleware puts on the wire for the same page, at its configured levels
+    for encoding in ("gzip", "br") if brotli is not None else ("gzip",):
+        results[f"{encoding}_bytes"] = len(compress(body, encoding))
+        results[f"{encoding}_ms"] = round(timed(lambda: compress(body, encoding), args.repeat) * 1000, 3)
+    return results
+
+
+def bench_fanout(args) -> dict:
+    """Publish latency to ``--subscribers`` idle subscribers of one post, and their memory."""
+    from realtime import Broker, MemoryBackend
+
+    async def run():
+        broker = Broker(queue_size=64, max_subscribers=args.subscribers, like_interval=0.5)
+        broker.backend = MemoryBackend(broker._deliver)
+        tracemalloc.start()
+        subscriptions = [broker.subscribe(1) for _ in range(args.subscribers)]
+        received: list[float] = []
+
+        async def listen(subscription):
+            # Same wait as the SSE loop: idle until an event or the keepalive timeout
+            await subscription.get(60)
+            received.append(time.perf_counter())
+
+        listeners = [asyncio.create_task(listen(s)) for s in subscriptions]
+        await asyncio.sleep(0.1)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        started = time.perf_counter()
+        await broker.publish(1, "comment_created", {"id": 1, "content": "x" * 200})
+        published = time.perf_counter()
+        await asyncio.gather(*listeners)
+        received.sort()
+        return {
+            "subscribers": args.subscribers,
+            "publish_ms": round((published - started) * 1000, 2),
+            "delivered_p50_ms": round((received[len(received) // 2] - started) * 1000, 2),
+            "delivered_p99_ms": round((received[int(len(received) * 0.99) - 1] - started) * 1000, 2),
+            "delivered_all_ms": round((received[-1] - started) * 1000, 2),
+            "bytes_per_subscriber": memory // args.subscribers,
+        }
+
+    return asyncio.run(run())
+
+
+def bench_related(args) -> dict:
+    """Full related-posts build over ``--posts`` synthetic posts, plus one incremental update."""
+    from config import settings
+    from similarity import VectorSpace
+
+    posts = [SimpleNamespace(id=i, **post) for i, post in enumerate(synthetic_posts(args.posts, args.seed), 1)]
+    started = time.perf_counter()
+    space = VectorSpace(settings.related_features).fit(posts)
+    vectorised = time.perf_counter()
+    pairs = sum(len(neighbours) for _, neighbours in space.build_all(
+        settings.related_top_k, settings.related_min_score, settings.related_block_size))
+    ranked = time.perf_counter()
+    edited = SimpleNamespace(**{**vars(posts[0]), "title": posts[1].title})
+    space.upsert(edited)
+    affected = {edited.id, *space.candidates(edited.id, settings.related_max_updates,
+                                             settings.related_min_score)}
+    space.top_k(sorted(affected), settings.related_top_k, settings.related_min_score)
+    updated = time.perf_counter()
+    # What an edit costs a worker besides the re-rank: reading the saved vectors, writing them back
+    path = os.path.join(args.workdir, "related-bench.npz")
+    space.save(path)
+    saved = time.perf_counter()
+    VectorSpace.load(path, settings.related_features)
+    return {
+        "posts": len(posts),
+        "pairs": pairs,
+        "vectorise_seconds": round(vectorised - started, 2),
+        "rank_seconds": round(ranked - vectorised, 2),
+        "incremental_update_seconds": round(updated - ranked, 3),
+        "snapshot_save_seconds": round(saved - updated, 3),
+        "snapshot_load_seconds": round(time.perf_counter() - saved, 3),
+        "vector_bytes": space.memory_bytes(),
+    }
+
+
+def bench_import_posts(args) -> dict:
+    """bulk_posts.import_posts over an NDJSON file of ``--posts`` rows."""
+    import orjson
+    from bulk_posts import import_posts
+    from database import get_engine
+
+    path = os.path.join(args.workdir, "posts.ndjson")
+    with open(path, "wb") as file:
+        for post in synthetic_posts(args.posts, args.seed):
+            file.write(orjson.dumps(post) + b"\n")
+
+    async def run():
+        with open(path, encoding="utf-8", newline="") as text:
+            result = await import_posts(text, "ndjson")
+        # Pooled connections belong to this event loop; the next benchmark runs its own
+        await get_engine().dispose()
+        return result
+
+    started = time.perf_counter()
+    result = asyncio.run(run())
+    seconds = time.perf_counter() - started
+    return {"rows": result["inserted"], "seconds": round(seconds, 2),
+            "rows_per_second": round(result["inserted"] / seconds)}
+
+
+def bench_import_subscribers(args) -> dict:
+    """newsletter.import_subscribers over a CSV of ``--emails`` addresses, 1% repeated."""
+    from starlette.datastructures import UploadFile
+    from database import get_engine
+    from newsletter import import_subscribers
+
+    path = os.path.join(args.workdir, "subscribers.csv")
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["email"])
+        for i in range(args.emails):
+            writer.writerow([f"reader{i if i % 100 else i // 2}@example.com"])
+
+    async def run():
+        with open(path, "rb") as file:
+            result = await import_subscribers(UploadFile(file, filename="subscribers.csv"))
+        await get_engine().dispose()
+        return result
+
+    started = time.perf_counter()
+    result = asyncio.run(run())
+    seconds = time.perf_counter() - started
+    return {"rows": args.emails, "seconds": round(seconds, 2),
+            "rows_per_second": round(args.emails / seconds), "inserted": result["inserted"]}
+
+
+def bench_upload(args) -> dict:
+    """uploads.save_upload streaming an ``--upload-mb`` file to disk."""
+    from starlette.datastructures import Headers, UploadFile
+    from uploads import save_upload
+
+    size = args.upload_mb * 1024 * 1024
+    path = os.path.join(args.workdir, "upload.jpg")
+    with open(path, "wb") as file:
+        # A JPEG signature up front: save_upload types files by their leading bytes
+        file.write(b"\xff\xd8\xff\xe0" + os.urandom(size - 4))
+
+    async def run():
+        with open(path, "rb") as file:
+            upload = UploadFile(file, filename="upload.jpg",
+                                headers=Headers({"content-type": "image/jpeg"}))
+            return await save_upload(upload)
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    asyncio.run(run())
+    seconds = time.perf_counter() - started
+    return {"megabytes": args.upload_mb, "seconds": round(seconds, 3),
+            "mb_per_second": round(args.upload_mb / seconds, 1),
+            # ru_maxrss is in KiB on Linux; growth of the peak shows if the file was buffered whole
+            "peak_rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024, 1)}
+
+
+def bench_list(args) -> dict:
+    """GET /posts/ latency as the table grows through ``--list-sizes``: first page, a page
+    from a cursor half way down, and one category. Keyset pages should stay flat."""
+    import re
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, insert, select
+    from cache import response_cache
+    from database import SessionLocal, get_engine
+    from loadtest.seed import CATEGORIES
+    from main import app
+    from models import Post
+    from pagination import encode_cursor
+
+    start = datetime(2020, 1, 1)
+
+    async def grow(target: int) -> int:
+        async with SessionLocal() as db:
+            have = await db.scalar(select(func.count()).select_from(Post))
+            for first in range(have, target, 20000):
+                await db.execute(insert(Post), [
+                    {"category": CATEGORIES[i % len(CATEGORIES)], "title": f"Post {i}",
+                     "excerpt": "An excerpt of about the usual length. " * 5,
+                     "created_at": start + timedelta(minutes=i)}
+                    for i in range(first, min(target, first + 20000))
+                ])
+                await db.commit()
+            return max(have, target)
+
+    async def middle_cursor(size: int) -> str:
+        async with SessionLocal() as db:
+            row = (await db.execute(
+                select(Post.created_at, Post.id).order_by(Post.created_at.desc(), Post.id.desc())
+                .offset(size // 2).limit(1)
+            )).one()
+            return encode_cursor(row.created_at, row.id)
+
+    def latency(client, url: str) -> tuple[float, int]:
+        def fetch():
+            # Every request reaches the database: the list cache is what this would otherwise measure
+            response_cache.invalidate("posts:list")
+            return client.get(url)
+
+        statements = int(re.search(r'"(\d+) queries"', fetch().headers["server-timing"]).group(1))
+        return timed(fetch, args.repeat), statements
+
+    results = {}
+    with TestClient(app) as client:
+        for target in sorted(int(size) for size in args.list_sizes.split(",")):
+            size = client.portal.call(grow, target)
+            cursor = client.portal.call(middle_cursor, size)
+            for name, url in (("first_page", "/posts/?limit=20"),
+                              ("middle_page", f"/posts/?limit=20&cursor={cursor}"),
+                              ("category_page", f"/posts/?limit=20&category={CATEGORIES[0]}")):
+                seconds, statements = latency(client, url)
+                results[f"{size}_{name}_ms"] = round(seconds * 1000, 2)
+                results[f"{size}_{name}_statements"] = statements
+        client.portal.call(get_engine().dispose)
+    return results
+
+
+def bench_static(args) -> dict:
+    """Plain StaticFiles vs the UploadFiles mount on one ``--static-kb`` image: a full GET,
+    a conditional GET answered 304, and a GET a .gz sidecar can answer."""
+    import gzip
+    import hashlib
+    from fastapi.testclient import TestClient
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+    from starlette.staticfiles import StaticFiles
+    from uploads import UploadFiles
+
+    directory = os.path.join(args.workdir, "static")
+    os.makedirs(directory, exist_ok=True)
+    # Compressible bytes behind a JPEG signature, so the sidecar is realistically smaller
+    body = b"\xff\xd8\xff\xe0" + b"".join(f"{i:08d}".encode() for i in range(args.static_kb * 128))
+    name = f"{hashlib.sha256(body).hexdigest()}.jpg"
+    with open(os.path.join(directory, name), "wb") as file:
+        file.write(body)
+    with open(os.path.join(directory, f"{name}.gz"), "wb") as file:
+        file.write(gzip.compress(body))
+    app = Starlette(routes=[Mount("/plain", StaticFiles(directory=directory)),
+                            Mount("/uploads", UploadFiles(directory=directory))])
+
+    requests = 200
+    results = {"file_kb": len(body) // 1024}
+    with TestClient(app) as client:
+        for mount in ("plain", "uploads"):
+            url = f"/{mount}/{name}"
+            etag = client.get(url, headers={"Accept-Encoding": "identity"}).headers["etag"]
+            for case, headers, expected in (
+                ("full", {"Accept-Encoding": "identity"}, 200),
+                ("revalidate", {"Accept-Encoding": "identity", "If-None-Match": etag}, 304),
+                ("gzip", {"Accept-Encoding": "gzip"}, 200),
+            ):
+                response = client.get(url, headers=headers)
+                assert response.status_code == expected, (mount, case, response.status_code)
+                seconds = timed(lambda: [client.get(url, headers=headers) for _ in range(requests)],
+                                args.repeat)
+                results[f"{mount}_{case}_requests_per_second"] = round(requests / seconds)
+                # Bytes on the wire: the gzip case is only cheaper where a sidecar is served
+                results[f"{mount}_{case}_bytes"] = int(response.headers.get("content-length", 0))
+    return results
+
+
+def bench_search(args) -> dict:
+    """SearchIndex.search over ``--search-posts`` synthetic posts: a common word, a rare
+    pair, a bare prefix and a miss, each fetched as the first page of results."""
+    from pagination import DEFAULT_PAGE_SIZE
+    from search import SearchIndex
+
+    index = SearchIndex(os.path.join(args.workdir, "search-bench.db"))
+    posts = (SimpleNamespace(id=i, image1=None, **post)
+             for i, post in enumerate(synthetic_posts(args.search_posts, args.seed), 1))
+    started = time.perf_counter()
+    while batch := list(itertools.islice(posts, 10000)):
+        index.upsert_many(batch)
+    results = {"posts": index.count(), "index_seconds": round(time.perf_counter() - started, 2)}
+
+    for name, query in (("common_word", "water"), ("two_words", "harbour recipe"),
+                        ("prefix", "moun"), ("miss", "zeppelin")):
+        times = []
+        for _ in range(max(args.repeat, 20)):
+            query_started = time.perf_counter()
+            hits = index.search(query, DEFAULT_PAGE_SIZE)
+            times.append(time.perf_counter() - query_started)
+        times.sort()
+        results[f"{name}_median_ms"] = round(statistics.median(times) * 1000, 2)
+        results[f"{name}_p95_ms"] = round(times[int(len(times) * 0.95) - 1] * 1000, 2)
+        results[f"{name}_hits"] = len(hits)
+    return results
+
+
+def bench_likes(args) -> dict:
+    """``--like-clicks`` like requests from ``--like-concurrency`` clients, once per
+    like_ingestion mode: requests/sec and the database transactions they cost."""
+    import httpx
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, insert
+    from sqlalchemy.engine import Engine
+    import auth
+    from config import settings
+    from database import SessionLocal, get_engine
+    from like_buffer import like_buffer
+    from main import app
+    from models import Post, Users
+
+    posts_per_user = 10
+    users = -(-args.like_clicks // posts_per_user)
+    commits = 0
+
+    def count_commit(conn):
+        nonlocal commits
+        commits += 1
+
+    async def clicks(mode: str) -> list[tuple[str, int]]:
+        # Fresh users and posts per mode, so every click is a new (user, post) pair
+        async with SessionLocal() as db:
+            user_ids = (await db.execute(insert(Users).returning(Users.id), [
+                {"username": f"bench-liker-{mode}-{i}", "hashed_password": "x", "role": "user"}
+                for i in range(users)
+            ])).scalars().all()
+            post_ids = (await db.execute(insert(Post).returning(Post.id), [
+                {"category": "Bench", "title": f"Liked {mode} {i}"} for i in range(posts_per_user)
+            ])).scalars().all()
+            await db.commit()
+        tokens = [auth.create_access_token(f"bench-liker-{mode}-{i}", user_id, "user", timedelta(hours=1))
+                  for i, user_id in enumerate(user_ids)]
+        return [(token, post_id) for token in tokens for post_id in post_ids][:args.like_clicks]
+
+    async def run(pairs: list[tuple[str, int]]) -> tuple[float, int]:
+        queue = iter(pairs)
+        errors = 0
+        # A write that loses a lock wait is a 500 to count, not a reason to stop
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            async def client():
+                nonlocal errors
+                for token, post_id in queue:
+                    response = await http.post("/likes/", json={"post_id": post_id},
+                                               headers={"Authorization": f"Bearer {token}"})
+                    errors += response.status_code not in (200, 202)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(args.like_concurrency)))
+            return time.perf_counter() - started, errors
+
+    results = {"clicks": args.like_clicks, "concurrency": args.like_concurrency}
+    mode_before = settings.like_ingestion
+    event.listen(Engine, "commit", count_commit)
+    try:
+        for mode in ("direct", "batched"):
+            settings.like_ingestion = mode
+            # The lifespan starts the like buffer's flush loop only in batched mode
+            with TestClient(app) as test_client:
+                pairs = test_client.portal.call(clicks, mode)
+                commits = 0
+                seconds, errors = test_client.portal.call(run, pairs)
+                answered_commits = commits
+                test_client.portal.call(like_buffer.flush)
+                results[f"{mode}_requests_per_second"] = round(len(pairs) / seconds)
+                results[f"{mode}_transactions"] = commits
+                results[f"{mode}_transactions_per_second"] = round(answered_commits / seconds)
+                results[f"{mode}_errors"] = errors
+                test_client.portal.call(get_engine().dispose)
+    finally:
+        settings.like_ingestion = mode_before
+        event.remove(Engine, "commit", count_commit)
+    return results
+
+
+def bench_login_burst(args) -> dict:
+    """/posts/recent latency while ``--logins`` logins arrive at once, with bcrypt on the
+    event loop (how login ran before the hashing pool) and on the pool, plus an idle baseline."""
+    import httpx
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    import auth
+    from database import SessionLocal, get_engine
+    from hashing import PasswordHasher, _hash
+    from main import app
+    from models import Users
+
+    class InlineHasher(PasswordHasher):
+        async def _run(self, fn, *args):
+            return fn(*args)
+
+    password = "bench-password"
+    hashed = _hash(password)
+    readers = 10
+
+    async def add_users(mode: str) -> list[str]:
+        names = [f"bench-login-{mode}-{i}" for i in range(args.logins)]
+        async with SessionLocal() as db:
+            await db.execute(insert(Users), [{"username": name, "hashed_password": hashed, "role": "user"}
+                                             for name in names])
+            await db.commit()
+        return names
+
+    async def run(names: list[str]) -> dict:
+        latencies: list[float] = []
+        statuses: list[int] = []
+        burst_seconds = 0.0
+        done = asyncio.Event()
+        # Logins that time out waiting for a connection are counted as failed, not raised
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            async def read():
+                while not done.is_set():
+                    started = time.perf_counter()
+                    await http.get("/posts/recent")
+                    latencies.append(time.perf_counter() - started)
+
+            async def login(name: str):
+                response = await http.post("/auth/token", data={"username": name, "password": password})
+                statuses.append(response.status_code)
+
+            async def burst():
+                nonlocal burst_seconds
+                await asyncio.sleep(0.2)
+                started = time.perf_counter()
+                if names:
+                    await asyncio.gather(*(login(name) for name in names))
+                else:
+                    await asyncio.sleep(1)
+                burst_seconds = time.perf_counter() - started
+                done.set()
+
+            await http.get("/posts/recent")
+            await asyncio.gather(burst(), *(read() for _ in range(readers)))
+        latencies.sort()
+        return {"reads": len(latencies),
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+                "p99_ms": round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 1),
+                "logins_ok": statuses.count(200), "logins_refused": statuses.count(429),
+                "logins_failed": len(statuses) - statuses.count(200) - statuses.count(429),
+                "burst_seconds": round(burst_seconds, 1)}
+
+    results = {"logins": args.logins}
+    ip_limit = auth.ip_limiter.limit
+    pooled = auth.password_hasher
+    # Every login comes from the one in-process client address
+    auth.ip_limiter.limit = 10 ** 9
+    try:
+        with TestClient(app) as client:
+            for mode, hasher in (("idle", pooled), ("inline", InlineHasher(1, 0)), ("pool", pooled)):
+                auth.password_hasher = hasher
+                names = client.portal.call(add_users, mode) if mode != "idle" else []
+                for key, value in client.portal.call(run, names).items():
+                    results[f"{mode}_{key}"] = value
+            client.portal.call(get_engine().dispose)
+    finally:
+        auth.password_hasher = pooled
+        auth.ip_limiter.limit = ip_limit
+    return results
+
+
+def scratch_environment(workdir: str, args):
+    """Points every setting that touches disk at ``workdir`` before the app modules load."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["SEARCH_INDEX_PATH"] = os.path.join(workdir, "search.db")
+    os.environ["RELATED_VECTORS_PATH"] = os.path.join(workdir, "related.npz")
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["MAX_UPLOAD_BYTES"] = str((args.upload_mb + 1) * 1024 * 1024)
+    from loadtest.seed import migrate
+
+    migrate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run micro-benchmarks")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help=f"any of: {', '.join(BENCHMARKS)} (default all)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=100, help="rows per serialized page")
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--posts", type=int, default=10000, help="posts for related and import-posts")
+    parser.add_argument("--emails", type=int, default=100000, help="rows for import-subscribers")
+    parser.add_argument("--upload-mb", type=int, default=50)
+    parser.add_argument("--list-sizes", default="1000,10000,100000,1000000",
+                        help="comma-separated post counts the list benchmark grows through")
+    parser.add_argument("--static-kb", type=int, default=256, help="image size for the static benchmark")
+    parser.add_argument("--search-posts", type=int, default=100000, help="posts for the search benchmark")
+    parser.add_argument("--like-clicks", type=int, default=2000, help="like requests per mode")
+    parser.add_argument("--like-concurrency", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=100, help="concurrent logins in the login burst")
+    parser.add_argument("--max-startup-seconds", type=float,
+                        help="exit 1 when the startup benchmark's median total is slower (for CI)")
+    parser.add_argument("--output", help="results file (default loadtest/results/<time>-<commit>-bench.json)")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(sorted(unknown))}")
+    args.benchmarks = args.benchmarks or list(BENCHMARKS)
+
+    from loadtest.run import git_commit
+
+    output = args.output or os.path.join(
+        "loadtest", "results", f"{datetime.now():%Y%m%d-%H%M%S}-{git_commit()}-bench.json")
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="loadtest-bench-") as workdir:
+        args.workdir = workdir
+        scratch_environment(workdir, args)
+        for name in args.benchmarks:
+            print(f"{name}...", flush=True)
+            results[name] = globals()[f"bench_{name.replace('-', '_')}"](args)
+            print("  " + ", ".join(f"{key}={value}" for key, value in results[name].items()), flush=True)
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({"meta": {"commit": git_commit(), "created_at": datetime.now().isoformat(),
+                            "args": {key: value for key, value in vars(args).items() if key != "workdir"}},
+                   "benchmarks": results}, file, indent=2)
+    print("Results written to", output)
+
+    startup = results.get("startup", {}).get("total_seconds")
+    if args.max_startup_seconds is not None and startup is not None and startup > args.max_startup_seconds:
+        sys.exit(f"Startup took {startup}s, over the {args.max_startup_seconds}s budget")
+
+
+if __name__ == "__main__":
+    main()
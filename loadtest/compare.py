@@ -0,0 +1,82 @@
+# loadtest/compare.py
+"""Compares two result files from loadtest.run or loadtest.bench and flags regressions.
+
+    python -m loadtest.compare loadtest/results/before.json loadtest/results/after.json
+
+Every numeric metric present in both files is compared. Latencies, durations,
+query counts and memory are better lower; throughput is better higher. A change
+worse than --threshold percent is a regression, and any regression makes the
+exit status 1 so the command can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+# Substrings that mark a metric as higher-is-better; everything else is lower-is-better
+HIGHER_IS_BETTER = ("rps", "per_second", "requests")
+# Counts that describe the run rather than measure it
+IGNORED = ("posts", "pairs", "rows", "subscribers", "count")
+
+
+def flatten(data, prefix: str = "") -> dict[str, float]:
+    metrics = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = float(value)
+    return metrics
+
+
+def ignored(name: str) -> bool:
+    return name.startswith("meta.") or name.rsplit(".", 1)[-1] in IGNORED
+
+
+def compare(before: dict, after: dict, threshold: float, noise_floor: float):
+    old, new = flatten(before), flatten(after)
+    rows, regressions = [], 0
+    for name in sorted(old.keys() & new.keys()):
+        if ignored(name):
+            continue
+        a, b = old[name], new[name]
+        higher_is_better = any(marker in name.rsplit(".", 1)[-1] for marker in HIGHER_IS_BETTER)
+        change = (b - a) / a * 100 if a else (0.0 if b == a else float("inf"))
+        worse = -change if higher_is_better else change
+        # Tiny absolute values (a 0.2ms p50) swing by large percentages on noise alone
+        regressed = worse > threshold and abs(b - a) > noise_floor
+        regressions += regressed
+        rows.append((name, a, b, change, "REGRESSION" if regressed else
+                     ("improved" if -worse > threshold and abs(b - a) > noise_floor else "")))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two load-test result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent change counted as a regression (default 10)")
+    parser.add_argument("--noise-floor", type=float, default=0.5,
+                        help="absolute differences below this are never flagged (default 0.5)")
+    parser.add_argument("--all", action="store_true", help="also list unchanged metrics")
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+    rows, regressions = compare(before, after, args.threshold, args.noise_floor)
+
+    print(f"before: {before.get('meta', {}).get('commit', args.before)}  "
+          f"after: {after.get('meta', {}).get('commit', args.after)}")
+    width = max((len(row[0]) for row in rows), default=10)
+    for name, a, b, change, verdict in rows:
+        if verdict or args.all:
+            print(f"{name:<{width}}  {a:>12.2f} -> {b:>12.2f}  {change:>+8.1f}%  {verdict}")
+    print(f"{regressions} regression(s) over {args.threshold}% in {len(rows)} metrics")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
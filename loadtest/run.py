@@ -0,0 +1,316 @@
+# loadtest/run.py
+"""Drives a realistic traffic mix against a running server and saves the results.
+
+    python -m loadtest.run --spawn --database-url sqlite:///loadtest.db --duration 60
+    python -m loadtest.run --url http://localhost:8000 --mix home=60,article=40
+
+Each worker picks a scenario by weight, runs it and records latency, status and
+the query count the server reports in its Server-Timing header. The summary
+(throughput, p50/p95/p99, queries per request) is printed and written as JSON
+under loadtest/results/ for loadtest.compare.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+import httpx
+
+DEFAULT_MIX = "home=45,article=35,like=10,comment=5,login=5"
+SERVER_TIMING = re.compile(r'(\w+);dur=([\d.]+)(?:;desc="(\d+) queries")?')
+# A load test logs in far more often than a person would; the limits are raised for the spawned server
+SPAWN_ENV = {"LOGIN_ATTEMPTS_PER_USERNAME": "1000000", "LOGIN_ATTEMPTS_PER_IP": "1000000"}
+
+
+class Recorder:
+    """Latencies, statuses and server-reported query counts, per request name."""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {}
+        self.queries: dict[str, list[int]] = {}
+        self.db_ms: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.recording = False
+
+    def add(self, name: str, seconds: float, response: httpx.Response | None, ok: bool):
+        if not self.recording:
+            return
+        self.samples.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        if response is None:
+            return
+        for metric, duration, queries in SERVER_TIMING.findall(response.headers.get("server-timing", "")):
+            if metric == "db":
+                self.db_ms.setdefault(name, []).append(float(duration))
+                self.queries.setdefault(name, []).append(int(queries or 0))
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def summarise(recorder: Recorder, seconds: float) -> dict:
+    def block(samples, queries, db_ms, errors):
+        summary = {
+            "requests": len(samples),
+            "errors": errors,
+            "rps": round(len(samples) / seconds, 2),
+            "latency_mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+            "latency_p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "latency_p95_ms": round(percentile(samples, 95) * 1000, 2),
+            "latency_p99_ms": round(percentile(samples, 99) * 1000, 2),
+        }
+        if queries:
+            summary["queries_mean"] = round(sum(queries) / len(queries), 2)
+            summary["queries_p95"] = percentile(queries, 95)
+            summary["db_mean_ms"] = round(sum(db_ms) / len(db_ms), 2)
+        return summary
+
+    scenarios = {name: block(samples, recorder.queries.get(name, []), recorder.db_ms.get(name, []),
+                             recorder.errors.get(name, 0))
+                 for name, samples in sorted(recorder.samples.items())}
+    every = [s for samples in recorder.samples.values() for s in samples]
+    total = block(every, [q for qs in recorder.queries.values() for q in qs],
+                  [d for ds in recorder.db_ms.values() for d in ds],
+                  sum(recorder.errors.values())) if every else {}
+    return {"total": total, "scenarios": scenarios}
+
+
+class Traffic:
+    """The scenarios. Each one is a few requests a real visitor would make together."""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, manifest: dict,
+                 rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.n_posts = manifest["counts"]["posts"]
+        self.n_users = manifest["counts"]["users"]
+        self.user_prefix = manifest["user_prefix"]
+        self.password = manifest["password"]
+        self.tokens: dict[int, str] = {}
+        self.etags: dict[str, str] = {}
+
+    async def request(self, name: str, method: str, url: str, expect=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.add(name, time.perf_counter() - started, None, False)
+            return None
+        self.recorder.add(name, time.perf_counter() - started, response,
+                          response.status_code in expect)
+        return response
+
+    def post_id(self) -> int:
+        # Same long tail as the seeded likes: a few articles get most of the reads
+        if self.rng.random() < 0.5:
+            return min(self.n_posts, int(self.rng.paretovariate(1.2)))
+        return self.rng.randint(1, self.n_posts)
+
+    async def token(self) -> dict:
+        user = self.rng.randint(1, self.n_users)
+        if user not in self.tokens:
+            response = await self.request("login", "POST", "/auth/token", data={
+                "username": f"{self.user_prefix}{user}", "password": self.password})
+            if response is None or response.status_code != 200:
+                return {}
+            self.tokens[user] = response.json()["access_token"]
+        return {"Authorization": f"Bearer {self.tokens[user]}"}
+
+    async def home(self):
+        response = await self.request("home", "GET", "/posts/")
+        if response is not None and response.status_code == 200 and self.rng.random() < 0.3:
+            cursor = response.json().get("next_cursor")
+            if cursor:
+                await self.request("home_next_page", "GET", "/posts/", params={"cursor": cursor})
+        await self.request("recent", "GET", "/posts/recent")
+
+    async def article(self):
+        post_id = self.post_id()
+        await self.request("article", "GET", f"/posts/{post_id}/detail")
+        await self.request("related", "GET", f"/posts/{post_id}/related")
+        await self.request("view", "POST", f"/traffic/{post_id}", expect=(204,))
+
+    async def like(self):
+        headers = await self.token()
+        post_id = self.post_id()
+        response = await self.request("like", "POST", "/likes/", expect=(200, 202, 400),
+                                      json={"post_id": post_id}, headers=headers)
+        if response is not None and response.status_code == 400:
+            # Already liked: toggle it off, as the button would
+            await self.request("unlike", "DELETE", f"/likes/{post_id}", headers=headers)
+
+    async def comment(self):
+        headers = await self.token()
+        words = " ".join(self.rng.choice(("great", "read", "thanks", "agree", "more", "please"))
+                         for _ in range(self.rng.randint(3, 20)))
+        await self.request("comment", "POST", "/comments/", expect=(201,),
+                           json={"post_id": self.post_id(), "content": words}, headers=headers)
+
+    async def login(self):
+        # A fresh login every time: this is the bcrypt-bound path
+        user = self.rng.randint(1, self.n_users)
+        self.tokens.pop(user, None)
+        await self.request("login", "POST", "/auth/token", data={
+            "username": f"{self.user_prefix}{user}", "password": self.password})
+
+    async def post(self):
+        # The plain article endpoint, which every version of the API has; for comparing across refs
+        await self.request("post", "GET", f"/posts/{self.post_id()}")
+
+    async def search(self):
+        term = self.rng.choice(("travel", "garden", "music", "coffee", "mountain", "recipe"))
+        await self.request("search", "GET", "/posts/search", params={"q": term})
+
+    async def feeds(self):
+        # Feed readers poll with the ETag they were given; almost every poll should be a 304
+        for url in ("/feed.xml", "/atom.xml", "/sitemap.xml"):
+            headers = {"If-None-Match": self.etags[url]} if url in self.etags else {}
+            response = await self.request("feed", "GET", url, expect=(200, 304), headers=headers)
+            if response is not None and "etag" in response.headers:
+                self.etags[url] = response.headers["etag"]
+
+    async def counts(self):
+        ids = ",".join(str(self.post_id()) for _ in range(20))
+        await self.request("counts", "GET", "/likes/counts", params={"post_ids": ids})
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not hasattr(Traffic, name) or name.startswith("_") or name in ("request", "token", "post_id"):
+            raise SystemExit(f"Unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def worker(traffic: Traffic, mix: dict[str, float], deadline: float):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await getattr(traffic, traffic.rng.choices(names, weights)[0])()
+
+
+async def run(args, manifest: dict) -> dict:
+    mix = parse_mix(args.mix)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        workers = [Traffic(client, recorder, manifest, random.Random(args.seed + i))
+                   for i in range(args.concurrency)]
+        if args.warmup:
+            deadline = time.perf_counter() + args.warmup
+            await asyncio.gather(*(worker(w, mix, deadline) for w in workers))
+        recorder.recording = True
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(w, mix, started + args.duration) for w in workers))
+        elapsed = time.perf_counter() - started
+    return summarise(recorder, elapsed)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def spawn_server(args, cwd: str | None = None) -> subprocess.Popen:
+    env = {**os.environ, **SPAWN_ENV}
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        env=env, cwd=cwd,
+    )
+    url = f"http://127.0.0.1:{args.port}"
+    for _ in range(300):
+        if server.poll() is not None:
+            raise SystemExit("Server exited during startup")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                args.url = url
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise SystemExit("Server did not become healthy within 30s")
+
+
+def print_summary(summary: dict):
+    header = f"{'scenario':<16}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, row in [*summary["scenarios"].items(), ("total", summary["total"])]:
+        if not row:
+            continue
+        print(f"{name:<16}{row['requests']:>8}{row['errors']:>6}{row['rps']:>9.1f}"
+              f"{row['latency_p50_ms']:>9.1f}{row['latency_p95_ms']:>9.1f}{row['latency_p99_ms']:>9.1f}"
+              f"{row.get('queries_mean', float('nan')):>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a traffic mix against the API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn for the run")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when spawning")
+    parser.add_argument("--database-url", help="DATABASE_URL for the spawned server")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra settings for the spawned server, e.g. LIKE_INGESTION=batched")
+    parser.add_argument("--manifest", default="loadtest/dataset.json")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help="scenario weights: home, article, like, comment, login, search, counts, feeds")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds first")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="", help="added to the results file name")
+    parser.add_argument("--output", help="results file (default loadtest/results/<time>-<commit>.json)")
+    args = parser.parse_args()
+
+    with open(args.manifest) as file:
+        manifest = json.load(file)
+    server = spawn_server(args) if args.spawn else None
+    try:
+        summary = asyncio.run(run(args, manifest))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    print_summary(summary)
+
+    commit = git_commit()
+    output = args.output or os.path.join(
+        "loadtest", "results",
+        f"{datetime.now():%Y%m%d-%H%M%S}-{commit}{'-' + args.label if args.label else ''}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({
+            "meta": {"commit": commit, "created_at": datetime.now().isoformat(), "url": args.url,
+                     "mix": args.mix, "concurrency": args.concurrency, "duration": args.duration,
+                     "workers": args.workers if args.spawn else None, "env": args.env,
+                     "dataset": manifest["counts"], "seed": manifest["seed"]},
+            **summary,
+        }, file, indent=2)
+    print("Results written to", output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# loadtest/seed.py
+"""Fills a database with a reproducible synthetic dataset for load tests.
+
+    DATABASE_URL=sqlite:///loadtest.db python -m loadtest.seed --likes 1000000
+
+The schema is brought to head with Alembic first. The same --seed and sizes
+always produce the same rows, and a manifest (sizes, seed, login details) is
+written for loadtest.run to pick post ids and users from.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, text
+from sqlalchemy.engine import make_url
+from config import settings
+from database import SessionLocal, get_engine
+
+USER_PREFIX = "loadtest-user-"
+PASSWORD = "loadtest-password"
+CATEGORIES = ("Travel", "Food", "Technology", "Music", "Sport", "Garden", "Money", "Health",
+              "Books", "Film", "Science", "Design")
+WORDS = """
+about above across adventure after again against almost along already always among amount
+answer around autumn balance beach beautiful before began behind believe below between bicycle
+bridge bright brought build business camera capital careful carry center certain change
+chapter children city climb close coast coffee collect colour common company complete
+consider continue country course create culture dance daughter decide deep design develop
+different direction discover distance early earth easy energy engine enough evening every
+example experience explain family famous farm field figure final finish follow forest forward
+friend garden gather gentle global government great green ground group grow habit harbour
+health heart history holiday house idea important island journey kitchen language large later
+learn letter light listen little local machine market measure meeting memory method minute
+modern morning mountain music nature night north number ocean office order paper pattern people
+perhaps picture planet plant pocket possible present problem produce project question quick
+quiet rather reason recipe record region remember report river road science season second
+simple single small social south special spring station story street strong student summer
+system table teacher thought through together travel under until valley village voice water
+weather window winter without wonder world writer year young
+""".split()
+
+
+def sentence(rng: random.Random, low: int, high: int) -> str:
+    words = rng.choices(WORDS, k=rng.randint(low, high))
+    return " ".join(words).capitalize() + "."
+
+
+def paragraph(rng: random.Random, sentences: int) -> str:
+    return " ".join(sentence(rng, 8, 20) for _ in range(sentences))
+
+
+def skewed(rng: random.Random, n: int) -> int:
+    """1..n with a long tail: a few popular rows get most of the activity."""
+    return min(n, int(rng.paretovariate(1.2)) if rng.random() < 0.5 else rng.randint(1, n))
+
+
+def migrate():
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(Config("alembic.ini"), "head")
+
+
+async def insert_batches(model, rows, batch_size: int) -> int:
+    """Executemany INSERTs of ``batch_size`` rows, one commit each."""
+    total, batch = 0, []
+    async with SessionLocal() as db:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                await db.execute(insert(model), batch)
+                await db.commit()
+                total, batch = total + len(batch), []
+        if batch:
+            await db.execute(insert(model), batch)
+            await db.commit()
+            total += len(batch)
+    return total
+
+
+def users(rng, count: int, hashed: str):
+    for i in range(1, count + 1):
+        yield {"username": f"{USER_PREFIX}{i}", "hashed_password": hashed,
+               "role": "admin" if i == 1 else "user"}
+
+
+def posts(rng, count: int, start: datetime):
+    for i in range(count):
+        created = start + timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+        yield {
+            "category": rng.choice(CATEGORIES),
+            "title": sentence(rng, 3, 9).rstrip("."),
+            "intro_content": paragraph(rng, 2),
+            "content1": paragraph(rng, 3),
+            "quote": sentence(rng, 6, 14) if rng.random() < 0.5 else None,
+            "quote_author": "Anonymous" if rng.random() < 0.5 else None,
+            "main_content": paragraph(rng, 8),
+            "final_content": paragraph(rng, 2),
+            "created_at": created.replace(hour=0, minute=0, second=0),
+        }
+
+
+def comments(rng, count: int, n_users: int, n_posts: int, start: datetime):
+    for _ in range(count):
+        yield {"content": sentence(rng, 4, 30), "user_id": rng.randint(1, n_users),
+               "post_id": skewed(rng, n_posts),
+               "created_at": start + timedelta(seconds=rng.randint(0, 365 * 24 * 3600))}
+
+
+def likes(rng, count: int, n_users: int, n_posts: int):
+    # (user, post) is unique; bounded so a too-large request can't loop forever
+    count = min(count, n_users * n_posts)
+    seen = set()
+    while len(seen) < count:
+        user_id, post_id = rng.randint(1, n_users), skewed(rng, n_posts)
+        # One int per pair keeps the set small enough for tens of millions of likes
+        pair = user_id * (n_posts + 1) + post_id
+        if pair not in seen:
+            seen.add(pair)
+            yield {"user_id": user_id, "post_id": post_id}
+
+
+def contact_messages(rng, count: int, start: datetime):
+    for i in range(count):
+        yield {"name": f"Visitor {i}", "email": f"visitor{i % 5000}@example.com",
+               "subject": sentence(rng, 2, 6), "message": paragraph(rng, 2),
+               "created_at": start + timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+               "is_read": rng.random() < 0.6, "is_archived": rng.random() < 0.2}
+
+
+def subscribers(count: int):
+    for i in range(count):
+        yield {"email": f"reader{i}@example.com"}
+
+
+async def seed(args) -> dict:
+    import models
+    from content import render
+    from hashing import get_bcrypt_context
+
+    rng = random.Random(args.seed)
+    start = datetime(2025, 1, 1)
+    # One bcrypt hash shared by every user: hashing a million passwords isn't the point
+    hashed = get_bcrypt_context().hash(PASSWORD)
+    counts, timings = {}, {}
+    steps = (
+        ("users", models.Users, users(rng, args.users, hashed)),
+        ("posts", models.Post, ({**post, **render(post)} for post in posts(rng, args.posts, start))),
+        ("comments", models.Comment, comments(rng, args.comments, args.users, args.posts, start)),
+        ("likes", models.Like, likes(rng, args.likes, args.users, args.posts)),
+        ("contact_messages", models.ContactMessage, contact_messages(rng, args.contacts, start)),
+        ("newsletter_subscriptions", models.NewsletterSubscription, subscribers(args.subscribers)),
+    )
+    for name, model, rows in steps:
+        started = time.perf_counter()
+        counts[name] = await insert_batches(model, rows, args.batch_size)
+        timings[name] = round(time.perf_counter() - started, 2)
+        print(f"{name}: {counts[name]} rows in {timings[name]}s", flush=True)
+
+    async with SessionLocal() as db:
+        # Same backfill as migration 0002: the counters the read paths rely on
+        await db.execute(text(
+            "UPDATE posts SET "
+            "like_count = (SELECT COUNT(*) FROM likes WHERE likes.post_id = posts.id), "
+            "comment_count = (SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id)"
+        ))
+        await db.commit()
+    if args.index:
+        from search import rebuild_index
+
+        async with SessionLocal() as db:
+            await rebuild_index(db)
+    await get_engine().dispose()
+    database_url = make_url(settings.database_url).render_as_string(hide_password=True)
+    return {"seed": args.seed, "database_url": database_url, "counts": counts, "seconds": timings,
+            "user_prefix": USER_PREFIX, "password": PASSWORD, "created_at": datetime.utcnow().isoformat()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a database for load testing")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--likes", type=int, default=100000)
+    parser.add_argument("--contacts", type=int, default=5000)
+    parser.add_argument("--subscribers", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--no-index", dest="index", action="store_false",
+                        help="skip rebuilding the search index")
+    parser.add_argument("--manifest", default="loadtest/dataset.json")
+    args = parser.parse_args()
+
+    migrate()
+    manifest = asyncio.run(seed(args))
+    with open(args.manifest, "w") as file:
+        json.dump(manifest, file, indent=2)
+    print("Manifest written to", args.manifest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# loadtest/sweep.py
+"""Runs one traffic mix at several concurrency levels against several git refs.
+
+    python -m loadtest.sweep --database-url sqlite:///loadtest.db --ref dc056e5~1 --ref HEAD
+
+Each ref other than the working tree is checked out into a temporary git
+worktree and served from there by uvicorn, against the same seeded database
+(seed it first with loadtest.seed). The default mix only uses endpoints every
+version of the API has, so old and new code answer the same requests. A table
+of throughput and latency per ref and concurrency is printed and written as
+JSON under loadtest/results/, comparable with loadtest.compare.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+from loadtest.run import git_commit, run, spawn_server
+
+WORKING_TREE = "."
+
+
+@contextmanager
+def checkout(ref: str):
+    """A directory holding ``ref``; the working tree itself for "."."""
+    if ref == WORKING_TREE:
+        yield os.getcwd()
+        return
+    path = tempfile.mkdtemp(prefix="loadtest-sweep-")
+    subprocess.run(["git", "worktree", "add", "--detach", path, ref], check=True,
+                   capture_output=True)
+    try:
+        yield path
+    finally:
+        subprocess.run(["git", "worktree", "remove", "--force", path], check=True, capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare refs across concurrency levels")
+    parser.add_argument("--ref", action="append", dest="refs", metavar="REF",
+                        help=f"git ref to serve, repeatable ({WORKING_TREE!r} is the working tree; default it alone)")
+    parser.add_argument("--concurrency", default="1,50,500", help="comma-separated client counts")
+    parser.add_argument("--database-url", required=True, help="DATABASE_URL of the seeded database")
+    parser.add_argument("--manifest", default="loadtest/dataset.json")
+    parser.add_argument("--mix", default="home=60,post=40")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the servers")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="results file (default loadtest/results/<time>-<commit>-sweep.json)")
+    args = parser.parse_args()
+    refs = args.refs or [WORKING_TREE]
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    with open(args.manifest) as file:
+        manifest = json.load(file)
+    results: dict[str, dict] = {}
+    for ref in refs:
+        with checkout(ref) as path:
+            server_args = SimpleNamespace(**vars(args), url=None)
+            server = spawn_server(server_args, cwd=path)
+            try:
+                for level in levels:
+                    print(f"{ref} at {level} clients...", flush=True)
+                    run_args = SimpleNamespace(**vars(server_args))
+                    run_args.concurrency = level
+                    results.setdefault(ref, {})[f"c{level}"] = asyncio.run(run(run_args, manifest))["total"]
+            finally:
+                server.terminate()
+                server.wait()
+
+    header = f"{'ref':<16}{'clients':>8}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for ref, by_level in results.items():
+        for level, row in by_level.items():
+            if row:
+                print(f"{ref:<16}{level[1:]:>8}{row['requests']:>8}{row['errors']:>6}{row['rps']:>9.1f}"
+                      f"{row['latency_p50_ms']:>9.1f}{row['latency_p95_ms']:>9.1f}{row['latency_p99_ms']:>9.1f}")
+
+    output = args.output or os.path.join(
+        "loadtest", "results", f"{datetime.now():%Y%m%d-%H%M%S}-{git_commit()}-sweep.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({"meta": {"commit": git_commit(), "created_at": datetime.now().isoformat(),
+                            "refs": refs, "concurrency": levels, "mix": args.mix,
+                            "duration": args.duration, "workers": args.workers,
+                            "dataset": manifest["counts"], "seed": manifest["seed"]},
+                   "results": results}, file, indent=2)
+    print("Results written to", output)
+
+
+if __name__ == "__main__":
+    main()
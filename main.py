@@ -1,44 +1,64 @@
+import html
+from contextlib import asynccontextmanager
 from datetime import date, datetime
-import os
-import shutil
-from fastapi import FastAPI, File, Form, HTTPException, Depends, UploadFile, status
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel, EmailStr
-from typing import Annotated, Optional
-from sqlalchemy import desc
+from fastapi import APIRouter, BackgroundTasks, FastAPI, File, Form, HTTPException, Depends, Query, Request, UploadFile, status
+from fastapi.responses import HTMLResponse, StreamingResponse
+from pydantic import BaseModel, EmailStr, field_validator
+from typing import Annotated, Any, Optional
+from sqlalchemy import desc, select
 import auth
-from auth import get_current_user
+from auth import get_admin_user, get_current_user, get_optional_user
 import models
-from database import engine, SessionLocal
-from sqlalchemy.orm import Session
+from database import check_database, get_db, get_read_db, ReadSessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from routers import comments, likes
-
-app = FastAPI(title="Blog API")
-
-app.include_router(comments.router)
-app.include_router(likes.router, prefix="/likes")
-
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-app.include_router(auth.router)
-
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-
-models.Base.metadata.create_all(bind=engine)
-
-# Allow frontend at 127.0.0.1:5500 to talk to backend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5500",
-                   "http://127.0.0.1:5500",
-                   "https://pmhfhd37-5500.uks1.devtunnels.ms"],  # frontend origin
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+from starlette.concurrency import run_in_threadpool
+from routers import bulk_posts as bulk_post_routes, comments, feeds as feed_routes, images as image_routes, likes, live as live_routes, metrics, newsletter as newsletter_routes, related as related_routes, traffic as traffic_routes
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, keyset_after, keyset_before
+from cache import response_cache
+from hashing import password_hasher
+from like_buffer import like_buffer
+from instrumentation import InstrumentationMiddleware, instrument_engines
+from serialization import CompressionMiddleware
+from analytics import traffic
+import newsletter
+from newsletter import delivery_engine
+from notifications import notification_queue
+from realtime import broker
+from related import related_posts
+from ratelimit import RateLimiter, enforce
+from spam import DuplicateFilter, count_links, fingerprint
+from config import settings
+from content import render_post
+from uploads import UPLOAD_DIR, UploadFiles, UploadLimitMiddleware, public_base, public_url, save_upload
+import feeds
+import images
+from schemas import CommentResponse, MessageResponse, PostBase
+from search import index_post, search_index, unindex_post
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # No network I/O here: the engine connects on first use and the schema is
+    # managed by Alembic (alembic upgrade head), so cold starts stay cheap
+    instrument_engines()
+    if settings.like_ingestion == "batched":
+        await like_buffer.start()
+    await traffic.start()
+    await notification_queue.start()
+    await broker.start()
+    yield
+    await broker.stop()
+    # Write out any clicks and page views still buffered before the process goes away
+    await like_buffer.stop()
+    await traffic.stop()
+    await delivery_engine.shutdown()
+    await notification_queue.stop()
+    password_hasher.shutdown()
+    images.shutdown()
+
+
+router = APIRouter()
 
 # ---------------------------
 # Contact Messages
@@ -55,10 +75,21 @@ class ContactMessageCreate(ContactMessageBase):
 
 class ContactMessageResponse(ContactMessageBase):
     id: int
+    created_at: datetime
+    is_read: bool = False
+    is_archived: bool = False
 
     class Config:
         from_attributes = True
 
+class ContactMessageUpdate(BaseModel):
+    is_read: Optional[bool] = None
+    is_archived: Optional[bool] = None
+
+class ContactMessagePage(BaseModel):
+    items: list[ContactMessageResponse]
+    next_cursor: Optional[str] = None
+
 
 # ---------------------------
 # Newsletter Subscriptions
@@ -75,90 +106,264 @@ class NewsletterSubscriptionResponse(NewsletterSubscriptionBase):
     class Config:
         from_attributes = True
 
+class NewsletterSubscriptionPage(BaseModel):
+    items: list[NewsletterSubscriptionResponse]
+    next_cursor: Optional[int] = None  # id of the last subscriber on the page
+
 
 # ---------------------------
 # Posts
 # ---------------------------
-class PostBase(BaseModel):
-    category: str
-    title: str
-    image1: Optional[str] = None
-    intro_content: Optional[str] = None
-    content1: Optional[str] = None
-    quote: Optional[str] = None
-    quote_author: Optional[str] = None
-    main_content: Optional[str] = None
-    image2: Optional[str] = None
-    final_content: Optional[str] = None
-
 class PostCreate(PostBase):
     pass
 
 class PostResponse(PostBase):
     id: int
     created_at: date
+    image1_variants: Optional[dict[str, Any]] = None
+    image2_variants: Optional[dict[str, Any]] = None
+    like_count: int = 0
+    comment_count: int = 0
+    excerpt: Optional[str] = None
+    word_count: int = 0
+    reading_minutes: int = 0
 
     class Config:
         from_attributes = True
 
+    @field_validator("created_at", mode="before")
+    @classmethod
+    def date_only(cls, value):
+        # Rows written outside create_post carry the database's full timestamp
+        return value.date() if isinstance(value, datetime) else value
 
-# ---------------------------
-# Traffic
-# ---------------------------
-class TrafficBase(BaseModel):
-    visit_date: date
-    visit_count: int = 1
-
-class TrafficCreate(TrafficBase):
-    pass
+class PostArticle(PostResponse):
+    # Sanitized and assembled when the post was written (content.py)
+    body_html: Optional[str] = None
 
-class TrafficResponse(TrafficBase):
+class PostSummary(BaseModel):
     id: int
+    title: str
+    category: str
+    image1: Optional[str] = None
+    image1_variants: Optional[dict[str, Any]] = None
+    created_at: date
+    excerpt: Optional[str] = None
+    reading_minutes: int = 0
+    like_count: int = 0
+    comment_count: int = 0
 
     class Config:
         from_attributes = True
 
+    @field_validator("created_at", mode="before")
+    @classmethod
+    def date_only(cls, value):
+        return value.date() if isinstance(value, datetime) else value
 
+class PostPage(BaseModel):
+    items: list[dict[str, Any]]
+    next_cursor: Optional[str] = None
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+class PostDetail(BaseModel):
+    post: PostArticle
+    is_liked: bool = False
+    comments: list[CommentResponse]
+    next_comments_cursor: Optional[str] = None
 
-db_dependency = Annotated[Session, Depends(get_db)]
-user_dependency = Annotated[dict, Depends(get_current_user)]
+class PostSearchResult(BaseModel):
+    id: int
+    title: str
+    category: str
+    image1: Optional[str] = None
+    created_at: Optional[datetime] = None
+    score: float
+    snippet: str
 
+class HealthStatus(BaseModel):
+    status: str
 
-@app.get("/contact/", status_code=status.HTTP_200_OK)
-async def read_contact_messages(db: db_dependency):
-    messages = db.query(models.ContactMessage).all()
-    return messages
+class UserInfo(BaseModel):
+    username: str
+    id: int
+    role: str
+
+class CurrentUser(BaseModel):
+    User: UserInfo
+
+# Columns a listing may project with ?fields=, and the light default for list views
+POST_FIELDS = tuple(PostArticle.model_fields)
+POST_LIST_FIELDS = ("id", "title", "category", "image1", "image1_variants", "created_at", "excerpt",
+                    "reading_minutes")
+
+
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+admin_dependency = Annotated[dict, Depends(get_admin_user)]
+
+EXPORT_BATCH = 1000
+contact_limiter = RateLimiter(settings.contact_attempts_per_ip, settings.contact_window_seconds)
+contact_duplicates = DuplicateFilter(settings.contact_duplicate_window_seconds)
+
+
+def contact_filters(since: Optional[datetime], until: Optional[datetime], email: Optional[str],
+                    is_read: Optional[bool], archived: bool) -> list:
+    Message = models.ContactMessage
+    conditions = [Message.is_archived == archived]
+    if since is not None:
+        conditions.append(Message.created_at >= since)
+    if until is not None:
+        conditions.append(Message.created_at < until)
+    if email is not None:
+        conditions.append(Message.email == email)
+    if is_read is not None:
+        conditions.append(Message.is_read == is_read)
+    return conditions
+
+@router.get("/contact/", response_model=ContactMessagePage, status_code=status.HTTP_200_OK)
+async def read_contact_messages(
+    db: read_db_dependency,
+    admin: admin_dependency,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    email: Optional[str] = None,
+    is_read: Optional[bool] = None,
+    archived: bool = False,
+):
+    """Admin inbox, newest first, one keyset page at a time."""
+    Message = models.ContactMessage
+    query = select(Message).where(*contact_filters(since, until, email, is_read, archived))
+    if cursor:
+        created_at, message_id = decode_cursor(cursor)
+        query = query.where(keyset_before(Message.created_at, Message.id, created_at, message_id))
+    result = await db.execute(
+        query.order_by(desc(Message.created_at), desc(Message.id)).limit(limit + 1)
+    )
+    messages = result.scalars().all()
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
+    return ContactMessagePage(items=messages, next_cursor=next_cursor)
+
+@router.get("/contact/export", status_code=status.HTTP_200_OK)
+async def export_contact_messages(
+    admin: admin_dependency,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    email: Optional[str] = None,
+    is_read: Optional[bool] = None,
+    archived: bool = False,
+):
+    """Streams every matching message as NDJSON, oldest first."""
+    Message = models.ContactMessage
+    conditions = contact_filters(since, until, email, is_read, archived)
+
+    async def lines():
+        last_id = 0
+        while True:
+            # A short session per batch so a slow download never pins a connection
+            async with ReadSessionLocal() as session:
+                result = await session.execute(
+                    select(Message).where(*conditions, Message.id > last_id)
+                    .order_by(Message.id).limit(EXPORT_BATCH)
+                )
+                batch = result.scalars().all()
+            if not batch:
+                return
+            last_id = batch[-1].id
+            yield "".join(ContactMessageResponse.model_validate(message).model_dump_json() + "\n"
+                          for message in batch)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="contact.ndjson"'})
+
+@router.patch("/contact/{message_id}", response_model=ContactMessageResponse)
+async def update_contact_message(message_id: int, changes: ContactMessageUpdate,
+                                 db: db_dependency, admin: admin_dependency):
+    """Marks a message read/unread or archives/restores it."""
+    message = await db.get(models.ContactMessage, message_id)
+    if message is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    for field, value in changes.model_dump(exclude_none=True).items():
+        setattr(message, field, value)
+    await db.commit()
+    return message
+
+@router.post("/contact/", response_model=ContactMessageResponse, status_code=status.HTTP_201_CREATED)
+async def create_contact_message(message: ContactMessageCreate, request: Request, db: db_dependency):
+    # Cheap in-memory checks first: floods and resubmits never reach the database
+    enforce(contact_limiter, auth.client_ip(request), "Too many messages from this address")
+    if count_links(message.message) > settings.contact_max_links:
+        raise HTTPException(status_code=422, detail="Message contains too many links")
+    key = fingerprint(message.email, message.subject, message.message)
+    if contact_duplicates.check(key):
+        raise HTTPException(status_code=409, detail="This message was already sent")
 
-@app.post("/contact/", status_code=status.HTTP_201_CREATED)
-async def create_contact_message(message: ContactMessageCreate, db: db_dependency):
     db_message = models.ContactMessage(**message.dict())
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    try:
+        await db.commit()
+    except Exception:
+        contact_duplicates.forget(key)
+        raise
+    notification_queue.submit(ContactMessageResponse.model_validate(db_message).model_dump())
     return db_message
 
-@app.post("/subscribe/", status_code=status.HTTP_201_CREATED)
+@router.post("/subscribe/", response_model=NewsletterSubscriptionResponse, status_code=status.HTTP_201_CREATED)
 async def create_newsletter_subscription(subscription: NewsletterSubscriptionCreate, db: db_dependency):
     db_subscription = models.NewsletterSubscription(**subscription.dict())
     db.add(db_subscription)
-    db.commit()
-    db.refresh(db_subscription)
+    await db.commit()
+    await db.refresh(db_subscription)
     return db_subscription
 
-@app.get("/subscribe/", status_code=status.HTTP_200_OK)
-async def read_newsletter_subscriptions(db: db_dependency):
-    subscriptions = db.query(models.NewsletterSubscription).all()
-    return subscriptions
-
-@app.post("/posts/", response_model=PostResponse, status_code=status.HTTP_201_CREATED)
+UNSUBSCRIBE_PAGE = """<!doctype html>
+<title>Unsubscribe</title>
+<form method="post">
+  <p>Stop sending the newsletter to {email}?</p>
+  <button>Unsubscribe</button>
+</form>
+"""
+
+@router.get("/unsubscribe/", response_class=HTMLResponse, include_in_schema=False)
+async def confirm_unsubscribe(email: str, token: str):
+    """The link in each newsletter shows a button: link scanners follow GETs, never forms."""
+    return HTMLResponse(UNSUBSCRIBE_PAGE.format(email=html.escape(email)))
+
+@router.post("/unsubscribe/", response_model=MessageResponse)
+async def unsubscribe(email: str, token: str, db: db_dependency):
+    """Removes a subscriber given the signed link from their email; also the List-Unsubscribe one-click target."""
+    await newsletter.unsubscribe(db, email, token)
+    return {"message": "Unsubscribed"}
+
+@router.get("/subscribe/", response_model=NewsletterSubscriptionPage, status_code=status.HTTP_200_OK)
+async def read_newsletter_subscriptions(
+    db: read_db_dependency,
+    admin: admin_dependency,
+    cursor: Optional[int] = Query(None, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Admin view of subscribers in id order, one keyset page at a time; see /newsletter/export for all of them."""
+    Subscription = models.NewsletterSubscription
+    query = select(Subscription)
+    if cursor is not None:
+        query = query.where(Subscription.id > cursor)
+    result = await db.execute(query.order_by(Subscription.id).limit(limit + 1))
+    subscriptions = result.scalars().all()
+    next_cursor = None
+    if len(subscriptions) > limit:
+        subscriptions = subscriptions[:limit]
+        next_cursor = subscriptions[-1].id
+    return NewsletterSubscriptionPage(items=subscriptions, next_cursor=next_cursor)
+
+@router.post("/posts/", response_model=PostResponse, status_code=status.HTTP_201_CREATED)
 async def create_post(
+    request: Request,
+    background_tasks: BackgroundTasks,
     category: str = Form(...),
     title: str = Form(...),
     intro_content: str = Form(None),
@@ -169,25 +374,19 @@ async def create_post(
     final_content: str = Form(None),
     image1: UploadFile = File(None),
     image2: UploadFile = File(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # --- Save image1 ---
-    image1_url = None
+    image1_url = image1_file = None
     if image1:
-        image1_path = os.path.join(UPLOAD_DIR, image1.filename)
-        with open(image1_path, "wb") as buffer:
-            shutil.copyfileobj(image1.file, buffer)
-        BASE_URL = "https://pmhfhd37-8000.uks1.devtunnels.ms"
-        image1_url = f"{BASE_URL}/{UPLOAD_DIR}/{image1.filename}"
+        image1_file = await save_upload(image1)
+        image1_url = public_url(request, image1_file) if image1_file else None
 
     # --- Save image2 ---
-    image2_url = None
+    image2_url = image2_file = None
     if image2:
-        image2_path = os.path.join(UPLOAD_DIR, image2.filename)
-        with open(image2_path, "wb") as buffer:
-            shutil.copyfileobj(image2.file, buffer)
-        BASE_URL = "https://pmhfhd37-8000.uks1.devtunnels.ms"
-        image2_url = f"{BASE_URL}/{UPLOAD_DIR}/{image2.filename}"
+        image2_file = await save_upload(image2)
+        image2_url = public_url(request, image2_file) if image2_file else None
 
     # --- Create post record ---
     db_post = models.Post(
@@ -203,58 +402,262 @@ async def create_post(
         image2=image2_url,
         created_at=date.today()
     )
+    render_post(db_post)
 
     db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
+    await db.commit()
+    await db.refresh(db_post)
+    response_cache.invalidate("posts:list", "posts:recent", "feeds",
+                              *feeds.sitemap_namespaces(db_post.id))
+    await index_post(db_post)
+    background_tasks.add_task(related_posts.refresh, db_post.id)
+    background_tasks.add_task(feeds.rebuild, feeds.site_base(request))
+    if image1_file or image2_file:
+        background_tasks.add_task(images.process_post_images, db_post.id,
+                                  public_base(request), image1_file, image2_file)
+    if settings.newsletter_send_on_publish:
+        delivery_engine.start(db_post.id, public_base(request))
 
     return db_post
 
 
-@app.get("/posts/", status_code=status.HTTP_200_OK)
-async def read_posts(db: db_dependency):
-    posts = db.query(models.Post).all()
-    return posts
-
-@app.put("/posts/{post_id}", status_code=status.HTTP_200_OK)
-async def update_post(post_id: int, post: PostBase, db: db_dependency):
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
+@router.get("/posts/", response_model=PostPage, status_code=status.HTTP_200_OK)
+async def read_posts(
+    request: Request,
+    db: read_db_dependency,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    category: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """Lists posts newest first, one keyset page at a time."""
+    if fields:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = set(requested) - set(POST_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    else:
+        requested = list(POST_LIST_FIELDS)
+    cache_key = response_cache.key("posts:list", cursor=cursor, limit=limit,
+                                   category=category, fields=",".join(requested))
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached.to_response(request)
+
+    # id and created_at are always loaded since the next cursor is built from them
+    columns = list(dict.fromkeys(["id", "created_at", *requested]))
+
+    query = select(*(getattr(models.Post, name) for name in columns))
+    if category is not None:
+        query = query.where(models.Post.category == category)
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        query = query.where(keyset_before(models.Post.created_at, models.Post.id, created_at, post_id))
+    result = await db.execute(
+        query.order_by(desc(models.Post.created_at), desc(models.Post.id))
+        .limit(limit + 1)
+    )
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    items = [{name: row._mapping[name] for name in requested} for row in rows]
+    page = PostPage(items=items, next_cursor=next_cursor)
+    return response_cache.store(cache_key, page, PostPage).to_response(request)
+
+@router.put("/posts/{post_id}", response_model=PostResponse, status_code=status.HTTP_200_OK)
+async def update_post(post_id: int, post: PostBase, request: Request,
+                      background_tasks: BackgroundTasks, db: db_dependency):
+    db_post = await db.get(models.Post, post_id)
     if db_post is None:
         raise HTTPException(status_code=404, detail="Post not found")
+    # Derivatives belong to the old image; drop them and re-render for a new upload URL
+    regenerate = {}
+    for column in ("image1", "image2"):
+        if getattr(post, column) != getattr(db_post, column):
+            setattr(db_post, f"{column}_variants", None)
+            regenerate[column] = images.stored_filename(getattr(post, column))
     for key, value in post.dict().items():
         setattr(db_post, key, value)
-    db.commit()
-    db.refresh(db_post)
+    # Only re-rendered when a content field actually changed
+    render_post(db_post)
+    await db.commit()
+    await db.refresh(db_post)
+    response_cache.invalidate("posts:list", "posts:recent", f"post:{post_id}", "feeds")
+    await index_post(db_post)
+    background_tasks.add_task(related_posts.refresh, post_id)
+    background_tasks.add_task(feeds.rebuild, feeds.site_base(request))
+    if any(regenerate.values()):
+        background_tasks.add_task(images.process_post_images, post_id, public_base(request),
+                                  regenerate.get("image1"), regenerate.get("image2"))
     return db_post
 
-@app.get("/posts/recent")
-def get_recent_posts(db: Session = Depends(get_db)):
-    posts = (
-        db.query(models.Post)
+@router.get("/posts/recent", response_model=list[PostSummary])
+async def get_recent_posts(request: Request, db: read_db_dependency):
+    cache_key = response_cache.key("posts:recent")
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached.to_response(request)
+    # Cards show the stored excerpt, so the post bodies are never loaded here
+    result = await db.execute(
+        select(*(getattr(models.Post, name) for name in PostSummary.model_fields))
         .order_by(desc(models.Post.created_at))
         .limit(6)
-        .all()
     )
-    return posts
-
-@app.get("/posts/{post_id}", status_code=status.HTTP_200_OK)
-async def read_post(post_id: int, db: db_dependency):
-    post = db.query(models.Post).filter(models.Post.id == post_id).first()
+    posts = [row._asdict() for row in result]
+    return response_cache.store(cache_key, posts, list[PostSummary]).to_response(request)
+
+@router.get("/posts/search", response_model=list[PostSearchResult])
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=1000),
+):
+    """Ranked (BM25) full-text search with highlighted snippets."""
+    return await run_in_threadpool(search_index.search, q, limit, offset)
+
+@router.get("/posts/{post_id}", response_model=PostArticle, status_code=status.HTTP_200_OK)
+async def read_post(post_id: int, request: Request, db: read_db_dependency):
+    cache_key = response_cache.key(f"post:{post_id}")
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached.to_response(request)
+    post = await db.get(models.Post, post_id)
+    if post is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return response_cache.store(cache_key, post, PostArticle).to_response(request)
+
+@router.get("/posts/{post_id}/detail", response_model=PostDetail)
+async def read_post_detail(
+    post_id: int,
+    db: read_db_dependency,
+    current_user: Annotated[Optional[dict], Depends(get_optional_user)],
+    comments_cursor: Optional[str] = None,
+    comments_limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Everything an article page needs (post, a page of comments with authors,
+    like counters and the caller's like status) in two statements."""
+    query = select(models.Post).where(models.Post.id == post_id)
+    if current_user is not None:
+        # Only the caller's own like (if any) is joined in, never the whole collection
+        query = query.options(joinedload(
+            models.Post.likes.and_(models.Like.user_id == current_user["id"])
+        ))
+    post = (await db.execute(query)).unique().scalar_one_or_none()
     if post is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    return post
 
-@app.delete("/posts/{post_id}", status_code=status.HTTP_200_OK)
-async def delete_post(post_id: int, db: db_dependency):
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
+    comments_query = (
+        select(models.Comment)
+        .options(joinedload(models.Comment.user))
+        .where(models.Comment.post_id == post_id)
+    )
+    if comments_cursor:
+        created_at, comment_id = decode_cursor(comments_cursor)
+        comments_query = comments_query.where(
+            keyset_after(models.Comment.created_at, models.Comment.id, created_at, comment_id))
+    result = await db.execute(
+        comments_query.order_by(models.Comment.created_at, models.Comment.id)
+        .limit(comments_limit + 1)
+    )
+    page = result.scalars().all()
+    next_cursor = None
+    if len(page) > comments_limit:
+        page = page[:comments_limit]
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+
+    article = PostArticle.model_validate(post)
+    is_liked = current_user is not None and bool(post.likes)
+    if current_user is not None:
+        # Read-your-writes, as on /likes/counts: overlay the caller's own unflushed click
+        pending = like_buffer.pending_state(current_user["id"], post_id)
+        if pending is not None and pending != is_liked:
+            article.like_count += 1 if pending else -1
+            is_liked = pending
+    return {
+        "post": article,
+        "is_liked": is_liked,
+        "comments": page,
+        "next_comments_cursor": next_cursor,
+    }
+
+@router.delete("/posts/{post_id}", response_model=PostResponse, status_code=status.HTTP_200_OK)
+async def delete_post(post_id: int, request: Request, background_tasks: BackgroundTasks,
+                      db: db_dependency):
+    db_post = await db.get(models.Post, post_id)
     if db_post is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    db.delete(db_post)
-    db.commit()
+    await db.delete(db_post)
+    await related_posts.forget(db, post_id)
+    await db.commit()
+    response_cache.invalidate("posts:list", "posts:recent", f"post:{post_id}",
+                              f"comments:{post_id}", "related", "feeds",
+                              *feeds.sitemap_namespaces(post_id))
+    background_tasks.add_task(feeds.rebuild, feeds.site_base(request))
+    await unindex_post(post_id)
     return db_post
 
-@app.get("/", status_code=status.HTTP_200_OK)
+@router.get("/health", response_model=HealthStatus, status_code=status.HTTP_200_OK)
+async def health():
+    try:
+        await check_database(retries=1)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "ok"}
+
+@router.get("/", response_model=CurrentUser, status_code=status.HTTP_200_OK)
 async def user(user: user_dependency, db: db_dependency):
     if user is None:
         raise HTTPException(status_code=401, detail="Not authenticated")
     return {"User": user}
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="Blog API", lifespan=lifespan)
+
+    app.include_router(comments.router)
+    app.include_router(likes.router)
+    # Old double-prefixed paths (/likes/likes/...), kept for clients that still call them
+    app.include_router(likes.router, prefix="/likes", include_in_schema=False)
+    app.include_router(metrics.router)
+    app.include_router(image_routes.router)
+    app.include_router(traffic_routes.router)
+    app.include_router(newsletter_routes.router)
+    app.include_router(live_routes.router)
+    app.include_router(bulk_post_routes.router)
+    app.include_router(related_routes.router)
+    app.include_router(feed_routes.router)
+    app.include_router(auth.router)
+    app.include_router(router)
+    # check_dir=False: the directory is created by the first upload, not at import
+    app.mount("/uploads", UploadFiles(directory=UPLOAD_DIR, check_dir=False), name="uploads")
+
+    # Innermost, so an early 413 still passes through CORS
+    app.add_middleware(UploadLimitMiddleware, limits={
+        "/posts/": settings.max_upload_request_bytes,
+        "/posts/import": settings.max_import_request_bytes,
+        "/newsletter/import": settings.max_import_request_bytes,
+    })
+    # Allow frontend at 127.0.0.1:5500 to talk to backend
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5500",
+                       "http://127.0.0.1:5500",
+                       "https://pmhfhd37-5500.uks1.devtunnels.ms"],  # frontend origin
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        # Lets the browser's devtools show the app/db timings
+        expose_headers=["Server-Timing"],
+    )
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
+    # Added last so it wraps everything, CORS and compression included
+    app.add_middleware(InstrumentationMiddleware)
+    return app
+
+
+# Entry point for uvicorn (main:app) and the Vercel build
+app = create_app()
@@ -0,0 +1,78 @@
+"""Post counters and image variants, keyset indexes, contact inbox state, traffic rollups
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 19:00:01.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("posts") as batch:
+        batch.add_column(sa.Column("image1_variants", sa.JSON(), nullable=True))
+        batch.add_column(sa.Column("image2_variants", sa.JSON(), nullable=True))
+        batch.add_column(sa.Column("like_count", sa.Integer(), server_default="0", nullable=False))
+        batch.add_column(sa.Column("comment_count", sa.Integer(), server_default="0", nullable=False))
+    op.create_index("ix_posts_created_at_id", "posts", ["created_at", "id"])
+    op.create_index("ix_posts_category_created_at_id", "posts", ["category", "created_at", "id"])
+    # Bring the new denormalized counters in line with existing likes and comments
+    op.execute("UPDATE posts SET "
+               "like_count = (SELECT COUNT(*) FROM likes WHERE likes.post_id = posts.id), "
+               "comment_count = (SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id)")
+
+    op.create_index("ix_comments_post_id_created_at_id", "comments", ["post_id", "created_at", "id"])
+
+    with op.batch_alter_table("contact_messages") as batch:
+        batch.add_column(sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(),
+                                   nullable=False))
+        batch.add_column(sa.Column("is_read", sa.Boolean(), server_default="0", nullable=False))
+        batch.add_column(sa.Column("is_archived", sa.Boolean(), server_default="0", nullable=False))
+    op.create_index("ix_contact_messages_created_at_id", "contact_messages", ["created_at", "id"])
+    op.create_index("ix_contact_messages_email_created_at_id", "contact_messages",
+                    ["email", "created_at", "id"])
+
+    op.create_table(
+        "traffic",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("post_id", sa.Integer(), nullable=True),
+        sa.Column("visit_date", sa.Date(), nullable=False),
+        sa.Column("visit_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("unique_visitors", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("visitor_sketch", sa.LargeBinary(), nullable=True),
+        sa.ForeignKeyConstraint(["post_id"], ["posts.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("post_id", "visit_date", name="unique_post_visit_date"),
+    )
+    op.create_index("ix_traffic_id", "traffic", ["id"])
+    op.create_index("ix_traffic_visit_date_post_id", "traffic", ["visit_date", "post_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("traffic")
+    op.drop_index("ix_contact_messages_email_created_at_id", table_name="contact_messages")
+    op.drop_index("ix_contact_messages_created_at_id", table_name="contact_messages")
+    with op.batch_alter_table("contact_messages") as batch:
+        batch.drop_column("is_archived")
+        batch.drop_column("is_read")
+        batch.drop_column("created_at")
+    op.drop_index("ix_comments_post_id_created_at_id", table_name="comments")
+    op.drop_index("ix_posts_category_created_at_id", table_name="posts")
+    op.drop_index("ix_posts_created_at_id", table_name="posts")
+    with op.batch_alter_table("posts") as batch:
+        batch.drop_column("comment_count")
+        batch.drop_column("like_count")
+        batch.drop_column("image2_variants")
+        batch.drop_column("image1_variants")
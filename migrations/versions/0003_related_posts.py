@@ -0,0 +1,38 @@
+"""Precomputed related posts
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 19:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "related_posts",
+        sa.Column("post_id", sa.Integer(), nullable=False),
+        sa.Column("related_id", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["post_id"], ["posts.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["related_id"], ["posts.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("post_id", "related_id"),
+    )
+    op.create_index("ix_related_posts_post_id_score", "related_posts", ["post_id", "score"])
+    op.create_index("ix_related_posts_related_id", "related_posts", ["related_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("related_posts")
@@ -0,0 +1,40 @@
+"""Rendered post HTML, excerpt and reading stats
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 20:00:00.000000
+
+Existing rows start at render_version 0; `python content.py` renders them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("posts") as batch:
+        batch.add_column(sa.Column("body_html", sa.Text(), nullable=True))
+        batch.add_column(sa.Column("excerpt", sa.String(length=320), nullable=True))
+        batch.add_column(sa.Column("word_count", sa.Integer(), server_default="0", nullable=False))
+        batch.add_column(sa.Column("reading_minutes", sa.Integer(), server_default="0", nullable=False))
+        batch.add_column(sa.Column("content_hash", sa.String(length=64), nullable=True))
+        batch.add_column(sa.Column("render_version", sa.Integer(), server_default="0", nullable=False))
+    op.create_index("ix_posts_render_version", "posts", ["render_version"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_posts_render_version", table_name="posts")
+    with op.batch_alter_table("posts") as batch:
+        for column in ("render_version", "content_hash", "reading_minutes", "word_count",
+                       "excerpt", "body_html"):
+            batch.drop_column(column)
@@ -0,0 +1,70 @@
+"""One site-wide traffic row per day
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 22:00:00.000000
+
+unique_post_visit_date never matched two NULL post_ids, so concurrent flushes
+could write several site-wide rows for a day. Those are folded into one (counts
+summed, HyperLogLog registers maxed) before a unique index on
+(coalesce(post_id, 0), visit_date) rules them out.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+traffic = sa.table(
+    "traffic",
+    sa.column("id", sa.Integer()),
+    sa.column("post_id", sa.Integer()),
+    sa.column("visit_date", sa.Date()),
+    sa.column("visit_count", sa.Integer()),
+    sa.column("unique_visitors", sa.Integer()),
+    sa.column("visitor_sketch", sa.LargeBinary()),
+)
+
+
+def merge_registers(left, right):
+    if not left or not right or len(left) != len(right):
+        return left or right
+    return bytes(map(max, left, right))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    connection = op.get_bind()
+    duplicated = connection.execute(
+        sa.select(traffic.c.visit_date).where(traffic.c.post_id.is_(None))
+        .group_by(traffic.c.visit_date).having(sa.func.count() > 1)
+    ).scalars().all()
+    for day in duplicated:
+        rows = connection.execute(
+            sa.select(traffic).where(traffic.c.post_id.is_(None), traffic.c.visit_date == day)
+            .order_by(traffic.c.id)
+        ).all()
+        keep, extra = rows[0], rows[1:]
+        sketch = keep.visitor_sketch
+        for row in extra:
+            sketch = merge_registers(sketch, row.visitor_sketch)
+        # The next flush re-estimates unique_visitors from the merged sketch
+        connection.execute(traffic.update().where(traffic.c.id == keep.id).values(
+            visit_count=sum(row.visit_count for row in rows),
+            unique_visitors=max(row.unique_visitors for row in rows),
+            visitor_sketch=sketch,
+        ))
+        connection.execute(traffic.delete().where(traffic.c.id.in_([row.id for row in extra])))
+    op.create_index("uq_traffic_post_visit_date", "traffic",
+                    [sa.func.coalesce(sa.column("post_id"), 0), "visit_date"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("uq_traffic_post_visit_date", table_name="traffic")
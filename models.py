@@ -1,8 +1,17 @@
-from datetime import date
+from datetime import date, datetime
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Date, DateTime, Enum, ForeignKey, Integer, String, Text, UniqueConstraint, func
+from sqlalchemy import JSON, Boolean, Column, Date, DateTime, Enum, Float, ForeignKey, Index, Integer, LargeBinary, String, Text, UniqueConstraint, func
+from sqlalchemy.dialects import sqlite
 from database import Base
 
+# SQLite's CURRENT_TIMESTAMP has whole seconds; bind Python datetimes in the same shape so
+# keyset comparisons against server-defaulted rows line up (other backends are unaffected)
+Timestamp = DateTime().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d "
+                                   "%(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
 # Contact Messages Table
 class ContactMessage(Base):
     __tablename__ = "contact_messages"
@@ -13,6 +22,16 @@ class ContactMessage(Base):
     phone = Column(String(50), nullable=True)
     subject = Column(String(200), nullable=False)
     message = Column(Text, nullable=False)
+    # Set in Python so the POST can answer without re-reading the row
+    created_at = Column(Timestamp, nullable=False, default=datetime.utcnow)
+    is_read = Column(Boolean, nullable=False, default=False, server_default="0")
+    is_archived = Column(Boolean, nullable=False, default=False, server_default="0")
+
+    # The inbox walks (created_at, id) newest first, optionally for one sender
+    __table_args__ = (
+        Index("ix_contact_messages_created_at_id", "created_at", "id"),
+        Index("ix_contact_messages_email_created_at_id", "email", "created_at", "id"),
+    )
 
 
 # Newsletter Subscriptions Table
@@ -44,9 +63,33 @@ class Post(Base):
     main_content = Column(Text, nullable=True)
     image2 = Column(String(255), nullable=True)
     final_content = Column(Text, nullable=True)
+    # Resized derivatives of image1/image2, filled in by a background job (see images.py)
+    image1_variants = Column(JSON, nullable=True)
+    image2_variants = Column(JSON, nullable=True)
+    # Denormalized counters, kept in step by the like/comment routes (see counters.py)
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Rendered once per write from the content fields (see content.py), never per request
+    body_html = Column(Text, nullable=True)
+    excerpt = Column(String(320), nullable=True)
+    word_count = Column(Integer, nullable=False, default=0, server_default="0")
+    reading_minutes = Column(Integer, nullable=False, default=0, server_default="0")
+    content_hash = Column(String(64), nullable=True)
+    render_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
     likes = relationship("Like", back_populates="post", cascade="all, delete-orphan")
+    traffic = relationship("Traffic", back_populates="post", cascade="all, delete-orphan")
+    related = relationship("RelatedPost", foreign_keys="RelatedPost.post_id",
+                           cascade="all, delete-orphan")
+
+    # Keyset pagination on the listing walks (created_at, id), optionally within a category
+    __table_args__ = (
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_category_created_at_id", "category", "created_at", "id"),
+        # Lets the re-render job find rows from an older renderer without a full scan
+        Index("ix_posts_render_version", "render_version"),
+    )
 
 # Users Table
 class Users(Base):
@@ -67,7 +110,7 @@ class Comment(Base):
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     content = Column(Text, nullable=False)
     created_at = Column(
-    DateTime, 
+    Timestamp, 
     # Use server_default to have the database itself set the value 
     # Use func.now() which SQLAlchemy translates to the appropriate database function
     server_default=func.now()
@@ -79,6 +122,15 @@ class Comment(Base):
     user = relationship("Users", back_populates="comments")
     post = relationship("Post", back_populates="comments")
 
+    # Comment pages walk (created_at, id) within a single post
+    __table_args__ = (Index("ix_comments_post_id_created_at_id", "post_id", "created_at", "id"),)
+
+    @property
+    def username(self):
+        # Only set when `user` was eager-loaded; reading __dict__ never triggers a lazy load
+        user = self.__dict__.get("user")
+        return user.username if user is not None else None
+
 
 class Like(Base):
     __tablename__ = "likes"
@@ -97,4 +149,42 @@ class Like(Base):
     user = relationship("Users", back_populates="likes")
     post = relationship("Post", back_populates="likes")
 
-    __table_args__ = (UniqueConstraint("user_id", "post_id", name="unique_user_post_like"),)
\ No newline at end of file
+    __table_args__ = (UniqueConstraint("user_id", "post_id", name="unique_user_post_like"),)
+
+
+# Daily page-view rollups, written in batches by analytics.py
+class Traffic(Base):
+    __tablename__ = "traffic"
+
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    # NULL post_id holds the site-wide total for the day
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=True)
+    visit_date = Column(Date, nullable=False)
+    visit_count = Column(Integer, nullable=False, default=0, server_default="0")
+    unique_visitors = Column(Integer, nullable=False, default=0, server_default="0")
+    # HyperLogLog registers behind unique_visitors, so later flushes can merge into them
+    visitor_sketch = Column(LargeBinary, nullable=True)
+
+    post = relationship("Post", back_populates="traffic")
+
+    __table_args__ = (
+        UniqueConstraint("post_id", "visit_date", name="unique_post_visit_date"),
+        # NULLs never collide in a unique key, so the site-wide row needs one of its own
+        Index("uq_traffic_post_visit_date", func.coalesce(post_id, 0), "visit_date", unique=True),
+        Index("ix_traffic_visit_date_post_id", "visit_date", "post_id"),
+    )
+
+
+# Precomputed "related posts": each post's top-k most similar posts (see related.py)
+class RelatedPost(Base):
+    __tablename__ = "related_posts"
+
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    related_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # The lookup: one post's neighbours, best first
+        Index("ix_related_posts_post_id_score", "post_id", "score"),
+        Index("ix_related_posts_related_id", "related_id"),
+    )
@@ -0,0 +1,374 @@
+# newsletter.py
+import asyncio
+import codecs
+import csv
+import hashlib
+import hmac
+import io
+import json
+import logging
+import random
+import smtplib
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import AsyncIterator, Optional
+from urllib.parse import quote
+import anyio
+from fastapi import HTTPException, UploadFile
+from pydantic import EmailStr, TypeAdapter, ValidationError
+from sqlalchemy import delete, select
+from auth import SECRET_KEY
+from config import settings
+from database import ReadSessionLocal, SessionLocal, insert_ignoring_duplicates
+from models import NewsletterSubscription, Post
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_BYTES = 64 * 1024
+MAX_ERROR_SAMPLES = 20
+
+email_adapter = TypeAdapter(EmailStr)
+
+
+# ---------------------------
+# Import / export
+# ---------------------------
+async def iter_csv_rows(upload: UploadFile) -> AsyncIterator[list[str]]:
+    """Parses an uploaded CSV a chunk at a time instead of reading it whole."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    while True:
+        chunk = await upload.read(IMPORT_CHUNK_BYTES)
+        pending += decoder.decode(chunk, final=not chunk)
+        if chunk:
+            # The last piece may be a partial line; keep it for the next chunk
+            *lines, pending = pending.split("\n")
+        else:
+            lines, pending = [pending], ""
+        for row in csv.reader(lines):
+            if row:
+                yield row
+        if not chunk:
+            return
+
+
+async def _insert_emails(db, emails: list[str]) -> int:
+    existing = set((await db.execute(
+        select(NewsletterSubscription.email).where(NewsletterSubscription.email.in_(emails))
+    )).scalars())
+    fresh = [email for email in emails if email not in existing]
+    if fresh:
+        # Still insert-ignore: a concurrent signup may land between the check and the write
+        await db.execute(
+            insert_ignoring_duplicates(NewsletterSubscription, "email", db.bind.dialect.name),
+            [{"email": email} for email in fresh],
+        )
+        await db.commit()
+    return len(fresh)
+
+
+async def import_subscribers(upload: UploadFile) -> dict:
+    """Bulk-loads emails from a CSV (an ``email`` header column, else the first column)."""
+    inserted = duplicates = invalid = 0
+    column, batch = None, {}
+    async with SessionLocal() as db:
+        async for row in iter_csv_rows(upload):
+            if column is None:
+                lowered = [cell.strip().lower() for cell in row]
+                if "email" in lowered:
+                    column = lowered.index("email")
+                    continue
+                column = 0
+            try:
+                email = email_adapter.validate_python(row[column].strip())
+            except (IndexError, ValidationError):
+                invalid += 1
+                continue
+            if email in batch:
+                duplicates += 1
+                continue
+            batch[email] = None
+            if len(batch) >= settings.newsletter_batch_size:
+                added = await _insert_emails(db, list(batch))
+                inserted, duplicates = inserted + added, duplicates + len(batch) - added
+                batch = {}
+        if batch:
+            added = await _insert_emails(db, list(batch))
+            inserted, duplicates = inserted + added, duplicates + len(batch) - added
+    return {"inserted": inserted, "duplicates": duplicates, "invalid": invalid}
+
+
+async def iter_subscribers(batch_size: int, after_id: int = 0) -> AsyncIterator[list]:
+    """Walks the subscriber table by id, one short-lived query per batch."""
+    while True:
+        async with ReadSessionLocal() as db:
+            rows = (await db.execute(
+                select(NewsletterSubscription.id, NewsletterSubscription.email)
+                .where(NewsletterSubscription.id > after_id)
+                .order_by(NewsletterSubscription.id)
+                .limit(batch_size)
+            )).all()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1].id
+
+
+async def export_subscribers(fmt: str) -> AsyncIterator[str]:
+    if fmt == "csv":
+        yield "id,email\r\n"
+    async for rows in iter_subscribers(settings.newsletter_batch_size):
+        if fmt == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            yield buffer.getvalue()
+        else:
+            yield "".join(json.dumps({"id": row.id, "email": row.email}) + "\n" for row in rows)
+
+
+# ---------------------------
+# Unsubscribing
+# ---------------------------
+def unsubscribe_token(email: str) -> str:
+    """HMAC of the address, so a link only unsubscribes the address it was sent to."""
+    return hmac.new(SECRET_KEY.encode(), email.lower().encode(), hashlib.sha256).hexdigest()
+
+
+def unsubscribe_link(base_url: str, email: str) -> str:
+    return settings.newsletter_unsubscribe_url.format(base_url=base_url, email=quote(email),
+                                                      token=unsubscribe_token(email))
+
+
+async def unsubscribe(db, email: str, token: str) -> bool:
+    """Removes the address; False when it wasn't subscribed (a repeated click is no error)."""
+    if not hmac.compare_digest(token, unsubscribe_token(email)):
+        raise HTTPException(status_code=403, detail="Invalid unsubscribe link")
+    result = await db.execute(delete(NewsletterSubscription).where(NewsletterSubscription.email == email))
+    await db.commit()
+    return result.rowcount > 0
+
+
+# ---------------------------
+# Mail backends
+# ---------------------------
+class ConsoleBackend:
+    """Logs messages instead of sending them."""
+
+    def open(self):
+        return self
+
+    def send(self, message: EmailMessage):
+        logger.info("Newsletter to %s: %s", message["To"], message["Subject"])
+
+    def close(self):
+        pass
+
+
+class SMTPConnection:
+    def __init__(self):
+        self._smtp: Optional[smtplib.SMTP] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=settings.smtp_timeout)
+        if settings.smtp_starttls:
+            smtp.starttls()
+        if settings.smtp_username:
+            smtp.login(settings.smtp_username, settings.smtp_password or "")
+        return smtp
+
+    def send(self, message: EmailMessage):
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Servers drop idle sessions; reconnect once, other failures go to the retry loop
+            self._smtp = self._connect()
+            self._smtp.send_message(message)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            self._smtp = None
+
+
+class SMTPBackend:
+    """Plain smtplib; each delivery worker keeps its own session open across messages."""
+
+    def open(self):
+        return SMTPConnection()
+
+
+MAIL_BACKENDS = {"console": ConsoleBackend, "smtp": SMTPBackend}
+
+
+def get_mail_backend():
+    return MAIL_BACKENDS[settings.mail_backend]()
+
+
+# ---------------------------
+# Delivery
+# ---------------------------
+def build_message(post, recipient: str, base_url: str) -> EmailMessage:
+    link = settings.newsletter_post_url.format(base_url=base_url, post_id=post.id)
+    unsubscribe = unsubscribe_link(base_url, recipient)
+    message = EmailMessage()
+    message["From"] = settings.mail_from
+    message["To"] = recipient
+    message["Subject"] = post.title
+    # RFC 8058 one-click: mail clients POST to the link themselves
+    message["List-Unsubscribe"] = f"<{unsubscribe}>"
+    message["List-Unsubscribe-Post"] = "List-Unsubscribe=One-Click"
+    message.set_content(f"{post.title}\n\n{post.intro_content or ''}\n\nRead more: {link}\n"
+                        f"\n--\nUnsubscribe: {unsubscribe}\n")
+    return message
+
+
+class Delivery:
+    """One newsletter send: progress counters plus the task driving it."""
+
+    def __init__(self, post_id: int):
+        self.id = uuid.uuid4().hex
+        self.post_id = post_id
+        self.status = "queued"
+        self.total = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.last_id = 0
+        self.errors: list[str] = []
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def record_error(self, recipient: str, error: Exception):
+        self.errors.append(f"{recipient}: {error}")
+        del self.errors[:-MAX_ERROR_SAMPLES]
+
+
+class DeliveryEngine:
+    """Fans a post out to every subscriber through a fixed pool of async workers.
+
+    A producer walks the subscriber table in keyset batches into a bounded
+    queue, so memory stays flat however large the list is. Each worker holds
+    one backend connection and retries a failed recipient with exponential
+    backoff before counting it as failed. Finished deliveries are kept for
+    ``keep_seconds`` and at most ``keep_finished`` of them, newest first.
+    """
+
+    def __init__(self, keep_finished: int, keep_seconds: float):
+        self.keep_finished = keep_finished
+        self.keep_seconds = keep_seconds
+        self.deliveries: dict[str, Delivery] = {}
+
+    def prune(self):
+        finished = sorted((d for d in self.deliveries.values() if d.finished_at is not None),
+                          key=lambda d: d.finished_at, reverse=True)
+        cutoff = datetime.utcnow() - timedelta(seconds=self.keep_seconds)
+        for index, delivery in enumerate(finished):
+            if index >= self.keep_finished or delivery.finished_at < cutoff:
+                del self.deliveries[delivery.id]
+
+    def list(self) -> list[Delivery]:
+        self.prune()
+        return list(self.deliveries.values())
+
+    def start(self, post_id: int, base_url: str) -> Delivery:
+        self.prune()
+        delivery = Delivery(post_id)
+        self.deliveries[delivery.id] = delivery
+        delivery.task = asyncio.create_task(self._run(delivery, base_url))
+        return delivery
+
+    def get(self, delivery_id: str) -> Delivery:
+        self.prune()
+        delivery = self.deliveries.get(delivery_id)
+        if delivery is None:
+            raise HTTPException(status_code=404, detail="Delivery not found")
+        return delivery
+
+    def cancel(self, delivery_id: str) -> Delivery:
+        delivery = self.get(delivery_id)
+        if delivery.task is not None and not delivery.task.done():
+            delivery.task.cancel()
+        return delivery
+
+    async def shutdown(self):
+        tasks = [d.task for d in self.deliveries.values() if d.task and not d.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, delivery: Delivery, base_url: str):
+        delivery.status = "running"
+        try:
+            async with ReadSessionLocal() as db:
+                post = await db.get(Post, delivery.post_id)
+            if post is None:
+                raise LookupError(f"Post {delivery.post_id} no longer exists")
+            queue: asyncio.Queue = asyncio.Queue(maxsize=settings.newsletter_batch_size)
+            backend = get_mail_backend()
+            workers = [asyncio.create_task(self._worker(delivery, queue, backend, post, base_url))
+                       for _ in range(settings.newsletter_workers)]
+            try:
+                async for rows in iter_subscribers(settings.newsletter_batch_size):
+                    for row in rows:
+                        await queue.put(row.email)
+                    delivery.total += len(rows)
+                    delivery.last_id = rows[-1].id
+                await queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+            delivery.status = "done"
+        except asyncio.CancelledError:
+            delivery.status = "cancelled"
+            raise
+        except Exception as error:
+            logger.exception("Newsletter delivery %s failed", delivery.id)
+            delivery.status = "failed"
+            delivery.record_error("*", error)
+        finally:
+            delivery.finished_at = datetime.utcnow()
+
+    async def _worker(self, delivery: Delivery, queue: asyncio.Queue, backend, post, base_url: str):
+        connection = await anyio.to_thread.run_sync(backend.open)
+        try:
+            while True:
+                recipient = await queue.get()
+                try:
+                    await self._send(delivery, connection, build_message(post, recipient, base_url))
+                except Exception as error:
+                    # Anything unexpected still counts against this recipient, never the worker
+                    delivery.failed += 1
+                    delivery.record_error(recipient, error)
+                finally:
+                    queue.task_done()
+        finally:
+            await anyio.to_thread.run_sync(connection.close)
+
+    async def _send(self, delivery: Delivery, connection, message: EmailMessage):
+        for attempt in range(settings.newsletter_max_attempts):
+            try:
+                await anyio.to_thread.run_sync(connection.send, message)
+                delivery.sent += 1
+                return
+            except (smtplib.SMTPException, OSError) as error:
+                if isinstance(error, smtplib.SMTPRecipientsRefused) or \
+                        attempt + 1 == settings.newsletter_max_attempts:
+                    # A refused address won't start working on retry
+                    delivery.failed += 1
+                    delivery.record_error(message["To"], error)
+                    return
+                delivery.retries += 1
+                delay = settings.newsletter_retry_base_seconds * 2 ** attempt
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+
+delivery_engine = DeliveryEngine(settings.newsletter_keep_finished,
+                                 settings.newsletter_keep_finished_seconds)
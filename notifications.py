@@ -0,0 +1,119 @@
+# notifications.py
+import asyncio
+import json
+import logging
+import urllib.request
+from email.message import EmailMessage
+from typing import Optional
+import anyio
+from config import settings
+from newsletter import get_mail_backend
+
+logger = logging.getLogger(__name__)
+
+
+def _post_webhook(payload: dict):
+    request = urllib.request.Request(
+        settings.contact_webhook_url, data=json.dumps(payload, default=str).encode(),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        response.read()
+
+
+def _send_email(payload: dict):
+    message = EmailMessage()
+    message["From"] = settings.mail_from
+    message["To"] = settings.contact_notify_email
+    message["Subject"] = f"New contact message: {payload['subject']}"
+    message["Reply-To"] = payload["email"]
+    message.set_content(f"From: {payload['name']} <{payload['email']}>\n\n{payload['message']}\n")
+    connection = get_mail_backend().open()
+    try:
+        connection.send(message)
+    finally:
+        connection.close()
+
+
+def _log(payload: dict):
+    logger.info("Contact message %s from %s", payload.get("id"), payload.get("email"))
+
+
+NOTIFIERS = {"log": _log, "webhook": _post_webhook, "email": _send_email}
+
+
+class NotificationQueue:
+    """Bounded in-process queue drained by one background worker.
+
+    Producers never wait: when the queue is full the notification is dropped and
+    counted, since the message itself is already stored. Blocking sends run in a
+    thread and are retried a few times with backoff.
+    """
+
+    def __init__(self, max_size: int, attempts: int = 3):
+        self.max_size = max_size
+        self.attempts = attempts
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, payload: dict):
+        if self._queue is None:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Notification queue full; dropped notification for %s", payload.get("id"))
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        if self._task is None:
+            return
+        try:
+            # Give queued notifications a moment to go out before shutting down
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = self._queue = None
+
+    async def _run(self):
+        notify = NOTIFIERS[settings.contact_notify]
+        while True:
+            payload = await self._queue.get()
+            try:
+                await self._deliver(notify, payload)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, notify, payload: dict):
+        for attempt in range(self.attempts):
+            try:
+                await anyio.to_thread.run_sync(notify, payload)
+                self.sent += 1
+                return
+            except Exception:
+                if attempt + 1 == self.attempts:
+                    self.failed += 1
+                    logger.exception("Could not deliver notification for %s", payload.get("id"))
+                    return
+                await asyncio.sleep(2 ** attempt)
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize() if self._queue else 0, "sent": self.sent,
+                "failed": self.failed, "dropped": self.dropped}
+
+
+notification_queue = NotificationQueue(settings.notification_queue_size)
@@ -0,0 +1,43 @@
+# pagination.py
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encodes the (created_at, id) keyset of the last row into an opaque token."""
+    raw = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Invalid cursor")
+
+
+def keyset_before(created_column, id_column, created_at: datetime, row_id: int):
+    """Rows past the cursor in newest-first order.
+
+    The outer ``created_at <=`` bound makes this an index range; the bare OR of
+    the two cases is scanned from the top of the index once its values are
+    bound parameters, which gets slower the deeper the page.
+    """
+    return and_(created_column <= created_at,
+                or_(created_column < created_at, id_column < row_id))
+
+
+def keyset_after(created_column, id_column, created_at: datetime, row_id: int):
+    """Rows past the cursor in oldest-first order; see keyset_before."""
+    return and_(created_column >= created_at,
+                or_(created_column > created_at, id_column > row_id))
@@ -0,0 +1,46 @@
+# ratelimit.py
+import threading
+import time
+from typing import Optional
+from fastapi import HTTPException, status
+
+
+class RateLimiter:
+    """Fixed-window counter per key, kept in process memory."""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._windows: dict[str, tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._next_purge = time.monotonic() + window
+
+    def hit(self, key: str) -> Optional[float]:
+        """Counts one attempt; returns seconds until retry if the key is over its limit."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_purge:
+                self._purge(now)
+            started, count = self._windows.get(key, (now, 0))
+            if now - started >= self.window:
+                started, count = now, 0
+            if count >= self.limit:
+                return self.window - (now - started)
+            self._windows[key] = (started, count + 1)
+            return None
+
+    def reset(self, key: str):
+        with self._lock:
+            self._windows.pop(key, None)
+
+    def _purge(self, now: float):
+        self._windows = {key: value for key, value in self._windows.items()
+                         if now - value[0] < self.window}
+        self._next_purge = now + self.window
+
+
+def enforce(limiter: RateLimiter, key: str, detail: str = "Too many requests"):
+    retry_after = limiter.hit(key)
+    if retry_after is not None:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=detail,
+                            headers={"Retry-After": str(max(1, int(retry_after + 0.5)))})
@@ -0,0 +1,255 @@
+# realtime.py
+import asyncio
+import json
+import logging
+from functools import cached_property
+from typing import Any, Optional
+from sqlalchemy import select
+from config import settings
+from database import SessionLocal
+from models import Post
+from serialization import to_json
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "live:post:"
+
+
+class Event:
+    """One message for a post's channel, encoded once however many clients get it."""
+
+    def __init__(self, type: str, data: bytes):
+        self.type = type
+        self.data = data
+
+    @cached_property
+    def sse(self) -> bytes:
+        return b"event: " + self.type.encode() + b"\ndata: " + self.data + b"\n\n"
+
+    @cached_property
+    def text(self) -> str:
+        return '{"type":"%s","data":%s}' % (self.type, self.data.decode())
+
+
+# Sent in place of a backlog the client fell too far behind on: refetch over REST
+RESYNC = Event("resync", b"{}")
+
+
+class Subscription:
+    """A client's view of one post channel, buffered up to ``size`` events."""
+
+    def __init__(self, post_id: int, size: int):
+        self.post_id = post_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.resyncs = 0
+
+    def push(self, event: Optional[Event]) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            # A slow reader never holds up the publisher or grows without bound
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC if event is not None else None)
+            self.resyncs += 1
+            return False
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """The next event; raises TimeoutError when idle, returns None once closed."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+class MemoryBackend:
+    """Delivers within this process only; enough for a single worker."""
+
+    local_only = True
+
+    def __init__(self, deliver):
+        self._deliver = deliver
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, post_id: int, event: Event):
+        self._deliver(post_id, event)
+
+
+class RedisBackend:
+    """Relays events through Redis pub/sub so every worker's subscribers see them."""
+
+    local_only = False
+
+    def __init__(self, deliver, url: str):
+        import redis.asyncio as redis  # optional dependency, only needed when realtime_backend is "redis"
+
+        self._deliver = deliver
+        self._client = redis.Redis.from_url(url)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.psubscribe(CHANNEL_PREFIX + "*")
+            self._task = asyncio.create_task(self._listen(pubsub))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._client.aclose()
+
+    async def publish(self, post_id: int, event: Event):
+        await self._client.publish(f"{CHANNEL_PREFIX}{post_id}", event.text)
+
+    async def _listen(self, pubsub):
+        async with pubsub:
+            async for message in pubsub.listen():
+                try:
+                    post_id = int(message["channel"].decode()[len(CHANNEL_PREFIX):])
+                    payload = json.loads(message["data"])
+                    event = Event(payload["type"], json.dumps(payload["data"]).encode())
+                except (KeyError, ValueError):
+                    logger.warning("Ignoring malformed realtime message %r", message)
+                    continue
+                self._deliver(post_id, event)
+
+
+# ---------------------------
+# Broker
+# ---------------------------
+class Broker:
+    """Per-post pub/sub for comment and like-count events.
+
+    Comment events go out as they happen. Like changes only mark the post dirty;
+    every ``like_interval`` seconds the current counts of all dirty posts are read
+    in one query and published, so a burst of likes costs each client at most one
+    message per interval.
+    """
+
+    def __init__(self, queue_size: int, max_subscribers: int, like_interval: float):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.like_interval = like_interval
+        self._channels: dict[int, set[Subscription]] = {}
+        self._dirty_likes: set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.backend = None
+        self.subscribers = 0
+        self.published = 0
+        self.delivered = 0
+        self.resyncs = 0
+
+    def full(self) -> bool:
+        return self.subscribers >= self.max_subscribers
+
+    def subscribe(self, post_id: int) -> Optional[Subscription]:
+        """A new subscription, or None when the process is at max_subscribers."""
+        if self.full():
+            return None
+        subscription = Subscription(post_id, self.queue_size)
+        self._channels.setdefault(post_id, set()).add(subscription)
+        self.subscribers += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        channel = self._channels.get(subscription.post_id)
+        if channel is None or subscription not in channel:
+            return
+        channel.discard(subscription)
+        if not channel:
+            del self._channels[subscription.post_id]
+        self.subscribers -= 1
+        self.resyncs += subscription.resyncs
+
+    def _deliver(self, post_id: int, event: Event):
+        for subscription in self._channels.get(post_id, ()):
+            subscription.push(event)
+            self.delivered += 1
+
+    async def publish(self, post_id: int, type: str, data: Any, model: Optional[Any] = None):
+        if self.backend is None:
+            return
+        if self.backend.local_only and post_id not in self._channels:
+            return
+        self.published += 1
+        try:
+            await self.backend.publish(post_id, Event(type, to_json(data, model)))
+        except Exception:
+            # Live updates are best effort; the write they describe has already committed
+            logger.exception("Failed to publish %s for post %s", type, post_id)
+
+    def like_changed(self, post_id: int):
+        self._dirty_likes.add(post_id)
+
+    async def start(self):
+        if self.backend is None:
+            if settings.realtime_backend == "redis":
+                self.backend = RedisBackend(self._deliver, settings.realtime_url)
+            else:
+                self.backend = MemoryBackend(self._deliver)
+            await self.backend.start()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Ends every open stream so shutdown doesn't wait on idle clients
+        for channel in self._channels.values():
+            for subscription in channel:
+                subscription.push(None)
+        if self.backend is not None:
+            await self.backend.stop()
+            self.backend = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.like_interval)
+            try:
+                await self.flush_likes()
+            except Exception:
+                logger.exception("Failed to publish like counts")
+
+    async def flush_likes(self):
+        dirty, self._dirty_likes = self._dirty_likes, set()
+        if self.backend is not None and self.backend.local_only:
+            dirty &= self._channels.keys()
+        if not dirty:
+            return
+        async with SessionLocal() as db:
+            rows = (await db.execute(
+                select(Post.id, Post.like_count).where(Post.id.in_(dirty))
+            )).all()
+        for post_id, like_count in rows:
+            await self.publish(post_id, "like_count", {"post_id": post_id, "total_likes": like_count})
+
+    def stats(self) -> dict:
+        return {
+            "backend": settings.realtime_backend,
+            "subscribers": self.subscribers,
+            "channels": len(self._channels),
+            "published": self.published,
+            "delivered": self.delivered,
+            "resyncs": self.resyncs + sum(s.resyncs for c in self._channels.values() for s in c),
+            "pending_like_posts": len(self._dirty_likes),
+        }
+
+
+broker = Broker(settings.realtime_queue_size, settings.realtime_max_subscribers,
+                settings.realtime_like_interval_ms / 1000)
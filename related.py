@@ -0,0 +1,207 @@
+# related.py
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+import anyio
+from sqlalchemy import delete, insert, or_, select
+from cache import response_cache
+from config import settings
+from database import SessionLocal
+from models import Post, RelatedPost
+
+logger = logging.getLogger(__name__)
+
+LOAD_BATCH = 1000
+VECTOR_COLUMNS = ("id", "title", "category", "intro_content", "content1", "quote",
+                  "main_content", "final_content")
+
+
+async def iter_post_text(db):
+    """Walks the text columns of every post by id, one batch at a time."""
+    columns = [getattr(Post, name) for name in VECTOR_COLUMNS]
+    last_id = 0
+    while True:
+        rows = (await db.execute(
+            select(*columns).where(Post.id > last_id).order_by(Post.id).limit(LOAD_BATCH)
+        )).all()
+        if not rows:
+            return
+        for row in rows:
+            yield row
+        last_id = rows[-1].id
+
+
+class RelatedPosts:
+    """Keeps the related_posts table (each post's top-k similar posts) up to date.
+
+    ``rebuild`` (``python related.py``) vectorises every post, computes all pairs
+    in blocks and saves the vectors to ``vectors_path``. Creating or editing a
+    post only re-ranks that post, the posts that list it and the posts it now
+    beats the weakest neighbour of, against the saved vectors; the changed row
+    is written back to the file for the other workers. Until a first rebuild
+    has saved the vectors, edits leave related posts alone: the full load never
+    runs on a request's behalf. Two workers refreshing at the same moment each
+    save their own copy and the later one wins, which at worst leaves one post's
+    vector stale until the next rebuild. NumPy and SciPy are imported only when
+    vectors are first needed.
+    """
+
+    def __init__(self, top_k: int, n_features: int, min_score: float, vectors_path: str):
+        self.top_k = top_k
+        self.n_features = n_features
+        self.min_score = min_score
+        self.vectors_path = vectors_path
+        self.space = None
+        self._loaded_version: Optional[tuple[int, int]] = None
+        self._lock = asyncio.Lock()
+        self.updates = 0
+        self.skipped = 0
+        self.rows_written = 0
+
+    async def _fit(self, db):
+        from similarity import VectorSpace
+
+        posts = [row async for row in iter_post_text(db)]
+        self.space = await anyio.to_thread.run_sync(VectorSpace(self.n_features).fit, posts)
+
+    def _version(self) -> Optional[tuple[int, int]]:
+        # Every save renames a new file into place, so the inode changes even within one mtime tick
+        try:
+            stat = os.stat(self.vectors_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _open(self):
+        """The saved vectors, reread when another process has saved newer ones; None before a rebuild."""
+        from similarity import VectorSpace
+
+        version = self._version()
+        if version is None:
+            return None
+        if self.space is None or version != self._loaded_version:
+            self.space = VectorSpace.load(self.vectors_path, self.n_features)
+            self._loaded_version = version
+        return self.space
+
+    def _save(self):
+        self.space.save(self.vectors_path)
+        self._loaded_version = self._version()
+
+    def reset(self):
+        """Drops the in-memory vectors after bulk changes; the saved ones are reread on next use."""
+        self.space = None
+
+    async def _write(self, db, neighbours: dict[int, list[tuple[int, float]]]):
+        await db.execute(delete(RelatedPost).where(RelatedPost.post_id.in_(list(neighbours))))
+        rows = [{"post_id": post_id, "related_id": related_id, "score": score}
+                for post_id, pairs in neighbours.items() for related_id, score in pairs]
+        if rows:
+            await db.execute(insert(RelatedPost), rows)
+        self.rows_written += len(rows)
+
+    async def refresh(self, post_id: int):
+        """Re-ranks after ``post_id`` was created or edited. Runs as a background task."""
+        try:
+            async with self._lock:
+                async with SessionLocal() as db:
+                    post = (await db.execute(
+                        select(*(getattr(Post, name) for name in VECTOR_COLUMNS))
+                        .where(Post.id == post_id)
+                    )).first()
+                    if post is None:
+                        return
+                    if await anyio.to_thread.run_sync(self._open) is None:
+                        self.skipped += 1
+                        logger.info("No saved related-post vectors yet; run `python related.py` to build them")
+                        return
+                    # Posts that list this one hold a score computed from its old text
+                    listers = list((await db.execute(
+                        select(RelatedPost.post_id).where(RelatedPost.related_id == post_id)
+                    )).scalars())
+                    neighbours = await anyio.to_thread.run_sync(self._rerank, post, listers)
+                    neighbours = await self._drop_deleted(db, neighbours)
+                    await self._write(db, neighbours)
+                    await db.commit()
+                await anyio.to_thread.run_sync(self._save)
+            self.updates += 1
+            response_cache.invalidate("related")
+        except Exception:
+            # Related posts are a nicety; the write that triggered this has already succeeded
+            logger.exception("Failed to refresh related posts for post %s", post_id)
+
+    def _rerank(self, post, listers: list[int]):
+        space = self.space
+        space.upsert(post)
+        affected = {post.id, *(lister for lister in listers if lister in space.row_of)}
+        affected.update(space.candidates(post.id, settings.related_max_updates, self.min_score))
+        return space.top_k(sorted(affected), self.top_k, self.min_score)
+
+    async def _drop_deleted(self, db, neighbours: dict[int, list[tuple[int, float]]]):
+        """Leaves out posts deleted since the vectors were saved; other workers' copies still hold them."""
+        mentioned = set(neighbours) | {related_id for pairs in neighbours.values() for related_id, _ in pairs}
+        live = set((await db.execute(select(Post.id).where(Post.id.in_(mentioned)))).scalars())
+        for post_id in mentioned - live:
+            self.space.remove(post_id)
+        return {post_id: [(related_id, score) for related_id, score in pairs if related_id in live]
+                for post_id, pairs in neighbours.items() if post_id in live}
+
+    async def forget(self, db, post_id: int):
+        """Drops a deleted post from the vectors and from other posts' lists."""
+        # A refresh or rebuild may be mid-way through the same matrix on a worker thread
+        async with self._lock:
+            if self.space is not None:
+                self.space.remove(post_id)
+        await db.execute(delete(RelatedPost).where(or_(RelatedPost.post_id == post_id,
+                                                       RelatedPost.related_id == post_id)))
+
+    async def rebuild(self) -> dict:
+        """Recomputes every post's neighbours from scratch and rewrites the table."""
+        async with self._lock:
+            started = time.perf_counter()
+            async with SessionLocal() as db:
+                await self._fit(db)
+                vectorised = time.perf_counter()
+                results = await anyio.to_thread.run_sync(
+                    lambda: list(self.space.build_all(self.top_k, self.min_score,
+                                                      settings.related_block_size)))
+                ranked = time.perf_counter()
+                await db.execute(delete(RelatedPost))
+                for start in range(0, len(results), LOAD_BATCH):
+                    await self._write(db, dict(results[start:start + LOAD_BATCH]))
+                await db.commit()
+            await anyio.to_thread.run_sync(self._save)
+        response_cache.invalidate("related")
+        return {
+            "posts": len(results),
+            "pairs": sum(len(pairs) for _, pairs in results),
+            "vectorise_seconds": round(vectorised - started, 2),
+            "rank_seconds": round(ranked - vectorised, 2),
+            "total_seconds": round(time.perf_counter() - started, 2),
+            "vector_bytes": self.space.memory_bytes(),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.space is not None,
+            "posts": len(self.space.row_of) if self.space is not None else 0,
+            "vector_bytes": self.space.memory_bytes() if self.space is not None else 0,
+            "updates": self.updates,
+            "skipped": self.skipped,
+            "rows_written": self.rows_written,
+        }
+
+
+related_posts = RelatedPosts(settings.related_top_k, settings.related_features,
+                             settings.related_min_score, settings.related_vectors_path)
+
+
+async def main():
+    stats = await related_posts.rebuild()
+    print("Related posts rebuilt:", ", ".join(f"{key}={value}" for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
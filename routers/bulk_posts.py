@@ -0,0 +1,48 @@
+# routers/bulk_posts.py
+import io
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, File, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from schemas import BatchResult, PostCategoryChange, PostImportResult, PostSelection
+from auth import get_admin_user
+from bulk_posts import change_category, delete_posts, export_posts, import_posts
+
+# Included ahead of the main router, so /posts/export isn't read as /posts/{post_id}
+router = APIRouter(prefix="/posts", tags=["Bulk posts"], dependencies=[Depends(get_admin_user)])
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+@router.post("/import", response_model=PostImportResult)
+async def import_post_file(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Defaults from the file name"),
+):
+    """Creates a post per CSV row (with a header) or NDJSON line; invalid records are skipped."""
+    fmt = format or ("csv" if (file.filename or "").endswith(".csv") else "ndjson")
+    # The upload is already spooled to a temporary file; read it as text without copying
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        return await import_posts(text, fmt)
+    finally:
+        text.detach()
+
+
+@router.get("/export")
+async def export_post_table(format: Literal["csv", "ndjson"] = Query("ndjson")):
+    return StreamingResponse(
+        export_posts(format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="posts.{format}"'},
+    )
+
+
+@router.post("/batch/delete", response_model=BatchResult)
+async def delete_post_batch(selection: PostSelection):
+    """Deletes the selected posts, with their comments, likes and traffic, in one transaction."""
+    return {"matched": await delete_posts(selection.ids, selection.category)}
+
+
+@router.post("/batch/category", response_model=BatchResult)
+async def change_post_batch_category(change: PostCategoryChange):
+    return {"matched": await change_category(change.new_category, change.ids, change.category)}
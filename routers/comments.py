@@ -1,52 +1,67 @@
 # routers/comments.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import Comment
-from schemas import CommentCreate, CommentResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_read_db
+from models import Comment, Post
+from schemas import CommentCreate, CommentResponse, MessageResponse
 from auth import get_current_user
+from counters import bump_counter
+from cache import response_cache
+from realtime import broker
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
-def create_comment(
+async def create_comment(
     comment: CommentCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     user_id = current_user["id"]
 
+    if not await bump_counter(db, comment.post_id, Post.comment_count, 1):
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Post not found")
     new_comment = Comment(
         content=comment.content,
         post_id=comment.post_id,
         user_id=user_id
     )
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
-    return new_comment
+    await db.commit()
+    await db.refresh(new_comment)
+    response_cache.invalidate(f"comments:{comment.post_id}", f"post:{comment.post_id}")
+    response = CommentResponse.model_validate(new_comment)
+    response.username = current_user["username"]
+    await broker.publish(comment.post_id, "comment_created", response, CommentResponse)
+    return response
 
 
 @router.get("/post/{post_id}", response_model=list[CommentResponse])
-def get_post_comments(post_id: int, db: Session = Depends(get_db)):
-    comments = db.query(Comment).filter(Comment.post_id == post_id).all()
-    return comments
+async def get_post_comments(post_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    cache_key = response_cache.key(f"comments:{post_id}")
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached.to_response(request)
+    result = await db.execute(
+        select(Comment)
+        .options(joinedload(Comment.user))
+        .where(Comment.post_id == post_id)
+        .order_by(Comment.created_at, Comment.id)
+    )
+    payload = [CommentResponse.model_validate(comment) for comment in result.scalars()]
+    return response_cache.store(cache_key, payload, list[CommentResponse]).to_response(request)
 
 
-@router.delete("/{comment_id}")
-def delete_comment(
+@router.delete("/{comment_id}", response_model=MessageResponse)
+async def delete_comment(
     comment_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    comment = await db.get(Comment, comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
 
@@ -54,6 +69,10 @@ def delete_comment(
     if comment.user_id != current_user["id"] and current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
 
-    db.delete(comment)
-    db.commit()
+    await db.delete(comment)
+    await bump_counter(db, comment.post_id, Post.comment_count, -1)
+    await db.commit()
+    response_cache.invalidate(f"comments:{comment.post_id}", f"post:{comment.post_id}")
+    await broker.publish(comment.post_id, "comment_deleted",
+                         {"id": comment_id, "post_id": comment.post_id})
     return {"message": "Comment deleted successfully"}
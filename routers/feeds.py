@@ -0,0 +1,37 @@
+# routers/feeds.py
+from fastapi import APIRouter, HTTPException, Request
+from feeds import cached_document, site_base
+
+router = APIRouter(tags=["Feeds"])
+
+
+async def serve(request: Request, name: str, shard=None):
+    document = await cached_document(name, site_base(request), shard)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    return document.to_response(request)
+
+
+@router.get("/feed.xml")
+async def rss_feed(request: Request):
+    """RSS 2.0 feed of the newest posts."""
+    return await serve(request, "rss")
+
+
+@router.get("/atom.xml")
+async def atom_feed(request: Request):
+    """Atom feed of the newest posts."""
+    return await serve(request, "atom")
+
+
+@router.get("/sitemap.xml")
+async def sitemap(request: Request):
+    """Every post URL, or a sitemap index once there are more than sitemap_max_urls."""
+    return await serve(request, "sitemap")
+
+
+@router.get("/sitemaps/posts-{shard}.xml")
+async def sitemap_shard(shard: int, request: Request):
+    if shard < 0:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    return await serve(request, "sitemap", shard)
@@ -0,0 +1,23 @@
+# routers/images.py
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from fastapi.responses import FileResponse
+from images import VARIANT_FORMATS, VARIANT_WIDTHS, variant_path
+
+router = APIRouter(prefix="/images", tags=["Images"])
+
+
+@router.get("/{content_hash}")
+async def get_image_variant(
+    request: Request,
+    content_hash: str = Path(..., pattern="^[0-9a-f]{64}$"),
+    w: int = Query(VARIANT_WIDTHS["medium"], ge=1, le=4096),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$"),
+):
+    """Serves a resized copy of an upload, rendering and caching it on first request."""
+    if format is None:
+        # Negotiate: WebP for clients that advertise it, JPEG for everyone else
+        format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    path = await variant_path(content_hash, w, format)
+    headers = {"Cache-Control": "public, max-age=31536000, immutable", "Vary": "Accept"}
+    return FileResponse(path, media_type=VARIANT_FORMATS[format][1], headers=headers)
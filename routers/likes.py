@@ -1,74 +1,157 @@
 # routers/likes.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from models import Like
-from schemas import LikeBase, LikeResponse
-from auth import get_current_user, get_db
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+from models import Like, Post
+from schemas import LikeBase, LikeCount, LikeResponse, LikeStatus, MessageResponse, PostCounts
+from auth import get_current_user, get_optional_user
+from counters import bump_counter
+from cache import response_cache
+from config import settings
+from like_buffer import like_buffer
+from realtime import broker
 
 router = APIRouter(prefix="/likes", tags=["Likes"])
 
+MAX_BATCH_POSTS = 100
+# With like_ingestion = "batched" the click is only queued, so there is no row to return yet
+BUFFERED_RESPONSE = {status.HTTP_202_ACCEPTED: {
+    "model": LikeStatus,
+    "description": "Queued for the next batched write (like_ingestion = \"batched\"); the caller's new state",
+}}
 
-@router.post("/", response_model=LikeResponse)
-def like_post(
+
+def buffered_like(user_id: int, post_id: int, liked: bool) -> JSONResponse:
+    """Queues the click for the next batched write; the answer is the caller's new state."""
+    like_buffer.submit(user_id, post_id, liked)
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED,
+                        content=LikeStatus(post_id=post_id, is_liked=liked).model_dump())
+
+
+@router.post("/", response_model=LikeResponse, responses=BUFFERED_RESPONSE)
+async def like_post(
     like: LikeBase,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     user_id = current_user["id"]
+    if settings.like_ingestion == "batched":
+        return buffered_like(user_id, like.post_id, True)
 
-    existing_like = db.query(Like).filter(
+    existing_like = await db.scalar(select(Like).where(
         Like.user_id == user_id, Like.post_id == like.post_id
-    ).first()
+    ))
 
     if existing_like:
         raise HTTPException(status_code=400, detail="You already liked this post")
 
+    if not await bump_counter(db, like.post_id, Post.like_count, 1):
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Post not found")
     new_like = Like(user_id=user_id, post_id=like.post_id)
     db.add(new_like)
-    db.commit()
-    db.refresh(new_like)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent like won the unique constraint; the counter bump rolls back with it
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="You already liked this post")
+    await db.refresh(new_like)
+    # Listings also carry like_count but are left to expire via TTL; likes are too hot to flush them
+    response_cache.invalidate(f"post:{like.post_id}")
+    broker.like_changed(like.post_id)
     return new_like
 
 
-@router.delete("/{post_id}")
-def unlike_post(
+@router.delete("/{post_id}", response_model=MessageResponse, responses=BUFFERED_RESPONSE)
+async def unlike_post(
     post_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     user_id = current_user["id"]
+    if settings.like_ingestion == "batched":
+        return buffered_like(user_id, post_id, False)
 
-    like = db.query(Like).filter(
+    like = await db.scalar(select(Like).where(
         Like.user_id == user_id, Like.post_id == post_id
-    ).first()
+    ))
 
     if not like:
         raise HTTPException(status_code=404, detail="Like not found")
 
-    db.delete(like)
-    db.commit()
+    await db.delete(like)
+    await bump_counter(db, post_id, Post.like_count, -1)
+    await db.commit()
+    response_cache.invalidate(f"post:{post_id}")
+    broker.like_changed(post_id)
     return {"message": "Unliked successfully"}
 
 
-@router.get("/count/{post_id}")
-def get_like_count(post_id: int, db: Session = Depends(get_db)):
-    count = db.query(Like).filter(Like.post_id == post_id).count()
-    return {"post_id": post_id, "total_likes": count}
+@router.get("/count/{post_id}", response_model=LikeCount)
+async def get_like_count(post_id: int, db: AsyncSession = Depends(get_db)):
+    count = await db.scalar(select(Post.like_count).where(Post.id == post_id))
+    return {"post_id": post_id, "total_likes": count or 0}
+
+
+@router.get("/counts", response_model=list[PostCounts])
+async def get_like_counts(
+    post_ids: str = Query(..., description="Comma-separated post ids, e.g. 1,2,3"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[dict] = Depends(get_optional_user)
+):
+    """Returns counters and the caller's like status for many posts in one query."""
+    try:
+        ids = list(dict.fromkeys(int(i) for i in post_ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="post_ids must be comma-separated integers")
+    if not ids:
+        return []
+    if len(ids) > MAX_BATCH_POSTS:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {MAX_BATCH_POSTS} post_ids per request")
+
+    # Anonymous callers join against no user (id -1) so is_liked is always false
+    user_id = current_user["id"] if current_user else -1
+    result = await db.execute(
+        select(Post.id, Post.like_count, Post.comment_count, Like.id)
+        .outerjoin(Like, and_(Like.post_id == Post.id, Like.user_id == user_id))
+        .where(Post.id.in_(ids))
+    )
+    rows = result.all()
+    by_id = {}
+    for post_id, likes_total, comments_total, like_id in rows:
+        is_liked = like_id is not None
+        # Read-your-writes: overlay the caller's own clicks that haven't been flushed yet
+        pending = like_buffer.pending_state(user_id, post_id)
+        if pending is not None and pending != is_liked:
+            likes_total += 1 if pending else -1
+            is_liked = pending
+        by_id[post_id] = {"post_id": post_id, "total_likes": likes_total,
+                          "total_comments": comments_total, "is_liked": is_liked}
+    return [by_id[i] for i in ids if i in by_id]
 
 # Add to routers/likes.py
 
-@router.get("/status/{post_id}")
-def get_like_status(
+@router.get("/status/{post_id}", response_model=LikeStatus)
+async def get_like_status(
     post_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Checks if the current authenticated user has liked the given post."""
     user_id = current_user["id"]
+    pending = like_buffer.pending_state(user_id, post_id)
+    if pending is not None:
+        return {"post_id": post_id, "is_liked": pending}
     
-    existing_like = db.query(Like).filter(
+    existing_like = await db.scalar(select(Like).where(
         Like.user_id == user_id, Like.post_id == post_id
-    ).first()
+    ))
 
     # If a like exists, return true, otherwise false
-    return {"post_id": post_id, "is_liked": bool(existing_like)}
\ No newline at end of file
+    return {"post_id": post_id, "is_liked": bool(existing_like)}
@@ -0,0 +1,98 @@
+# routers/live.py
+import asyncio
+from fastapi import APIRouter, HTTPException, WebSocket, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from starlette.websockets import WebSocketDisconnect
+from config import settings
+from database import ReadSessionLocal
+from models import Post
+from realtime import broker
+
+router = APIRouter(prefix="/live", tags=["Live"])
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+async def post_exists(post_id: int) -> bool:
+    # Its own short session: a request-scoped one would hold a connection for the whole stream
+    async with ReadSessionLocal() as db:
+        return await db.scalar(select(Post.id).where(Post.id == post_id)) is not None
+
+
+@router.get("/posts/{post_id}")
+async def stream_post_events(post_id: int):
+    """Server-Sent Events for one post: comment_created, comment_deleted, like_count and resync."""
+    if not await post_exists(post_id):
+        raise HTTPException(status_code=404, detail="Post not found")
+    if broker.full():
+        raise HTTPException(status_code=503, detail="Too many live connections, try again later")
+
+    async def events():
+        # Subscribed only once the stream runs: a client gone before then never holds a slot
+        subscription = broker.subscribe(post_id)
+        if subscription is None:
+            return
+        try:
+            # Tells EventSource how long to wait before reconnecting
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    event = await subscription.get(settings.realtime_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle stream
+                    yield KEEPALIVE
+                    continue
+                if event is None:
+                    return
+                yield event.sse
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/posts/{post_id}/ws")
+async def post_events_socket(websocket: WebSocket, post_id: int):
+    """The same events as the SSE stream, sent as {"type": ..., "data": ...} text frames."""
+    if not await post_exists(post_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    subscription = broker.subscribe(post_id)
+    if subscription is None:
+        await websocket.close(code=1013)  # try again later
+        return
+
+    async def forward():
+        while True:
+            try:
+                event = await subscription.get(settings.realtime_keepalive_seconds)
+            except asyncio.TimeoutError:
+                continue
+            if event is None:
+                return
+            await websocket.send_text(event.text)
+
+    async def wait_for_close():
+        # Clients don't send anything; reading only notices the disconnect
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    tasks = []
+    try:
+        await websocket.accept()
+        tasks = [asyncio.create_task(forward()), asyncio.create_task(wait_for_close())]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if tasks[0] in done and not tasks[0].exception():
+            await websocket.close()
+    finally:
+        for task in tasks:
+            task.cancel()
+        broker.unsubscribe(subscription)
@@ -0,0 +1,69 @@
+# routers/metrics.py
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from cache import response_cache
+from database import pool_stats
+from hashing import password_hasher
+from like_buffer import like_buffer
+from analytics import traffic
+from notifications import notification_queue
+from realtime import broker
+from related import related_posts
+from serialization import OrjsonResponse
+
+# Free-form stats dicts have no response model, so render them with orjson
+router = APIRouter(prefix="/metrics", tags=["Metrics"], default_response_class=OrjsonResponse)
+
+
+@router.get("")
+def get_prometheus_metrics():
+    """Prometheus exposition: request latency, SQL per request and pool occupancy."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@router.get("/cache")
+def get_cache_stats():
+    """Hit/miss/eviction counters for sizing the response cache."""
+    return response_cache.stats()
+
+
+@router.get("/pool")
+def get_pool_stats():
+    """Connection pool occupancy and checkout wait times."""
+    return pool_stats()
+
+
+@router.get("/hashing")
+def get_hashing_stats():
+    """Password hashing pool occupancy and rejected (429) attempts."""
+    return password_hasher.stats()
+
+
+@router.get("/likes")
+def get_like_buffer_stats():
+    """Write-behind like queue depth and flush counters."""
+    return like_buffer.stats()
+
+
+@router.get("/traffic")
+def get_traffic_stats():
+    """Page views waiting in memory and rollup flush counters."""
+    return traffic.stats()
+
+
+@router.get("/notifications")
+def get_notification_stats():
+    """Contact notification queue depth and delivery outcomes."""
+    return notification_queue.stats()
+
+
+@router.get("/live")
+def get_live_stats():
+    """Open SSE/WebSocket subscribers, fan-out counters and slow-client resyncs."""
+    return broker.stats()
+
+
+@router.get("/related")
+def get_related_stats():
+    """Whether related-post vectors are loaded, their size and incremental update counts."""
+    return related_posts.stats()
@@ -0,0 +1,56 @@
+# routers/newsletter.py
+from typing import Literal
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_read_db
+from models import Post
+from schemas import DeliveryCreate, DeliveryStatus, SubscriberImportResult
+from auth import get_admin_user
+from newsletter import delivery_engine, export_subscribers, import_subscribers
+from uploads import public_base
+
+router = APIRouter(prefix="/newsletter", tags=["Newsletter"],
+                   dependencies=[Depends(get_admin_user)])
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+@router.post("/import", response_model=SubscriberImportResult)
+async def import_subscriber_csv(file: UploadFile = File(...)):
+    """Adds every valid email in a CSV upload; addresses already subscribed are skipped."""
+    return await import_subscribers(file)
+
+
+@router.get("/export")
+async def export_subscriber_list(format: Literal["csv", "ndjson"] = Query("csv")):
+    return StreamingResponse(
+        export_subscribers(format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="subscribers.{format}"'},
+    )
+
+
+@router.post("/deliveries", response_model=DeliveryStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_delivery(body: DeliveryCreate, request: Request,
+                         db: AsyncSession = Depends(get_read_db)):
+    """Starts sending a post to every subscriber; poll the returned delivery for progress."""
+    if await db.scalar(select(Post.id).where(Post.id == body.post_id)) is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return delivery_engine.start(body.post_id, public_base(request))
+
+
+@router.get("/deliveries", response_model=list[DeliveryStatus])
+async def list_deliveries():
+    return delivery_engine.list()
+
+
+@router.get("/deliveries/{delivery_id}", response_model=DeliveryStatus)
+async def get_delivery(delivery_id: str):
+    return delivery_engine.get(delivery_id)
+
+
+@router.delete("/deliveries/{delivery_id}", response_model=DeliveryStatus)
+async def cancel_delivery(delivery_id: str):
+    return delivery_engine.cancel(delivery_id)
@@ -0,0 +1,36 @@
+# routers/related.py
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_read_db
+from models import Post, RelatedPost
+from schemas import RelatedPostResponse
+from cache import response_cache
+from config import settings
+
+router = APIRouter(prefix="/posts", tags=["Related posts"])
+
+
+@router.get("/{post_id}/related", response_model=list[RelatedPostResponse])
+async def get_related_posts(
+    post_id: int,
+    request: Request,
+    limit: int = Query(settings.related_top_k, ge=1, le=settings.related_top_k),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Most similar posts, read from the precomputed related_posts table."""
+    cache_key = response_cache.key("related", post_id=post_id, limit=limit)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached.to_response(request)
+    # One range scan of ix_related_posts_post_id_score, joined to posts by primary key
+    result = await db.execute(
+        select(Post.id, Post.title, Post.category, Post.image1, Post.image1_variants,
+               Post.created_at, Post.excerpt, RelatedPost.score)
+        .join(RelatedPost, RelatedPost.related_id == Post.id)
+        .where(RelatedPost.post_id == post_id)
+        .order_by(desc(RelatedPost.score))
+        .limit(limit)
+    )
+    payload = [row._asdict() for row in result]
+    return response_cache.store(cache_key, payload, list[RelatedPostResponse]).to_response(request)
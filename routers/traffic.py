@@ -0,0 +1,80 @@
+# routers/traffic.py
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_read_db
+from models import Post, Traffic
+from schemas import TopPostTraffic, TrafficResponse
+from auth import client_ip, get_admin_user
+from analytics import traffic
+
+router = APIRouter(prefix="/traffic", tags=["Traffic"])
+
+BOT_MARKERS = ("bot", "crawler", "spider", "preview")
+
+
+def since(days: int):
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+@router.post("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def record_view(post_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    """Page-view beacon: counted in memory only, flushed to the traffic table later."""
+    user_agent = request.headers.get("user-agent", "")
+    if any(marker in user_agent.lower() for marker in BOT_MARKERS):
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    # Only a post's first view per flush is looked up, so ids that aren't posts never get a sketch
+    if not traffic.is_pending(post_id) and await db.scalar(select(Post.id).where(Post.id == post_id)) is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    traffic.record(post_id, f"{client_ip(request)}|{user_agent}")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/daily", response_model=list[TrafficResponse])
+async def get_daily_traffic(
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_read_db),
+    admin: dict = Depends(get_admin_user)
+):
+    """Site-wide views and unique visitors per day, oldest first."""
+    result = await db.execute(
+        select(Traffic).where(Traffic.post_id.is_(None), Traffic.visit_date >= since(days))
+        .order_by(Traffic.visit_date)
+    )
+    return result.scalars().all()
+
+
+@router.get("/top", response_model=list[TopPostTraffic])
+async def get_top_posts(
+    days: int = Query(7, ge=1, le=366),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    admin: dict = Depends(get_admin_user)
+):
+    """Most viewed posts over the last `days` days."""
+    views = func.sum(Traffic.visit_count).label("visit_count")
+    result = await db.execute(
+        select(Traffic.post_id, Post.title, views,
+               func.sum(Traffic.unique_visitors).label("visitor_days"))
+        .join(Post, Post.id == Traffic.post_id)
+        .where(Traffic.visit_date >= since(days))
+        .group_by(Traffic.post_id, Post.title)
+        .order_by(desc(views), Traffic.post_id)
+        .limit(limit)
+    )
+    return result.mappings().all()
+
+
+@router.get("/posts/{post_id}", response_model=list[TrafficResponse])
+async def get_post_traffic(
+    post_id: int,
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_read_db),
+    admin: dict = Depends(get_admin_user)
+):
+    result = await db.execute(
+        select(Traffic).where(Traffic.post_id == post_id, Traffic.visit_date >= since(days))
+        .order_by(Traffic.visit_date)
+    )
+    return result.scalars().all()
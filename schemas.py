@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field, model_validator
+from datetime import date, datetime
+from typing import Optional
 
 # ---------------------- COMMENTS ----------------------
 class CommentBase(BaseModel):
@@ -15,11 +16,16 @@ class CommentResponse(CommentBase):
     user_id: int
     post_id: int
     created_at: datetime
+    username: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class MessageResponse(BaseModel):
+    message: str
+
+
 # ---------------------- LIKES ----------------------
 class LikeBase(BaseModel):
     post_id: int
@@ -31,4 +37,131 @@ class LikeResponse(LikeBase):
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class LikeCount(BaseModel):
+    post_id: int
+    total_likes: int
+
+
+class LikeStatus(BaseModel):
+    post_id: int
+    is_liked: bool
+
+
+class PostCounts(BaseModel):
+    post_id: int
+    total_likes: int
+    total_comments: int
+    is_liked: bool
+
+
+# ---------------------- TRAFFIC ----------------------
+class TrafficBase(BaseModel):
+    visit_date: date
+    visit_count: int = 1
+
+
+class TrafficCreate(TrafficBase):
+    pass
+
+
+class TrafficResponse(TrafficBase):
+    id: int
+    post_id: Optional[int] = None
+    unique_visitors: int = 0
+
+    class Config:
+        from_attributes = True
+
+
+class TopPostTraffic(BaseModel):
+    post_id: int
+    title: str
+    visit_count: int
+    # Sum of each day's unique visitors; someone returning on two days counts twice
+    visitor_days: int
+
+
+# ---------------------- POSTS ----------------------
+class PostBase(BaseModel):
+    category: str
+    title: str
+    image1: Optional[str] = None
+    intro_content: Optional[str] = None
+    content1: Optional[str] = None
+    quote: Optional[str] = None
+    quote_author: Optional[str] = None
+    main_content: Optional[str] = None
+    image2: Optional[str] = None
+    final_content: Optional[str] = None
+
+
+class PostImportRow(PostBase):
+    # Kept when migrating content in; new rows default to today like create_post
+    created_at: Optional[datetime] = None
+
+
+class RelatedPostResponse(BaseModel):
+    id: int
+    title: str
+    category: str
+    image1: Optional[str] = None
+    image1_variants: Optional[dict] = None
+    created_at: Optional[datetime] = None
+    excerpt: Optional[str] = None
+    score: float
+
+
+class PostImportResult(BaseModel):
+    inserted: int
+    invalid: int
+    errors: list[str]
+
+
+class PostSelection(BaseModel):
+    """Either explicit ids or every post in a category."""
+    ids: Optional[list[int]] = Field(None, max_length=10000)
+    category: Optional[str] = None
+
+    @model_validator(mode="after")
+    def one_selector(self):
+        if (self.ids is None) == (self.category is None):
+            raise ValueError("Give exactly one of ids or category")
+        return self
+
+
+class PostCategoryChange(PostSelection):
+    new_category: str = Field(..., min_length=1, max_length=100)
+
+
+class BatchResult(BaseModel):
+    matched: int
+
+
+# ---------------------- NEWSLETTER ----------------------
+class SubscriberImportResult(BaseModel):
+    inserted: int
+    duplicates: int
+    invalid: int
+
+
+class DeliveryCreate(BaseModel):
+    post_id: int
+
+
+class DeliveryStatus(BaseModel):
+    id: str
+    post_id: int
+    status: str
+    total: int
+    sent: int
+    failed: int
+    retries: int
+    last_id: int
+    errors: list[str]
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
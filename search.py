@@ -0,0 +1,173 @@
+# search.py
+import asyncio
+import html
+import os
+import re
+import sqlite3
+import threading
+from typing import Iterable, Optional
+import anyio
+from sqlalchemy import select
+from config import settings
+from database import SessionLocal
+from models import Post
+
+INDEXED_FIELDS = ("title", "category", "intro_content", "main_content", "final_content")
+# bm25 column weights, in INDEXED_FIELDS order: title hits matter most
+FIELD_WEIGHTS = (10.0, 5.0, 2.0, 1.0, 1.0)
+SNIPPET_TOKENS = 16
+REBUILD_BATCH = 1000
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+# Private-use characters FTS5 puts around each hit; the snippet is escaped before they become <mark>s
+MARK_OPEN, MARK_CLOSE = "\ue000", "\ue001"
+MARKERS = re.compile(f"[{MARK_OPEN}{MARK_CLOSE}]")
+
+
+def to_match_query(text: str) -> Optional[str]:
+    """Turns free text into an FTS5 query: every word must match, the last as a prefix."""
+    words = TOKEN.findall(text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def highlight(snippet: str) -> str:
+    """The snippet as safe HTML: post text escaped, matches wrapped in <mark>."""
+    return (html.escape(snippet, quote=False)
+            .replace(MARK_OPEN, "<mark>").replace(MARK_CLOSE, "</mark>"))
+
+
+class SearchIndex:
+    """Inverted index over posts in a local SQLite FTS5 database.
+
+    Rows are keyed by post id (the FTS rowid) and carry the few display columns a
+    result card needs, so a search never touches the main database.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+                + ", ".join(INDEXED_FIELDS)
+                + ", image1 UNINDEXED, created_at UNINDEXED, tokenize='porter unicode61')"
+            )
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def _row(post) -> tuple:
+        created_at = post.created_at.isoformat() if post.created_at else None
+        return (post.id, *(MARKERS.sub("", getattr(post, field) or "") for field in INDEXED_FIELDS),
+                post.image1, created_at)
+
+    def upsert_many(self, posts: Iterable) -> None:
+        rows = [self._row(post) for post in posts]
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany("DELETE FROM posts_fts WHERE rowid = ?",
+                                       [(row[0],) for row in rows])
+                connection.executemany(
+                    "INSERT INTO posts_fts (rowid, " + ", ".join(INDEXED_FIELDS)
+                    + ", image1, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def delete(self, post_id: int) -> None:
+        self.delete_many([post_id])
+
+    def delete_many(self, post_ids: Iterable[int]) -> None:
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany("DELETE FROM posts_fts WHERE rowid = ?",
+                                       [(post_id,) for post_id in post_ids])
+
+    def set_category(self, post_ids: Iterable[int], category: str) -> None:
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany("UPDATE posts_fts SET category = ? WHERE rowid = ?",
+                                       [(category, post_id) for post_id in post_ids])
+
+    def clear(self) -> None:
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM posts_fts")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT count(*) FROM posts_fts").fetchone()[0]
+
+    def search(self, text: str, limit: int, offset: int = 0) -> list[dict]:
+        match = to_match_query(text)
+        if match is None:
+            return []
+        weights = ", ".join(str(weight) for weight in FIELD_WEIGHTS)
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT rowid, title, category, image1, created_at, bm25(posts_fts, {weights}) AS rank, "
+                f"snippet(posts_fts, -1, '{MARK_OPEN}', '{MARK_CLOSE}', '…', {SNIPPET_TOKENS}) "
+                "FROM posts_fts WHERE posts_fts MATCH ? ORDER BY rank LIMIT ? OFFSET ?",
+                (match, limit, offset),
+            ).fetchall()
+        # bm25() is lower-is-better; flip the sign so clients see higher-is-better scores
+        return [
+            {"id": row[0], "title": row[1], "category": row[2], "image1": row[3],
+             "created_at": row[4], "score": -row[5], "snippet": highlight(row[6])}
+            for row in rows
+        ]
+
+
+search_index = SearchIndex(settings.search_index_path)
+
+
+async def index_post(post) -> None:
+    await anyio.to_thread.run_sync(search_index.upsert_many, [post])
+
+
+async def unindex_post(post_id: int) -> None:
+    await anyio.to_thread.run_sync(search_index.delete, post_id)
+
+
+async def rebuild_index(db) -> int:
+    """Re-indexes every post, walking the table by id in batches."""
+    await anyio.to_thread.run_sync(search_index.clear)
+    return await index_posts_after(db, 0)
+
+
+async def index_posts_after(db, last_id: int) -> int:
+    """Indexes every post with an id above ``last_id``, e.g. the rows of a bulk import."""
+    total = 0
+    while True:
+        result = await db.execute(
+            select(Post).where(Post.id > last_id).order_by(Post.id).limit(REBUILD_BATCH)
+        )
+        posts = result.scalars().all()
+        if not posts:
+            return total
+        await anyio.to_thread.run_sync(search_index.upsert_many, posts)
+        total += len(posts)
+        last_id = posts[-1].id
+        db.expunge_all()
+
+
+async def main():
+    async with SessionLocal() as db:
+        total = await rebuild_index(db)
+    print("Indexed", total, "posts into", os.path.abspath(search_index.path))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
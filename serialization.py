@@ -0,0 +1,169 @@
+# serialization.py
+import zlib
+from functools import lru_cache
+from typing import Any, Optional
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from starlette.datastructures import Headers, MutableHeaders
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Already-compressed formats gain nothing from another pass
+INCOMPRESSIBLE_TYPES = ("image/", "video/", "audio/", "font/woff2", "application/zip",
+                        "application/gzip", "text/event-stream")
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON rendered by orjson, for routes that return plain dicts or lists.
+
+    Routes with a response_model don't need it: FastAPI already serializes those
+    straight to bytes with the model's compiled serializer, and setting a
+    response class on them would turn that fast path off.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=None)
+def type_adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def to_json(data: Any, model: Optional[Any] = None) -> bytes:
+    """Serializes through the model's compiled serializer when one is given."""
+    if model is not None:
+        adapter = type_adapter(model)
+        return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    return orjson.dumps(jsonable_encoder(data), option=orjson.OPT_NON_STR_KEYS)
+
+
+# ---------------------------
+# Compression
+# ---------------------------
+def negotiate_encoding(accept_encoding: str, available=None) -> Optional[str]:
+    """Picks the first of ``available`` (br then gzip by default) the client accepts, honouring q=0."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    if available is None:
+        available = ("br", "gzip") if brotli is not None else ("gzip",)
+    for encoding in available:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.brotli_quality)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data) if self._brotli else self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self._brotli else self._zlib.flush()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    compressor = _Compressor(encoding)
+    return compressor.compress(body) + compressor.finish()
+
+
+def add_vary(headers: MutableHeaders):
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    """br/gzip by Accept-Encoding for bodies of at least ``minimum_size`` bytes.
+
+    Whole bodies are compressed in one go; streamed bodies are compressed chunk
+    by chunk. Responses that already carry a Content-Encoding (precompressed
+    cache entries, .br/.gz upload sidecars) or hold compressed media pass through.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                if compressor is None and not passthrough:
+                    # Not a body we can compress (e.g. a zero-copy http.response.pathsend):
+                    # the held-back start still has to go out first
+                    passthrough = True
+                    await send(start_message)
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "")
+                if ("content-encoding" in headers or content_type.startswith(INCOMPRESSIBLE_TYPES)
+                        or (not more_body and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                add_vary(headers)
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # Same entity, different bytes: a strong validator no longer holds
+                    headers["ETag"] = f"W/{etag}"
+                start_message["headers"] = headers.raw
+                if more_body:
+                    del headers["content-length"]
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
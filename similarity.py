@@ -0,0 +1,268 @@
+# similarity.py
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Iterable
+import numpy as np
+from scipy import sparse
+
+TOKEN = re.compile(r"[^\W\d_]{2,}", re.UNICODE)
+# Title and category words say more about what a post is about than body text
+FIELD_WEIGHTS = {"title": 3.0, "category": 2.0, "intro_content": 1.0, "content1": 1.0,
+                 "quote": 1.0, "main_content": 1.0, "final_content": 1.0}
+STOP_WORDS = frozenset("""
+a about after all also an and any are as at be been but by can could did do does for from
+had has have he her his how if in into is it its just more most my no not of on one or our
+out she so some than that the their them then there these they this to up was we were what
+when which who will with would you your
+""".split())
+
+
+def hashed_terms(post, n_features: int) -> Counter:
+    """Weighted term counts keyed by hashed feature index, so no vocabulary has to be kept."""
+    counts: Counter = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        text = getattr(post, field)
+        if not text:
+            continue
+        # Count words first so each distinct word is hashed once per field
+        for token, n in Counter(TOKEN.findall(text.lower())).items():
+            if token not in STOP_WORDS:
+                counts[zlib.crc32(token.encode()) % n_features] += weight * n
+    return counts
+
+
+class VectorSpace:
+    """L2-normalised TF-IDF rows for every post, in a CSR matrix plus a small append buffer.
+
+    ``fit`` builds everything in one pass. Afterwards ``upsert`` and ``remove``
+    change one row at a time: the old row is zeroed in place, new rows go to the
+    buffer until it is folded into the matrix. Document frequencies only grow
+    between full builds (a removed row no longer has its full term list), and
+    rows already stored keep the weights they were built with until the next one.
+    """
+
+    def __init__(self, n_features: int, max_terms: int = 64, max_df: float = 0.5,
+                 compact_every: int = 256):
+        self.n_features = n_features
+        self.max_terms = max_terms
+        self.max_df = max_df
+        self.compact_every = compact_every
+        self.df = np.zeros(n_features, dtype=np.int32)
+        self.n_docs = 0
+        self.matrix = sparse.csr_matrix((0, n_features), dtype=np.float32)
+        self.ids: list[int] = []
+        self.row_of: dict[int, int] = {}
+        self._pending: list = []
+        # Score a post's weakest neighbour must be beaten by to enter its top-k
+        self.floor: dict[int, float] = {}
+
+    # -- building rows --
+    def _raw_row(self, post):
+        counts = hashed_terms(post, self.n_features)
+        indices = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        # Sublinear tf: a word used ten times isn't ten times as telling
+        data = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        order = np.argsort(indices)
+        return indices[order], data[order]
+
+    def idf(self, indices: np.ndarray) -> np.ndarray:
+        return (np.log((1.0 + self.n_docs) / (1.0 + self.df[indices])) + 1.0).astype(np.float32)
+
+    def _weighted(self, indices: np.ndarray, data: np.ndarray):
+        """Applies idf and keeps the ``max_terms`` heaviest terms of a row.
+
+        Words found in more than ``max_df`` of all posts are dropped outright.
+        Neither they nor the light tail move a cosine much, but both dominate
+        the cost of the all-pairs product, since they link almost every pair.
+        """
+        common = self.df[indices] > self.max_df * self.n_docs
+        if common.any():
+            indices, data = indices[~common], data[~common]
+        data = data * self.idf(indices)
+        if len(data) > self.max_terms:
+            keep = np.sort(np.argpartition(data, -self.max_terms)[-self.max_terms:])
+            indices, data = indices[keep], data[keep]
+        return indices, data
+
+    @staticmethod
+    def _normalise(matrix):
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.csr_matrix(sparse.diags(1.0 / norms, dtype=np.float32) @ matrix)
+
+    def fit(self, posts: Iterable) -> "VectorSpace":
+        rows, ids = [], []
+        for post in posts:
+            rows.append(self._raw_row(post))
+            ids.append(post.id)
+        self.n_docs = len(ids)
+        self.df = np.zeros(self.n_features, dtype=np.int32)
+        for row_indices, _ in rows:
+            self.df[row_indices] += 1
+        indptr, indices, data = [0], [], []
+        for row_indices, row_data in rows:
+            row_indices, row_data = self._weighted(row_indices, row_data)
+            indices.append(row_indices)
+            data.append(row_data)
+            indptr.append(indptr[-1] + len(row_indices))
+        indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32)
+        data = np.concatenate(data) if data else np.zeros(0, dtype=np.float32)
+        matrix = sparse.csr_matrix((data, indices, np.asarray(indptr)),
+                                   shape=(len(ids), self.n_features))
+        self.matrix = self._normalise(matrix)
+        self.ids = ids
+        self.row_of = {post_id: row for row, post_id in enumerate(ids)}
+        self._pending = []
+        return self
+
+    def vector(self, post):
+        indices, data = self._weighted(*self._raw_row(post))
+        row = sparse.csr_matrix((data, indices, [0, len(indices)]),
+                                shape=(1, self.n_features))
+        return self._normalise(row)
+
+    # -- incremental changes --
+    def _row(self, post_id: int):
+        row = self.row_of[post_id]
+        if row < self.matrix.shape[0]:
+            return self.matrix[row]
+        return self._pending[row - self.matrix.shape[0]]
+
+    def remove(self, post_id: int):
+        row = self.row_of.pop(post_id, None)
+        if row is None:
+            return
+        if row < self.matrix.shape[0]:
+            self.matrix.data[self.matrix.indptr[row]:self.matrix.indptr[row + 1]] = 0
+        else:
+            self._pending[row - self.matrix.shape[0]].data[:] = 0
+        self.floor.pop(post_id, None)
+
+    def upsert(self, post):
+        self.remove(post.id)
+        indices, _ = self._raw_row(post)
+        self.df[indices] += 1
+        self.n_docs += 1
+        self.row_of[post.id] = len(self.ids)
+        self.ids.append(post.id)
+        self._pending.append(self.vector(post))
+        if len(self._pending) >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Folds buffered rows into the matrix and drops rows of removed posts."""
+        matrix = sparse.vstack([self.matrix, *self._pending], format="csr") if self._pending \
+            else self.matrix
+        live = sorted(self.row_of.values())
+        self.matrix = matrix[live]
+        self.matrix.eliminate_zeros()
+        self.ids = [self.ids[row] for row in live]
+        self.row_of = {post_id: row for row, post_id in enumerate(self.ids)}
+        self._pending = []
+
+    # -- similarity --
+    def scores(self, queries, transposed=None) -> np.ndarray:
+        """Dense cosine similarities, one row per query and one column per entry of ``ids``.
+
+        A rebuild passes ``transposed`` (the matrix transposed, as CSR) so it is
+        converted once rather than for every block.
+        """
+        if transposed is None:
+            transposed = self.matrix.T
+        blocks = [(queries @ transposed).toarray()]
+        if self._pending:
+            blocks.append((queries @ sparse.vstack(self._pending, format="csr").T).toarray())
+        return np.hstack(blocks)
+
+    def _queries(self, post_ids: list[int]):
+        rows = [self.row_of[post_id] for post_id in post_ids]
+        if max(rows) < self.matrix.shape[0]:
+            return self.matrix[rows]
+        return sparse.vstack([self._row(post_id) for post_id in post_ids], format="csr")
+
+    def top_k(self, post_ids: list[int], k: int, min_score: float,
+              transposed=None) -> dict[int, list[tuple[int, float]]]:
+        """Best ``k`` neighbours of each given post, with scores of at least ``min_score``."""
+        if not post_ids:
+            return {}
+        scores = self.scores(self._queries(post_ids), transposed)
+        # Never related to itself
+        scores[np.arange(len(post_ids)), [self.row_of[post_id] for post_id in post_ids]] = -1.0
+        take = min(k, scores.shape[1] - 1)
+        ids = np.asarray(self.ids)
+        result = {}
+        if take <= 0:
+            for post_id in post_ids:
+                result[post_id] = []
+                self.floor[post_id] = min_score
+            return result
+        best = np.argpartition(scores, -take, axis=1)[:, -take:]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        for i, post_id in enumerate(post_ids):
+            keep = best_scores[i] >= min_score
+            neighbours = list(zip(ids[best[i][keep]].tolist(), best_scores[i][keep].tolist()))
+            result[post_id] = neighbours
+            self.floor[post_id] = neighbours[-1][1] if len(neighbours) == k else min_score
+        return result
+
+    def candidates(self, post_id: int, limit: int, min_score: float) -> list[int]:
+        """Posts whose top-k ``post_id`` now scores high enough to enter, best margin first."""
+        scores = self.scores(self._row(post_id))[0]
+        ids = self.ids
+        margins = []
+        for column in np.flatnonzero(scores > 0):
+            other = ids[column]
+            if other != post_id and self.row_of.get(other) == column:
+                margin = scores[column] - self.floor.get(other, min_score)
+                if margin > 0 and scores[column] >= min_score:
+                    margins.append((margin, other))
+        margins.sort(reverse=True)
+        return [other for _, other in margins[:limit]]
+
+    def build_all(self, k: int, min_score: float, block_size: int):
+        """Yields (post_id, neighbours) for every post, ``block_size`` query rows at a time."""
+        self.compact()
+        transposed = self.matrix.T.tocsr()
+        for start in range(0, len(self.ids), block_size):
+            yield from self.top_k(self.ids[start:start + block_size], k, min_score, transposed).items()
+
+    # -- persistence --
+    def save(self, path: str):
+        """Writes the compacted vectors, document frequencies and floors to one .npz file.
+
+        The file is written next to ``path`` and renamed over it, so a worker
+        loading it never sees half a snapshot.
+        """
+        self.compact()
+        floor_ids = np.fromiter(self.floor.keys(), dtype=np.int64, count=len(self.floor))
+        floor_scores = np.fromiter(self.floor.values(), dtype=np.float32, count=len(self.floor))
+        temp_path = f"{path}.part"
+        with open(temp_path, "wb") as file:
+            np.savez(file, data=self.matrix.data, indices=self.matrix.indices,
+                     indptr=self.matrix.indptr, ids=np.asarray(self.ids, dtype=np.int64),
+                     df=self.df, n_docs=self.n_docs, floor_ids=floor_ids, floor_scores=floor_scores)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str, n_features: int, **options) -> "VectorSpace":
+        with np.load(path) as saved:
+            space = cls(n_features, **options)
+            if len(saved["df"]) != n_features:
+                raise ValueError(f"{path} was built with {len(saved['df'])} features, not {n_features}")
+            space.ids = saved["ids"].tolist()
+            space.matrix = sparse.csr_matrix((saved["data"], saved["indices"], saved["indptr"]),
+                                             shape=(len(space.ids), n_features))
+            space.df = saved["df"]
+            space.n_docs = int(saved["n_docs"])
+            space.floor = dict(zip(saved["floor_ids"].tolist(), saved["floor_scores"].tolist()))
+        space.row_of = {post_id: row for row, post_id in enumerate(space.ids)}
+        return space
+
+    def memory_bytes(self) -> int:
+        matrix = self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+        return matrix + self.df.nbytes + sum(p.data.nbytes + p.indices.nbytes for p in self._pending)
@@ -0,0 +1,35 @@
+# spam.py
+import hashlib
+import re
+from cache import MemoryCache
+
+LINK = re.compile(r"https?://|www\.", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(*parts: str) -> str:
+    """Hash of the normalised text, so resubmitting with changed case or spacing still matches."""
+    normalised = "\x1f".join(WHITESPACE.sub(" ", part or "").strip().lower() for part in parts)
+    return hashlib.sha256(normalised.encode()).hexdigest()
+
+
+def count_links(text: str) -> int:
+    return len(LINK.findall(text or ""))
+
+
+class DuplicateFilter:
+    """Remembers recent fingerprints in memory; a repeat within ``window`` seconds is a duplicate."""
+
+    def __init__(self, window: int, max_entries: int = 10000):
+        self.window = window
+        self._seen = MemoryCache(max_entries)
+
+    def check(self, key: str) -> bool:
+        """Records the key; returns True if it was already seen inside the window."""
+        if self._seen.get(key) is not None:
+            return True
+        self._seen.set(key, True, self.window)
+        return False
+
+    def forget(self, key: str):
+        self._seen.delete(key)
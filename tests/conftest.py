@@ -0,0 +1,28 @@
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Settings are read at import time, so the scratch paths have to be in place first
+SCRATCH = tempfile.mkdtemp(prefix="blog-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{SCRATCH}/blog.db"
+os.environ["UPLOAD_DIR"] = f"{SCRATCH}/uploads"
+os.environ["SEARCH_INDEX_PATH"] = f"{SCRATCH}/search.db"
+os.environ["RELATED_VECTORS_PATH"] = f"{SCRATCH}/related.npz"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+
+    os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
+    command.upgrade(Config(os.path.join(ROOT, "alembic.ini")), "head")
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
@@ -0,0 +1,66 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from analytics import TrafficAggregator
+from database import SessionLocal
+from models import Traffic
+from test_queries import make_post
+
+
+def site_rows(client) -> list:
+    async def read():
+        async with SessionLocal() as db:
+            return (await db.execute(select(Traffic).where(
+                Traffic.post_id.is_(None), Traffic.visit_date == datetime.utcnow().date()
+            ))).scalars().all()
+
+    return client.portal.call(read)
+
+
+def test_flushes_from_two_workers_merge_into_one_site_wide_row(client):
+    post_id = make_post(client)
+    before = sum(row.visit_count for row in site_rows(client))
+    first, second = (TrafficAggregator(60, 4, 12) for _ in range(2))
+    for visitor in range(50):
+        first.record(post_id, f"visitor-{visitor}")
+        second.record(post_id, f"visitor-{visitor + 25}")
+    assert client.portal.call(first.flush) and client.portal.call(second.flush)
+
+    rows = site_rows(client)
+    assert len(rows) == 1
+    assert rows[0].visit_count == before + 100
+    assert 70 <= rows[0].unique_visitors
+
+
+def test_second_site_wide_row_for_a_day_is_rejected(client):
+    async def write():
+        async with SessionLocal() as db:
+            await db.execute(insert(Traffic), [{"post_id": None, "visit_date": datetime(2020, 1, 1).date()}] * 2)
+            await db.commit()
+
+    with pytest.raises(IntegrityError):
+        client.portal.call(write)
+
+
+def test_beacon_for_unknown_post_is_refused_without_a_sketch(client):
+    from analytics import traffic
+
+    pending = traffic.pending()
+    for post_id in (10 ** 9, 10 ** 9 + 1, -5):
+        assert client.post(f"/traffic/{post_id}").status_code == 404
+    assert traffic.pending() == pending
+
+    post_id = make_post(client)
+    assert client.post(f"/traffic/{post_id}").status_code == 204
+    assert traffic.is_pending(post_id)
+
+
+def test_new_keys_past_the_cap_are_dropped():
+    aggregator = TrafficAggregator(60, 4, 12, max_pending=3)
+    for post_id in range(1, 10):
+        aggregator.record(post_id, "visitor")
+    # Two post keys plus the site-wide one fill the cap; later posts are counted as dropped
+    assert aggregator.pending() == 3
+    assert aggregator.dropped == 7
+    assert aggregator.record(1, "another visitor")
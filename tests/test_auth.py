@@ -0,0 +1,50 @@
+import asyncio
+from datetime import datetime, timedelta
+from jose import jwt
+import auth
+from tokens import revocation_list
+
+
+def legacy_token(token_type: str) -> str:
+    # Minted before tokens carried a jti
+    claims = {"sub": "old", "id": 1, "role": "user", "type": token_type,
+              "exp": datetime.utcnow() + timedelta(minutes=5)}
+    return jwt.encode(claims, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+
+
+def test_logout_accepts_tokens_without_jti():
+    body = auth.RefreshRequest(refresh_token=legacy_token("refresh"))
+    asyncio.run(auth.logout(legacy_token("access"), body))
+    assert None not in revocation_list._revoked
+
+
+def test_logout_revokes_tokens_with_jti():
+    token = auth.create_access_token("new", 1, "user", timedelta(minutes=5))
+    asyncio.run(auth.logout(token))
+    assert revocation_list.is_revoked(jwt.get_unverified_claims(token)["jti"])
+
+
+def test_login_holds_no_connection_while_hashing(client, monkeypatch):
+    from sqlalchemy import insert
+    import models
+    from database import SessionLocal, get_engine
+    from hashing import _hash
+
+    async def add_user():
+        async with SessionLocal() as db:
+            await db.execute(insert(models.Users), [{"username": "hasher", "hashed_password": _hash("secret"),
+                                                     "role": "user"}])
+            await db.commit()
+
+    client.portal.call(add_user)
+    held = []
+    verify = auth.password_hasher.verify
+
+    async def watched_verify(password, hashed_password):
+        held.append(get_engine().sync_engine.pool.checkedout())
+        return await verify(password, hashed_password)
+
+    monkeypatch.setattr(auth.password_hasher, "verify", watched_verify)
+    response = client.post("/auth/token", data={"username": "hasher", "password": "secret"})
+    assert response.status_code == 200
+    assert held == [0]
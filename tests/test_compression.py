@@ -0,0 +1,41 @@
+import asyncio
+from serialization import CompressionMiddleware
+
+
+def run(app, extensions=None):
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"br, gzip")],
+             "extensions": extensions or {}}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(CompressionMiddleware(app, minimum_size=10)(scope, receive, send))
+    return sent
+
+
+def test_pathsend_keeps_its_response_start():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/css"), (b"content-length", b"5000")]})
+        await send({"type": "http.response.pathsend", "path": "/tmp/style.css"})
+
+    sent = run(app, {"http.response.pathsend": {}})
+    assert [message["type"] for message in sent] == ["http.response.start", "http.response.pathsend"]
+    assert sent[0]["status"] == 200
+    assert (b"content-encoding", b"gzip") not in sent[0]["headers"]
+
+
+def test_large_body_is_compressed():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b"x" * 5000})
+
+    sent = run(app)
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-encoding"] in (b"br", b"gzip")
+    assert len(sent[1]["body"]) < 5000
@@ -0,0 +1,29 @@
+import feeds
+from cache import response_cache
+from config import settings
+from test_queries import make_post
+
+
+def test_new_post_only_drops_its_own_sitemap_shard(client, monkeypatch):
+    monkeypatch.setattr(settings, "sitemap_max_urls", 3)
+    post_ids = [make_post(client) for _ in range(5)]
+    base = "http://testserver"
+    first = client.portal.call(feeds.cached_document, "sitemap", base, 0)
+
+    newest = make_post(client)
+    response_cache.invalidate("feeds", *feeds.sitemap_namespaces(newest))
+    assert feeds.sitemap_namespaces(newest) == ["sitemap", f"sitemap:{feeds.shard_of(newest)}"]
+    assert feeds.shard_of(newest) != 0 and feeds.shard_of(min(post_ids)) <= feeds.shard_of(newest)
+    assert client.portal.call(feeds.cached_document, "sitemap", base, 0) is first
+    last = client.get(f"/sitemaps/posts-{feeds.shard_of(newest)}.xml")
+    assert f"/posts/{newest}<" in last.text
+
+
+def test_rebuild_of_unchanged_feed_keeps_last_modified(client):
+    make_post(client)
+    before = client.get("/feed.xml")
+    response_cache.invalidate("feeds")
+    after = client.get("/feed.xml")
+    assert after.headers["last-modified"] == before.headers["last-modified"]
+    revalidated = client.get("/feed.xml", headers={"If-Modified-Since": before.headers["last-modified"]})
+    assert revalidated.status_code == 304
@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from database import SessionLocal
+from instrumentation import REQUESTS, current_request, RequestStats
+
+
+def routes_seen() -> set:
+    return {sample.labels["route"] for metric in REQUESTS.collect() for sample in metric.samples}
+
+
+def test_routes_are_labelled_by_template(client):
+    client.get("/posts/123456/detail")
+    client.get("/likes/counts", params={"post_ids": "1,2"})
+    client.get("/no/such/page/98765")
+    seen = routes_seen()
+    assert "/posts/{post_id}/detail" in seen
+    assert "/likes/counts" in seen
+    assert "unmatched" in seen
+    assert not any("123456" in route or "98765" in route for route in seen)
+
+
+def test_failed_statement_is_not_timed(client):
+    stats = RequestStats({})
+
+    async def run():
+        token = current_request.set(stats)
+        try:
+            async with SessionLocal() as db:
+                with pytest.raises(OperationalError):
+                    await db.execute(text("SELECT * FROM no_such_table"))
+                await db.rollback()
+                await db.execute(text("SELECT 1"))
+        finally:
+            current_request.reset(token)
+
+    client.portal.call(run)
+    assert stats.queries == 1
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from sqlalchemy import insert
+import auth
+import models
+from database import SessionLocal
+from like_buffer import like_buffer
+from test_queries import add_activity, make_post
+
+
+def test_flush_recounts_likes_written_behind_its_back(client):
+    post_id = make_post(client)
+    reader = add_activity(client, post_id, 1)[0]
+    late = add_activity(client, make_post(client), 1)[0]
+
+    async def stray_like():
+        # A row the counter never heard of, e.g. from a direct-mode writer
+        async with SessionLocal() as db:
+            await db.execute(insert(models.Like), [{"user_id": late, "post_id": post_id}])
+            await db.commit()
+
+    client.portal.call(stray_like)
+    like_buffer.submit(reader, post_id, False)
+    assert client.portal.call(like_buffer.flush)
+    assert client.get(f"/posts/{post_id}").json()["like_count"] == 1
+
+
+def test_detail_overlays_unflushed_clicks(client):
+    post_id = make_post(client)
+    reader = add_activity(client, post_id, 1)[0]
+    token = auth.create_access_token("reader", reader, "user", timedelta(minutes=5))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    like_buffer.submit(reader, post_id, False)
+    detail = client.get(f"/posts/{post_id}/detail", headers=headers).json()
+    assert detail["is_liked"] is False
+    assert detail["post"]["like_count"] == 0
+    assert client.get(f"/posts/{post_id}/detail").json()["post"]["like_count"] == 1
+    assert client.portal.call(like_buffer.flush)
+
+
+def test_counts_served_at_single_prefix_and_old_alias(client):
+    post_id = make_post(client)
+    for path in ("/likes/counts", "/likes/likes/counts"):
+        response = client.get(path, params={"post_ids": str(post_id)})
+        assert response.status_code == 200
+        assert response.json()[0]["post_id"] == post_id
+    assert "/likes/likes/counts" not in client.get("/openapi.json").json()["paths"]
+
+
+def test_batched_clicks_answer_202_with_the_declared_status(client, monkeypatch):
+    from config import settings
+
+    post_id = make_post(client)
+    reader = add_activity(client, make_post(client), 1)[0]
+    token = auth.create_access_token("reader", reader, "user", timedelta(minutes=5))
+    headers = {"Authorization": f"Bearer {token}"}
+    monkeypatch.setattr(settings, "like_ingestion", "batched")
+
+    liked = client.post("/likes/", json={"post_id": post_id}, headers=headers)
+    assert liked.status_code == 202
+    assert liked.json() == {"post_id": post_id, "is_liked": True}
+    unliked = client.delete(f"/likes/{post_id}", headers=headers)
+    assert unliked.status_code == 202
+    assert unliked.json() == {"post_id": post_id, "is_liked": False}
+    assert client.portal.call(like_buffer.flush)
+
+    paths = client.get("/openapi.json").json()["paths"]
+    for path, method in (("/likes/", "post"), ("/likes/{post_id}", "delete")):
+        declared = paths[path][method]["responses"]["202"]["content"]["application/json"]["schema"]
+        assert declared == {"$ref": "#/components/schemas/LikeStatus"}
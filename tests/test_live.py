@@ -0,0 +1,38 @@
+import pytest
+from starlette.websockets import WebSocketDisconnect
+from realtime import broker
+from test_queries import make_post
+
+
+def test_unknown_post_has_no_channel(client):
+    assert client.get("/live/posts/999999999").status_code == 404
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/live/posts/999999999/ws"):
+            pass
+    assert closed.value.code == 1008
+    assert broker.subscribers == 0
+
+
+def test_client_gone_before_the_stream_starts_holds_no_subscription(client):
+    import main
+
+    post_id = make_post(client)
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": f"/live/posts/{post_id}", "raw_path": f"/live/posts/{post_id}".encode(),
+             "query_string": b"", "headers": [(b"host", b"testserver")], "client": ("127.0.0.1", 1),
+             "server": ("testserver", 80), "root_path": "", "app": main.app}
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")
+
+    async def request():
+        try:
+            await main.app(scope, receive, send)
+        except Exception:
+            pass
+
+    client.portal.call(request)
+    assert broker.subscribers == 0
@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import insert
+import models
+from database import SessionLocal
+
+
+def test_post_pages_walk_ties_on_created_at_once_each(client):
+    async def write():
+        async with SessionLocal() as db:
+            same_day = datetime(2021, 6, 1)
+            await db.execute(insert(models.Post), [
+                {"category": "Paged", "title": f"Tie {i}", "created_at": same_day} for i in range(5)
+            ] + [{"category": "Paged", "title": "Older", "created_at": datetime(2021, 5, 1)}])
+            await db.commit()
+
+    client.portal.call(write)
+    titles, cursor = [], None
+    while True:
+        params = {"category": "Paged", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/posts/", params=params).json()
+        titles.extend(item["title"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert titles == [f"Tie {i}" for i in reversed(range(5))] + ["Older"]
@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+from datetime import timedelta
+from sqlalchemy import event, insert, update
+from sqlalchemy.engine import Engine
+import auth
+import models
+from cache import response_cache
+from database import SessionLocal
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+
+
+def add_activity(client, post_id: int, users: int):
+    """``users`` new readers who each comment on and like the post."""
+
+    async def write():
+        async with SessionLocal() as db:
+            first = (await db.execute(insert(models.Users).returning(models.Users.id), [
+                {"username": f"reader-{post_id}-{users}-{i}", "hashed_password": "x", "role": "user"}
+                for i in range(users)
+            ])).scalars().all()
+            await db.execute(insert(models.Comment), [
+                {"content": "Nice", "user_id": user_id, "post_id": post_id} for user_id in first])
+            await db.execute(insert(models.Like), [
+                {"user_id": user_id, "post_id": post_id} for user_id in first])
+            await db.execute(update(models.Post).where(models.Post.id == post_id).values(
+                like_count=models.Post.like_count + users, comment_count=models.Post.comment_count + users))
+            await db.commit()
+            return first
+
+    return client.portal.call(write)
+
+
+def make_post(client) -> int:
+    async def write():
+        async with SessionLocal() as db:
+            post = models.Post(category="Travel", title="Counted", intro_content="Intro",
+                               content1="One", main_content="Main", final_content="End")
+            db.add(post)
+            await db.commit()
+            return post.id
+
+    return client.portal.call(write)
+
+
+def statements_for(client, url: str, headers=None) -> int:
+    response_cache.invalidate("posts:list")
+    with count_statements() as statements:
+        response = client.get(url, headers=headers or {})
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_detail_runs_two_statements_however_busy_the_post(client):
+    post_id = make_post(client)
+    reader = add_activity(client, post_id, 3)[0]
+    token = auth.create_access_token("reader", reader, "user", timedelta(minutes=5))
+    headers = {"Authorization": f"Bearer {token}"}
+    url = f"/posts/{post_id}/detail"
+
+    assert statements_for(client, url) == 2
+    assert statements_for(client, url, headers) == 2
+    add_activity(client, post_id, 40)
+    assert statements_for(client, url) == 2
+    assert statements_for(client, url, headers) == 2
+
+
+def test_list_statements_do_not_grow_with_comments_or_likes(client):
+    post_id = make_post(client)
+    before = statements_for(client, "/posts/?limit=50")
+    add_activity(client, post_id, 40)
+    assert statements_for(client, "/posts/?limit=50") == before == 1
@@ -0,0 +1,71 @@
+import os
+import pytest
+from sqlalchemy import select
+import models
+import similarity
+from database import SessionLocal
+from related import related_posts
+
+
+def add_post(client, title: str) -> int:
+    async def write():
+        async with SessionLocal() as db:
+            post = models.Post(category="Garden", title=title, intro_content=f"{title} intro",
+                               main_content=f"All about {title} and compost", final_content="End")
+            db.add(post)
+            await db.commit()
+            return post.id
+
+    return client.portal.call(write)
+
+
+def related_ids(client, post_id: int) -> list[int]:
+    async def read():
+        async with SessionLocal() as db:
+            return list((await db.execute(
+                select(models.RelatedPost.related_id).where(models.RelatedPost.post_id == post_id)
+            )).scalars())
+
+    return client.portal.call(read)
+
+
+def test_edits_never_vectorise_every_post(client, monkeypatch):
+    first = add_post(client, "tomatoes")
+    related_posts.reset()
+    if os.path.exists(related_posts.vectors_path):
+        os.remove(related_posts.vectors_path)
+
+    def full_load(*args):
+        raise AssertionError("an edit loaded every post")
+
+    # Before any rebuild there is nothing saved, so the edit leaves related posts alone
+    with monkeypatch.context() as patch:
+        patch.setattr(similarity.VectorSpace, "fit", full_load)
+        client.portal.call(related_posts.refresh, first)
+    assert related_posts.space is None and related_ids(client, first) == []
+
+    client.portal.call(related_posts.rebuild)
+    assert os.path.exists(related_posts.vectors_path)
+    related_posts.reset()
+
+    second = add_post(client, "tomatoes")
+    with monkeypatch.context() as patch:
+        patch.setattr(similarity.VectorSpace, "fit", full_load)
+        client.portal.call(related_posts.refresh, second)
+    assert first in related_ids(client, second)
+
+
+def test_saved_vectors_round_trip(tmp_path):
+    from types import SimpleNamespace
+
+    posts = [SimpleNamespace(id=i, title=title, category="Food", intro_content=None, content1=None,
+                             quote=None, main_content=None, final_content=None)
+             for i, title in enumerate(("apple pie", "apple tart", "fish soup"), 1)]
+    space = similarity.VectorSpace(1024).fit(posts)
+    space.top_k(space.ids, 2, 0.0)
+    path = str(tmp_path / "vectors.npz")
+    space.save(path)
+
+    loaded = similarity.VectorSpace.load(path, 1024)
+    assert loaded.ids == space.ids and loaded.floor == pytest.approx(space.floor)
+    assert loaded.top_k([1], 1, 0.0) == space.top_k([1], 1, 0.0)
@@ -0,0 +1,14 @@
+from types import SimpleNamespace
+from search import SearchIndex
+
+
+def test_snippet_escapes_post_text(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    post = SimpleNamespace(id=1, title="Hello", category="Travel", intro_content="",
+                           main_content='harbour <img src=x onerror="alert(1)"> harbour',
+                           final_content="", image1=None, created_at=None)
+    index.upsert_many([post])
+    snippet = index.search("harbour", 10)[0]["snippet"]
+    assert "<img" not in snippet
+    assert "&lt;img" in snippet
+    assert snippet.count("<mark>") == snippet.count("</mark>") == 2
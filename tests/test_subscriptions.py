@@ -0,0 +1,67 @@
+from datetime import timedelta
+import auth
+
+
+def admin_headers() -> dict:
+    token = auth.create_access_token("admin", 1, "admin", timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_listing_needs_an_admin(client):
+    assert client.get("/subscribe/").status_code == 401
+    token = auth.create_access_token("reader", 2, "user", timedelta(minutes=5))
+    assert client.get("/subscribe/", headers={"Authorization": f"Bearer {token}"}).status_code in (401, 403)
+
+
+def test_listing_is_paged_by_id(client):
+    for i in range(5):
+        assert client.post("/subscribe/", json={"email": f"paged{i}@example.com"}).status_code == 201
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor is not None else {})}
+        page = client.get("/subscribe/", params=params, headers=admin_headers()).json()
+        assert len(page["items"]) <= 2
+        seen.extend(item["email"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert [f"paged{i}@example.com" for i in range(5)] == [email for email in seen if email.startswith("paged")]
+
+
+def test_newsletter_carries_a_working_unsubscribe_link(client):
+    from types import SimpleNamespace
+    from urllib.parse import urlsplit
+    import newsletter
+
+    assert client.post("/subscribe/", json={"email": "leaving@example.com"}).status_code == 201
+    post = SimpleNamespace(id=1, title="Hello", intro_content="Intro")
+    message = newsletter.build_message(post, "leaving@example.com", "http://testserver")
+    link = message["List-Unsubscribe"].strip("<>")
+    assert message["List-Unsubscribe-Post"] == "List-Unsubscribe=One-Click"
+    assert f"Unsubscribe: {link}" in message.get_content()
+
+    url = urlsplit(link)
+    assert client.post(url.path, params={"email": "leaving@example.com", "token": "forged"}).status_code == 403
+    # Following the link only shows a button, so a link scanner can't unsubscribe anyone
+    assert client.get(f"{url.path}?{url.query}").status_code == 200
+    assert client.post(f"{url.path}?{url.query}").status_code == 200
+    emails = [item["email"] for item in client.get("/subscribe/", params={"limit": 100}, headers=admin_headers()).json()["items"]]
+    assert "leaving@example.com" not in emails
+
+
+def test_finished_deliveries_are_pruned():
+    from datetime import datetime
+    from newsletter import Delivery, DeliveryEngine
+
+    engine = DeliveryEngine(keep_finished=2, keep_seconds=3600)
+    running = Delivery(1)
+    old = Delivery(2)
+    old.finished_at = datetime.utcnow() - timedelta(hours=2)
+    recent = []
+    for post_id in range(3, 6):
+        delivery = Delivery(post_id)
+        delivery.finished_at = datetime.utcnow() - timedelta(minutes=post_id)
+        recent.append(delivery)
+    engine.deliveries = {delivery.id: delivery for delivery in [running, old, *recent]}
+
+    assert {delivery.post_id for delivery in engine.list()} == {1, 3, 4}
@@ -0,0 +1,115 @@
+import gzip
+import os
+import pytest
+from uploads import UPLOAD_DIR
+
+
+def write_with_sidecars(name: str, *suffixes: str):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, name)
+    with open(path, "w") as file:
+        file.write("body { color: red }\n" * 100)
+    for suffix in suffixes:
+        compress = pytest.importorskip("brotli").compress if suffix == ".br" else gzip.compress
+        with open(path + suffix, "wb") as file:
+            file.write(compress(b"sidecar"))
+
+
+def test_sidecar_follows_accept_encoding_qualities(client):
+    write_with_sidecars("style.css", ".br", ".gz")
+    get = lambda accept: client.get("/uploads/style.css", headers={"Accept-Encoding": accept})
+
+    assert get("br, gzip").headers["content-encoding"] == "br"
+    assert get("br;q=0, gzip").headers["content-encoding"] == "gzip"
+    response = get("gzip;q=0, br;q=0")
+    assert "content-encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["vary"]
+
+
+def test_br_client_falls_back_to_the_gzip_sidecar(client):
+    write_with_sidecars("app.js", ".gz")
+    response = client.get("/uploads/app.js", headers={"Accept-Encoding": "br, gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+
+
+def small_app_limited_to(max_bytes: int):
+    from fastapi import FastAPI, Request
+    from uploads import UploadLimitMiddleware
+
+    app = FastAPI()
+    reads = []
+
+    @app.post("/posts/")
+    async def upload(request: Request):
+        reads.append(len(await request.body()))
+        return {"ok": True}
+
+    app.add_middleware(UploadLimitMiddleware, limits={"/posts/": max_bytes})
+    return app, reads
+
+
+def test_declared_oversized_body_is_refused_before_it_is_read():
+    from fastapi.testclient import TestClient
+
+    app, reads = small_app_limited_to(100)
+    with TestClient(app) as limited:
+        assert limited.post("/posts/", content=b"x" * 1000).status_code == 413
+        assert limited.post("/posts/", content=b"x" * 50).status_code == 200
+    assert reads == [50]
+
+
+def test_undeclared_oversized_body_is_cut_off():
+    from fastapi.testclient import TestClient
+
+    app, reads = small_app_limited_to(100)
+
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 40
+
+    with TestClient(app) as limited:
+        response = limited.post("/posts/", content=chunks())
+    assert response.status_code == 413
+    assert reads == []
+
+
+def test_image_type_comes_from_its_bytes(client):
+    import io
+    from fastapi import HTTPException, UploadFile
+    from uploads import save_upload
+
+    png = UploadFile(io.BytesIO(b"\x89PNG\r\n\x1a\n" + b"\0" * 32), filename="photo.jpg",
+                     headers={"content-type": "image/jpeg"})
+    assert client.portal.call(save_upload, png).endswith(".png")
+
+    page = UploadFile(io.BytesIO(b"<html><script>alert(1)</script>"), filename="photo.jpg",
+                      headers={"content-type": "image/jpeg"})
+    with pytest.raises(HTTPException) as error:
+        client.portal.call(save_upload, page)
+    assert error.value.status_code == 415
+
+
+def test_blank_file_input_is_no_image(client):
+    import io
+    from fastapi import UploadFile
+    from uploads import save_upload
+
+    blank = UploadFile(io.BytesIO(b""), filename="", headers={"content-type": "application/octet-stream"})
+    assert client.portal.call(save_upload, blank) is None
+
+    response = client.post("/posts/", data={"category": "Travel", "title": "No picture"},
+                           files={"image1": ("", b"", "application/octet-stream")})
+    assert response.status_code == 201
+    assert response.json()["image1"] is None
+
+
+def test_import_bodies_are_capped(client, monkeypatch):
+    import main
+
+    limits = next(middleware.kwargs["limits"] for middleware in main.app.user_middleware
+                  if middleware.cls.__name__ == "UploadLimitMiddleware")
+    for path in ("/posts/import", "/newsletter/import"):
+        monkeypatch.setitem(limits, path, 100)
+        # Refused before authentication or multipart parsing get to read anything
+        response = client.post(path, files={"file": ("rows.csv", b"x" * 1000, "text/csv")})
+        assert response.status_code == 413
@@ -0,0 +1,58 @@
+# tokens.py
+import hashlib
+import threading
+import time
+from typing import Optional
+from cache import MemoryCache
+from config import settings
+
+
+class ClaimsCache:
+    """LRU of already-verified token claims, keyed by a hash of the raw token.
+
+    Entries expire with the token's own ``exp`` so a cached token never outlives
+    its signature; an eviction only costs one extra decode.
+    """
+
+    def __init__(self, max_entries: int):
+        self._entries = MemoryCache(max_entries)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        return self._entries.get(self._key(token))
+
+    def put(self, token: str, claims: dict):
+        ttl = claims["exp"] - time.time()
+        if ttl > 0:
+            self._entries.set(self._key(token), claims, ttl)
+
+
+class RevocationList:
+    """Revoked token ids (jti) until their expiry; membership is a dict lookup.
+
+    Kept per process: with several workers a revocation only applies to the
+    worker that handled the logout until its copy of the token expires.
+    """
+
+    def __init__(self):
+        self._revoked: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_purge = time.time() + 60
+
+    def revoke(self, jti: str, expires_at: float):
+        with self._lock:
+            self._revoked[jti] = expires_at
+            now = time.time()
+            if now >= self._next_purge:
+                self._revoked = {key: exp for key, exp in self._revoked.items() if exp > now}
+                self._next_purge = now + 60
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self._revoked
+
+
+claims_cache = ClaimsCache(settings.token_cache_size)
+revocation_list = RevocationList()
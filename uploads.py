@@ -0,0 +1,204 @@
+# uploads.py
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from typing import BinaryIO, Optional
+import anyio
+from fastapi import HTTPException, Request, UploadFile, status
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, JSONResponse
+from config import settings
+from serialization import negotiate_encoding
+
+UPLOAD_DIR = settings.upload_dir
+CHUNK_SIZE = 1024 * 1024
+
+# Accepted image types and the extension each is stored under
+IMAGE_EXTENSIONS = {".jpg": ".jpg", ".jpeg": ".jpg", ".png": ".png", ".gif": ".gif", ".webp": ".webp"}
+# Leading bytes of each accepted format; the file's own bytes decide, not its name or Content-Type
+IMAGE_SIGNATURES = ((b"\xff\xd8\xff", ".jpg"), (b"\x89PNG\r\n\x1a\n", ".png"),
+                    (b"GIF87a", ".gif"), (b"GIF89a", ".gif"))
+
+# <sha256>.<ext> originals and <sha256>.<width>.<ext> derivatives never change once written
+CONTENT_ADDRESSED = re.compile(r"^(?P<hash>[0-9a-f]{64})(?:\.(?P<width>\d+))?\.[a-z]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+LEGACY_CACHE_CONTROL = "public, max-age=86400"
+# Precompressed sidecars (<file>.br / <file>.gz), in order of preference
+SIDECAR_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+SIDECAR_SUFFIXES = dict(SIDECAR_ENCODINGS)
+
+
+def sniff_extension(head: bytes) -> str:
+    """The stored extension for an image, from its first bytes."""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail="Images must be JPEG, PNG, GIF or WebP")
+
+
+def _write_chunk(buffer: BinaryIO, digest, chunk: bytes):
+    # hashlib and file writes both release the GIL, so this runs well on a worker thread
+    digest.update(chunk)
+    buffer.write(chunk)
+
+
+async def save_upload(upload: UploadFile) -> Optional[str]:
+    """Streams an upload to disk under its SHA-256 and returns the stored file name.
+
+    The type (and so the extension) comes from the leading bytes, never the
+    client's file name or Content-Type. An empty part, which is what browsers
+    send for a file input left blank, is no image and returns None.
+
+    The bytes go to a temp file in the upload directory and are renamed into
+    place only once complete, so readers never see a partial image and identical
+    uploads collapse onto a single file.
+    """
+    chunk = await upload.read(CHUNK_SIZE)
+    if not chunk:
+        return None
+    extension = sniff_extension(chunk)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-", suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk:
+                size += len(chunk)
+                if size > settings.max_upload_bytes:
+                    raise HTTPException(status_code=413,
+                                        detail=f"Images are limited to {settings.max_upload_bytes} bytes")
+                await anyio.to_thread.run_sync(_write_chunk, buffer, digest, chunk)
+                chunk = await upload.read(CHUNK_SIZE)
+            await anyio.to_thread.run_sync(os.fsync, buffer.fileno())
+        filename = f"{digest.hexdigest()}{extension}"
+        final_path = os.path.join(UPLOAD_DIR, filename)
+        if os.path.exists(final_path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, final_path)
+        return filename
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class UploadLimitMiddleware:
+    """Caps the whole request body of the multipart routes before anything parses it.
+
+    Starlette spools a multipart body to temp files before the handler runs, so
+    save_upload's per-file check alone only fires once every byte is on disk.
+    ``limits`` maps each POST path to its cap. A declared Content-Length over
+    the cap is refused straight away; a body without one is counted as it
+    arrives and cut off with a 413 once it passes.
+    """
+
+    def __init__(self, app, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.limits.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > max_bytes:
+            await self._reject(max_bytes, scope, receive, send)
+            return
+
+        received, rejected = 0, False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    rejected = True
+                    await self._reject(max_bytes, scope, receive, send)
+                    # The parser sees a client that went away and stops reading
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # Whatever the cut-off body made the app raise, the 413 has already gone out
+            if not rejected:
+                raise
+
+    @staticmethod
+    async def _reject(max_bytes: int, scope, receive, send):
+        response = JSONResponse({"detail": f"Uploads are limited to {max_bytes} bytes per request"},
+                                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        await response(scope, receive, send)
+
+
+def public_base(request: Request) -> str:
+    return (settings.public_base_url or str(request.base_url)).rstrip("/")
+
+
+def public_url(request: Request, filename: str) -> str:
+    return f"{public_base(request)}/uploads/{filename}"
+
+
+class UploadFiles(StaticFiles):
+    """StaticFiles for the upload directory with validators suited to its content.
+
+    Content-addressed files get their hash as a strong ETag and an immutable
+    Cache-Control, so browsers never revalidate them. Older files keep the
+    stat-based ETag with a day of freshness. Range, If-Range, conditional GET
+    and zero-copy ``http.response.pathsend`` come from Starlette's FileResponse.
+    A ``.br``/``.gz`` sidecar next to a file is served instead when the client
+    accepts that encoding.
+    """
+
+    async def get_response(self, path: str, scope):
+        # Temp files from in-progress uploads (and other dotfiles) are never public
+        if os.path.basename(path).startswith("."):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        name = os.path.basename(full_path)
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        headers = {"Vary": "Accept-Encoding"}
+
+        if CONTENT_ADDRESSED.match(name):
+            headers["ETag"] = f'"{name}"'
+            headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            headers["Cache-Control"] = LEGACY_CACHE_CONTROL
+
+        # Only the sidecars that actually exist take part, so a br-preferring client
+        # still gets the .gz when that is all there is
+        available = [encoding for encoding, suffix in SIDECAR_ENCODINGS
+                     if os.path.isfile(f"{full_path}{suffix}")]
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""), available) if available else None
+        if encoding:
+            full_path = f"{full_path}{SIDECAR_SUFFIXES[encoding]}"
+            stat_result = os.stat(full_path)
+            headers["Content-Encoding"] = encoding
+            if "ETag" in headers:
+                headers["ETag"] = f'"{name}-{encoding}"'
+
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result,
+                                media_type=media_type, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response